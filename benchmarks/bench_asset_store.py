@@ -0,0 +1,181 @@
+"""
+Memory and lookup time of the assets as pydantic models and in the `AssetStore`.
+
+- models: the validated `Asset`s with a list of the listed ones per filter combination,
+  a dict by symbol and a linear scan by name, like the assets routes did.
+- store: the `AssetStore` records with its hash indexes and filter partitions,
+  the lookups return the records and the routes build the model of the one they respond with.
+
+The assets are a synthetic catalogue of equities on several exchanges and cryptos,
+some of them inactive or not fractionable, and the selections of both are asserted equal.
+
+    python benchmarks/bench_asset_store.py --assets 5000 30000
+"""
+import argparse
+import gc
+import itertools
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+from uuid import uuid4
+
+from alpaca.trading import Asset, AssetClass, AssetExchange, AssetStatus
+from pydantic import parse_obj_as
+
+from alpaca_partner_backend.api.asset_store import AssetsFilter, AssetStore
+
+EQUITY_EXCHANGES = [
+    AssetExchange.NASDAQ,
+    AssetExchange.NYSE,
+    AssetExchange.ARCA,
+    AssetExchange.AMEX,
+    AssetExchange.BATS,
+]
+# the filters of the routes: the default status or any, by class and by exchange
+FILTERS: list[AssetsFilter] = [
+    *itertools.product([AssetStatus.ACTIVE, None], [None, *AssetClass], [None]),
+    *itertools.product([AssetStatus.ACTIVE, None], [None], EQUITY_EXCHANGES),
+]
+
+
+def make_raw_assets(count: int) -> list[dict[str, Any]]:
+    """Create the raw assets, a tenth cryptos, 15% inactive and 20% not fractionable."""
+    return [
+        {
+            "id": str(uuid4()),
+            "class": AssetClass.CRYPTO.value if i % 10 == 0 else AssetClass.US_EQUITY.value,
+            "exchange": AssetExchange.FTXU.value
+            if i % 10 == 0
+            else EQUITY_EXCHANGES[i % len(EQUITY_EXCHANGES)].value,
+            "symbol": f"SYM{i}",
+            "name": f"Company {i} Common Stock",
+            "status": AssetStatus.INACTIVE.value if i % 7 == 0 else AssetStatus.ACTIVE.value,
+            "tradable": i % 7 != 0,
+            "marginable": True,
+            "shortable": True,
+            "easy_to_borrow": True,
+            "fractionable": i % 5 != 0,
+            "min_order_size": 0.0001 if i % 10 == 0 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def select_models(assets: list[Asset], assets_filter: AssetsFilter) -> list[Asset]:
+    """Filter the models like the catalogue did for each filter combination."""
+    status, asset_class, exchange = assets_filter
+    return [
+        a
+        for a in assets
+        if (status is None or a.status == status)
+        and (asset_class is None or a.asset_class == asset_class)
+        and (exchange is None or a.exchange == exchange)
+        and a.tradable is True
+        and a.fractionable is True
+    ]
+
+
+def find_model_by_name(assets: list[Asset], name: str) -> Asset | None:
+    """Find the asset by name with a linear scan, like the names route did."""
+    for a in assets:
+        if a.name == name:
+            return a
+    return None
+
+
+def build_models(raw_assets: list[dict[str, Any]]) -> tuple[Any, ...]:
+    """Build the models, the selections of all the filters and the dict by symbol."""
+    assets = parse_obj_as(list[Asset], raw_assets)
+    selections = {assets_filter: select_models(assets, assets_filter) for assets_filter in FILTERS}
+    by_symbol = {a.symbol: a for a in assets if a.status == AssetStatus.ACTIVE}
+    return assets, selections, by_symbol
+
+
+def build_store(raw_assets: list[dict[str, Any]]) -> AssetStore:
+    """Build the store, the models are released once copied, and select all the filters."""
+    store = AssetStore(parse_obj_as(list[Asset], raw_assets))
+    for assets_filter in FILTERS:
+        store.select(*assets_filter)
+    return store
+
+
+def traced_megabytes(build: Callable[[], Any]) -> tuple[Any, float]:
+    """Get the result of the function and the memory that it retains in megabytes."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained / 2**20
+
+
+def best_of(func: Callable[[], Any], repeat: int, number: int) -> float:
+    """Get the best time in microseconds of a call of the function over the repetitions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings) * 1e6
+
+
+def main() -> None:
+    """Run the benchmark for each number of assets."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, nargs="+", default=[5_000, 30_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'assets':>7} {'operation':>16} {'models':>12} {'store':>12} {'ratio':>8}")
+    for count in args.assets:
+        raw_assets = make_raw_assets(count)
+        (assets, selections, by_symbol), models_mb = traced_megabytes(
+            lambda: build_models(raw_assets)  # noqa: B023
+        )
+        store, store_mb = traced_megabytes(lambda: build_store(raw_assets))  # noqa: B023
+        for assets_filter, models in selections.items():
+            assert [a.symbol for a in models] == [r.symbol for r in store.select(*assets_filter)]
+        symbol, name = f"SYM{count - 1}", f"Company {count - 1} Common Stock"
+        assert store[symbol].to_asset() == by_symbol[symbol]
+        assert store[symbol] is store.get_by_name(name)
+        assert find_model_by_name(assets, name) == by_symbol[symbol]
+
+        def select_store() -> None:
+            store._selections.clear()  # noqa: B023
+            for assets_filter in FILTERS:
+                store.select(*assets_filter)  # noqa: B023
+
+        rows = [
+            ("memory (MB)", models_mb, store_mb),
+            (
+                "by symbol (us)",
+                best_of(lambda: by_symbol.get(symbol), args.repeat, 10_000),  # noqa: B023
+                best_of(lambda: store.get(symbol), args.repeat, 10_000),  # noqa: B023
+            ),
+            (
+                "by name (us)",
+                best_of(lambda: find_model_by_name(assets, name), args.repeat, 10),  # noqa: B023
+                best_of(lambda: store.get_by_name(name), args.repeat, 10_000),  # noqa: B023
+            ),
+            (
+                "all filters (us)",
+                best_of(
+                    lambda: [select_models(assets, f) for f in FILTERS],  # noqa: B023
+                    args.repeat,
+                    1,
+                ),
+                best_of(select_store, args.repeat, 1),
+            ),
+        ]
+        for operation, models_value, store_value in rows:
+            print(
+                f"{count:>7} {operation:>16} {models_value:>12.2f} {store_value:>12.2f} "
+                f"{models_value / store_value:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Throughput of the routers with the async and the threaded upstream transports.
+
+A stub of the Broker API answers the positions endpoint after a fixed latency,
+then the same number of concurrent requests is sent to `GET /positions/` with each transport.
+The access token carries the account claims, so MongoDB is never called.
+
+Run it with the same environment variables of the API:
+
+    python benchmarks/bench_async_transport.py --requests 1000 --concurrency 200
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+
+import httpx
+import uvicorn
+from alpaca.broker import BrokerClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from alpaca_partner_backend.api.async_clients import (
+    AsyncBrokerClient,
+    AsyncTransport,
+    HTTPXTransport,
+    ThreadedTransport,
+)
+from alpaca_partner_backend.api.common import get_async_broker_client
+from alpaca_partner_backend.api.main import app
+from alpaca_partner_backend.database import get_db
+from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.security import create_access_token
+
+ACCOUNT_ID = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+POSITION = {
+    "asset_id": "904837e3-3b76-47ec-b432-046db621571b",
+    "symbol": "AAPL",
+    "exchange": "NASDAQ",
+    "asset_class": "us_equity",
+    "avg_entry_price": "100.0",
+    "qty": "5",
+    "side": "long",
+    "market_value": "600.0",
+    "cost_basis": "500.0",
+    "unrealized_pl": "100.0",
+    "unrealized_plpc": "0.2",
+    "unrealized_intraday_pl": "10.0",
+    "unrealized_intraday_plpc": "0.0169",
+    "current_price": "120.0",
+    "lastday_price": "118.0",
+    "change_today": "0.0169",
+}
+
+
+async def _positions(request: Request) -> JSONResponse:
+    """Answer the positions endpoint after the configured latency."""
+    await asyncio.sleep(request.app.state.latency)
+    return JSONResponse([POSITION])
+
+
+def _serve_stub_upstream(port: int, latency: float) -> None:
+    """Serve the stub of the Broker API."""
+    stub = Starlette(routes=[Route("/v1/trading/accounts/{account_id}/positions", _positions)])
+    stub.state.latency = latency
+    uvicorn.run(stub, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def start_stub_upstream(latency: float) -> tuple[str, multiprocessing.Process]:
+    """
+    Serve the stub of the Broker API in another process.
+
+    A thread would compete with the API for the GIL and make the stub the bottleneck.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.Process(
+        target=_serve_stub_upstream, args=(port, latency), daemon=True
+    )
+    process.start()
+    for _ in range(100):
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                break
+        time.sleep(0.1)
+    return f"http://127.0.0.1:{port}", process
+
+
+async def run(transport: AsyncTransport, requests: int, concurrency: int) -> float:
+    """Send the requests to the API and return the throughput in requests per second."""
+    broker_client = AsyncBrokerClient(transport)
+    app.dependency_overrides[get_async_broker_client] = lambda: broker_client
+    # the account claims of the token make the database unused
+    app.dependency_overrides[get_db] = lambda: None
+    token = create_access_token(
+        data={"sub": "bench@example.com"}, user_id="1", account_id=ACCOUNT_ID
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(
+        app=app,
+        base_url="http://bench",
+        headers={"Authorization": f"Bearer {token}"},
+    ) as client:
+
+        async def get_positions() -> None:
+            async with semaphore:
+                response = await client.get(f"{Routers.POSITIONS.value}/")
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(get_positions() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    await broker_client.aclose()
+    app.dependency_overrides = {}
+    return requests / elapsed
+
+
+def main() -> None:
+    """Run the benchmark for both transports."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="upstream latency (s)")
+    args = parser.parse_args()
+
+    url, stub_process = start_stub_upstream(args.latency)
+    rest_client = BrokerClient(
+        api_key=SETTINGS.BROKER_API_KEY,
+        secret_key=SETTINGS.BROKER_API_SECRET,
+        url_override=url,
+    )
+    transports = {
+        "threaded": lambda: ThreadedTransport(rest_client),
+        "httpx": lambda: HTTPXTransport.from_rest_client(
+            rest_client,
+            limits=httpx.Limits(
+                max_connections=SETTINGS.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=SETTINGS.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=SETTINGS.UPSTREAM_TIMEOUT_SECONDS,
+        ),
+    }
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}, "
+        f"upstream latency {args.latency * 1000:.0f}ms"
+    )
+    for name, transport in transports.items():
+        throughput = asyncio.run(run(transport(), args.requests, args.concurrency))
+        print(f"{name:>10}: {throughput:8.1f} req/s")
+    stub_process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Serialization time of the largest responses, the assets and the orders.
+
+- stdlib: FastAPI's response model validation, `jsonable_encoder` and `json.dumps`,
+  the default response class of the app.
+- orjson class: the same, rendered by `FastJSONResponse` as a default response class would,
+  which saves little since the validation and `jsonable_encoder` still run.
+- json_response: the models serialized by orjson directly, like the assets and orders routes do.
+
+    python benchmarks/bench_json_responses.py --assets 10000 --orders 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+from uuid import uuid4
+
+from alpaca.broker import Order
+from alpaca.trading import (
+    Asset,
+    AssetClass,
+    AssetExchange,
+    AssetStatus,
+    OrderClass,
+    OrderSide,
+    OrderStatus,
+    OrderType,
+    TimeInForce,
+)
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from alpaca_partner_backend.api.responses import FastJSONResponse
+
+
+def make_assets(count: int) -> list[Asset]:
+    """Create assets like the ones of the assets endpoint."""
+    return [
+        Asset(
+            **{
+                "id": uuid4(),
+                "class": AssetClass.US_EQUITY,
+                "exchange": AssetExchange.NASDAQ,
+                "symbol": f"SYM{i}",
+                "name": f"Company {i} Inc. Common Stock",
+                "status": AssetStatus.ACTIVE,
+                "tradable": True,
+                "marginable": True,
+                "shortable": True,
+                "easy_to_borrow": True,
+                "fractionable": True,
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def make_orders(count: int) -> list[Order]:
+    """Create orders like the ones of the orders endpoint."""
+    now = datetime.now(tz=timezone.utc)
+    return [
+        Order(
+            id=uuid4(),
+            client_order_id=str(uuid4()),
+            created_at=now,
+            updated_at=now,
+            submitted_at=now,
+            asset_id=uuid4(),
+            symbol="AAPL",
+            asset_class=AssetClass.US_EQUITY,
+            qty=i + 1,
+            order_class=OrderClass.SIMPLE,
+            order_type=OrderType.MARKET,
+            type=OrderType.MARKET,
+            side=OrderSide.BUY,
+            time_in_force=TimeInForce.DAY,
+            status=OrderStatus.FILLED,
+            extended_hours=False,
+            commission=0,
+        )
+        for i in range(count)
+    ]
+
+
+def with_fastapi(response_class: type[JSONResponse], type_: Any) -> Callable[[Any], bytes]:
+    """Serialize like FastAPI does with the response model of the route."""
+    field = create_response_field(name="response", type_=type_)
+
+    def serialize(content: Any) -> bytes:
+        encoded = asyncio.run(serialize_response(field=field, response_content=content))
+        return response_class(encoded).body
+
+    return serialize
+
+
+def with_json_response(content: Any) -> bytes:
+    """Serialize the models directly with orjson."""
+    return FastJSONResponse(content).body
+
+
+def best_of(func: Callable[[Any], bytes], arg: Any, repeat: int) -> float:
+    """Get the best time in milliseconds of the function over the repetitions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    """Run the benchmark for the assets and the orders."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'payload':>8} {'count':>7} {'stdlib':>10} {'orjson class':>13} {'json_response':>14}")
+    payloads: list[tuple[str, list[Any], Any]] = [
+        ("assets", make_assets(args.assets), list[Asset]),
+        ("orders", make_orders(args.orders), list[Order]),
+    ]
+    for payload, content, type_ in payloads:
+        stdlib = with_fastapi(JSONResponse, type_)
+        orjson_class = with_fastapi(FastJSONResponse, type_)
+        assert json.loads(stdlib(content)) == json.loads(with_json_response(content))
+        timings = [
+            best_of(func, content, args.repeat)
+            for func in (stdlib, orjson_class, with_json_response)
+        ]
+        print(
+            f"{payload:>8} {len(content):>7} "
+            f"{timings[0]:>8.1f}ms {timings[1]:>11.1f}ms {timings[2]:>12.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
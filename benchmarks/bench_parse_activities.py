@@ -0,0 +1,161 @@
+"""
+Parsing time of the account activities with the if/elif chain and with the dispatch tables.
+
+The chain is the `parse_activities` the activities route used before: `activity.dict()`,
+an if/elif chain on the activity type and a validated `Activity` per item.
+The activities are a synthetic mix of FILL, JNLC, CSD, FEE and DIV activities.
+
+    python benchmarks/bench_parse_activities.py --activities 10000 100000
+"""
+import argparse
+import time
+from collections.abc import Callable
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+from uuid import uuid4
+
+from alpaca.trading import (
+    ActivityType,
+    BaseActivity,
+    NonTradeActivity,
+    NonTradeActivityStatus,
+    OrderSide,
+    OrderStatus,
+    TradeActivity,
+    TradeActivityType,
+)
+
+from alpaca_partner_backend.api import parsers
+from alpaca_partner_backend.enums import ActivityName
+from alpaca_partner_backend.models import Activity
+
+START = datetime(2020, 1, 2, 14, 30, tzinfo=timezone.utc)
+ACCOUNT_ID = uuid4()
+NON_TRADE_ACTIVITIES = [
+    (ActivityType.JNLC, "Cash journal", 100.0),
+    (ActivityType.JNLC, "Cash journal", -50.0),
+    (ActivityType.CSD, "ACH deposit", 1000.0),
+    (ActivityType.FEE, "REG fee", -0.01),
+    (ActivityType.FEE, "TAF fee", -0.02),
+    (ActivityType.DIV, "Cash DIV @ 0.23", 1.15),
+]
+
+
+def make_activities(count: int) -> list[BaseActivity]:
+    """Create the activities, every other one a fill."""
+    activities: list[BaseActivity] = []
+    for i in range(count):
+        if i % 2 == 0:
+            activities.append(
+                TradeActivity(
+                    id=f"{i:017}::{uuid4()}",
+                    account_id=ACCOUNT_ID,
+                    activity_type=ActivityType.FILL,
+                    transaction_time=START + timedelta(minutes=i),
+                    type=TradeActivityType.FILL,
+                    price=100.0 + i % 10,
+                    qty=1 + i % 3,
+                    side=OrderSide.BUY if i % 4 == 0 else OrderSide.SELL,
+                    symbol="AAPL",
+                    leaves_qty=0,
+                    order_id=uuid4(),
+                    cum_qty=1 + i % 3,
+                    order_status=OrderStatus.FILLED,
+                )
+            )
+        else:
+            activity_type, description, net_amount = NON_TRADE_ACTIVITIES[
+                i // 2 % len(NON_TRADE_ACTIVITIES)
+            ]
+            activities.append(
+                NonTradeActivity(
+                    id=f"{i:017}::{uuid4()}",
+                    account_id=ACCOUNT_ID,
+                    activity_type=activity_type,
+                    date=date(2020, 1, 2) + timedelta(days=i // 1000),
+                    net_amount=net_amount,
+                    description=description,
+                    status=NonTradeActivityStatus.EXECUTED,
+                    symbol="AAPL" if activity_type == ActivityType.DIV else None,
+                )
+            )
+    return activities
+
+
+def parse_activities_with_chain(account_activities: list[BaseActivity]) -> list[Activity]:
+    """Parse the activities like `parse_activities` did with the if/elif chain."""
+    _activities = []
+    for activity in account_activities:
+        _type = activity.activity_type
+        _activity = activity.dict()
+        _side = _activity.get("side", None)
+        _date = (
+            _activity.get("date", None)
+            or _activity.get("transaction_time", None)
+            or _activity.get("system_date", None)
+        )
+        _amount = _activity.get("net_amount", None) or round(
+            _activity.get("price", 0) * _activity.get("qty", 0), 2
+        )
+        if _type == ActivityType.FILL:
+            _name = ActivityName.BUY_ORDER if _side == OrderSide.BUY else ActivityName.SELL_ORDER
+        elif _type == ActivityType.JNLC:
+            _name = ActivityName.JNLC_DEPOSIT if _amount > 0 else ActivityName.JNLC_WITHDRAWAL
+        elif _type == ActivityType.CSD:
+            _name = ActivityName.ACH_DEPOSIT
+        elif _type == ActivityType.CSW:
+            _name = ActivityName.ACH_WITHDRAWAL
+        elif _type == ActivityType.FEE:
+            _description = str(_activity.get("description"))
+            if "REG" in _description:
+                _name = ActivityName.REG_FEE
+            elif "TAF" in _description:
+                _name = ActivityName.TAF_FEE
+            else:
+                _name = ActivityName.FEE
+        elif _type == ActivityType.DIV:
+            _name = ActivityName.DIV
+        else:
+            _name = _type
+        _activities.append(
+            Activity(
+                activity_type=_type,
+                activity_name=_name,
+                date=_date,
+                amount=_amount,
+                symbol=_activity.get("symbol", None),
+            )
+        )
+    return _activities
+
+
+def best_of(func: Callable[[Any], Any], arg: Any, repeat: int) -> float:
+    """Get the best time in milliseconds of the function over the repetitions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    """Run the benchmark for each number of activities."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--activities", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'activities':>10} {'chain (ms)':>11} {'tables (ms)':>12} {'speedup':>8}")
+    for count in args.activities:
+        activities = make_activities(count)
+        assert [a.json() for a in parsers.parse_activities(activities)] == [
+            a.json() for a in parse_activities_with_chain(activities)
+        ]
+        chain_ms = best_of(parse_activities_with_chain, activities, args.repeat)
+        tables_ms = best_of(parsers.parse_activities, activities, args.repeat)
+        print(f"{count:>10} {chain_ms:>11.1f} {tables_ms:>12.1f} {chain_ms / tables_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
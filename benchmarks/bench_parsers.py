@@ -0,0 +1,106 @@
+"""
+Serialization time of bars and end of day equity with pandas and with the NumPy parsers.
+
+The pandas path is the one the routes used before: a dataframe, `pd.to_datetime(...).dt.strftime`
+and `parse_df_to_list`. The NumPy path uses the arrays by column of `api.parsers`.
+
+    python benchmarks/bench_parsers.py --rows 1000 10000 100000
+"""
+import argparse
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pandas as pd
+from alpaca.data import BarSet
+
+from alpaca_partner_backend.api import parsers
+
+START = datetime(2000, 1, 3, 5, tzinfo=timezone.utc)
+
+
+def make_raw_bars(rows: int) -> list[dict[str, Any]]:
+    """Create raw bars like the ones of the market data API, one per minute."""
+    return [
+        {
+            "t": (START + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "o": 100.0 + i,
+            "h": 101.0 + i,
+            "l": 99.0 + i,
+            "c": 100.5 + i,
+            "v": 1_000_000 + i,
+            "n": 10_000 + i,
+            "vw": 100.25 + i,
+        }
+        for i in range(rows)
+    ]
+
+
+def bars_with_pandas(raw_bars: list[dict[str, Any]]) -> list[list[Any]]:
+    """Serialize the bars like the prices route did with pandas."""
+    _df = BarSet({"AAPL": raw_bars}).df
+    _df.reset_index(inplace=True)
+    _df.drop("symbol", inplace=True, axis=1)
+    _df["timestamp"] = pd.to_datetime(_df["timestamp"], unit="s").dt.strftime("%Y-%m-%d")
+    return parsers.parse_df_to_list(_df)
+
+
+def bars_with_numpy(raw_bars: list[dict[str, Any]]) -> list[list[Any]]:
+    """Serialize the bars like the prices route does."""
+    return parsers.parse_columns_to_list(parsers.parse_raw_bars_to_columns(raw_bars))
+
+
+def equity_with_pandas(equity_eod: list[tuple[int, float]]) -> list[list[Any]]:
+    """Serialize the equity like the portfolio history route did with pandas."""
+    timestamps, equity = zip(*equity_eod, strict=True)
+    _df = pd.DataFrame({"day": timestamps, "equity": equity})
+    _df["day"] = pd.to_datetime(_df["day"], unit="s").dt.strftime("%Y-%m-%d")
+    return parsers.parse_df_to_list(_df)
+
+
+def equity_with_numpy(equity_eod: list[tuple[int, float]]) -> list[list[Any]]:
+    """Serialize the equity like the portfolio history route does."""
+    return parsers.parse_equity_eod_to_list(equity_eod)
+
+
+def best_of(func: Callable[[Any], Any], arg: Any, repeat: int) -> float:
+    """Get the best time in milliseconds of the function over the repetitions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    """Run the benchmark for each number of rows."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'payload':>8} {'rows':>8} {'pandas (ms)':>12} {'numpy (ms)':>12} {'speedup':>8}")
+    for rows in args.rows:
+        raw_bars = make_raw_bars(rows)
+        equity_eod = [
+            (int((START + timedelta(minutes=i)).timestamp()), 1000.0 + i) for i in range(rows)
+        ]
+        assert bars_with_numpy(raw_bars) == bars_with_pandas(raw_bars)
+        assert equity_with_numpy(equity_eod) == equity_with_pandas(equity_eod)
+        payloads: list[tuple[str, Callable[[Any], Any], Callable[[Any], Any], Any]] = [
+            ("bars", bars_with_pandas, bars_with_numpy, raw_bars),
+            ("equity", equity_with_pandas, equity_with_numpy, equity_eod),
+        ]
+        for payload, with_pandas, with_numpy, arg in payloads:
+            pandas_ms = best_of(with_pandas, arg, args.repeat)
+            numpy_ms = best_of(with_numpy, arg, args.repeat)
+            print(
+                f"{payload:>8} {rows:>8} {pandas_ms:>12.2f} {numpy_ms:>12.2f} "
+                f"{pandas_ms / numpy_ms:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Latency the pre-trade checks add to the orders that pass them, the happy path.
+
+The checks run against a catalogue of active assets and a cached trading account,
+so they do not add a round trip: the time is the lookup of the asset and the checks,
+to compare with the round trip to the Broker API that they save to the rejected orders.
+
+    python benchmarks/bench_pre_trade.py --assets 10000 --orders 10000
+"""
+import argparse
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+from uuid import uuid4
+
+import anyio
+from alpaca.trading import (
+    Asset,
+    AssetClass,
+    AssetExchange,
+    AssetStatus,
+    OrderRequest,
+    OrderSide,
+    OrderType,
+    TimeInForce,
+    TradeAccount,
+)
+
+from alpaca_partner_backend.api.routes import orders
+from alpaca_partner_backend.api.routes.accounts import trade_accounts_cache
+
+ACCOUNT_ID = str(uuid4())
+
+
+def make_assets(count: int) -> dict[str, Asset]:
+    """Create the catalogue of assets by symbol, a tenth of them not fractionable."""
+    return {
+        f"SYM{i}": Asset(
+            **{
+                "id": uuid4(),
+                "class": AssetClass.US_EQUITY,
+                "exchange": AssetExchange.NASDAQ,
+                "symbol": f"SYM{i}",
+                "status": AssetStatus.ACTIVE,
+                "tradable": True,
+                "marginable": True,
+                "shortable": True,
+                "easy_to_borrow": True,
+                "fractionable": i % 10 != 0,
+            }
+        )
+        for i in range(count)
+    }
+
+
+def make_orders(count: int, assets: int) -> list[OrderRequest]:
+    """Create orders that pass the checks, by notional for the fractionable assets."""
+    return [
+        OrderRequest(
+            symbol=f"SYM{i % assets}",
+            side=OrderSide.BUY,
+            type=OrderType.MARKET,
+            time_in_force=TimeInForce.DAY,
+            **({"qty": 1} if i % assets % 10 == 0 else {"notional": 10}),
+        )
+        for i in range(count)
+    ]
+
+
+def best_of(func: Callable[[], Awaitable[Any]], repeat: int) -> float:
+    """Get the best time in milliseconds of the coroutine function over the repetitions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        anyio.run(func)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main() -> None:
+    """Run the benchmark with and without a snapshot of the trading account."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--assets", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    assets = make_assets(args.assets)
+    order_requests = make_orders(args.orders, args.assets)
+    trade_account = TradeAccount(
+        id=ACCOUNT_ID, account_number="123456789", status="ACTIVE", buying_power="1000000"
+    )
+
+    async def check_orders() -> None:
+        # the broker client is only used to refresh the snapshot before rejecting an order
+        for order_request in order_requests:
+            await orders._check_order(order_request, ACCOUNT_ID, assets, None)  # type: ignore
+
+    print(f"{'snapshot':>9} {'orders':>7} {'total (ms)':>11} {'per order (us)':>15}")
+    for snapshot in (False, True):
+        trade_accounts_cache.clear()
+        if snapshot:
+            trade_accounts_cache.set(ACCOUNT_ID, trade_account)
+        total_ms = best_of(check_orders, args.repeat)
+        print(
+            f"{str(snapshot):>9} {len(order_requests):>7} {total_ms:>11.2f} "
+            f"{total_ms * 1000 / len(order_requests):>15.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
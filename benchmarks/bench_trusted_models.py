@@ -0,0 +1,148 @@
+"""
+CPU time of building the responses of the Broker API with and without validation.
+
+- validated: the models are validated again from the upstream data, the default.
+- trusted: the models are built with `construct_trusted`, `TRUSTED_UPSTREAM_MODELS=true`.
+
+The payloads are the raw orders of `GET /orders/` and the account of `GET /accounts/`,
+and the JSON of both paths is asserted to be the same.
+
+    python benchmarks/bench_trusted_models.py --orders 500
+"""
+import argparse
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+from uuid import uuid4
+
+from alpaca.broker import Account
+
+from alpaca_partner_backend.api import parsers
+from alpaca_partner_backend.api.responses import FastJSONResponse
+from alpaca_partner_backend.settings import SETTINGS
+
+RAW_ORDER: dict[str, Any] = {
+    "client_order_id": "eb9e2aaa-f71a-4f51-b5b4-52a6c565dad4",
+    "created_at": "2021-03-16T18:38:01.942282Z",
+    "updated_at": "2021-03-16T18:38:01.942282Z",
+    "submitted_at": "2021-03-16T18:38:01.937734Z",
+    "filled_at": "2021-03-16T18:38:02.012345Z",
+    "expired_at": None,
+    "canceled_at": None,
+    "failed_at": None,
+    "replaced_at": None,
+    "replaced_by": None,
+    "replaces": None,
+    "asset_id": "b0b6dd9d-8b9b-48a9-ba46-b9d54906e415",
+    "symbol": "AAPL",
+    "asset_class": "us_equity",
+    "notional": None,
+    "qty": "2",
+    "filled_qty": "2",
+    "filled_avg_price": "125.07",
+    "order_class": "",
+    "order_type": "market",
+    "type": "market",
+    "side": "buy",
+    "time_in_force": "day",
+    "limit_price": None,
+    "stop_price": None,
+    "status": "filled",
+    "extended_hours": False,
+    "legs": None,
+    "trail_percent": None,
+    "trail_price": None,
+    "hwm": None,
+    "commission": "0",
+}
+RAW_ACCOUNT = {
+    "id": "7ccfd029-9b91-40d0-9b4c-f928385af666",
+    "account_number": "808971365",
+    "status": "ACTIVE",
+    "crypto_status": "ACTIVE",
+    "currency": "USD",
+    "last_equity": "10000",
+    "created_at": "2022-08-16T20:19:20.547306Z",
+    "contact": {
+        "email_address": "bench@example.com",
+        "phone_number": "555-666-7788",
+        "street_address": ["20 N San Mateo Dr"],
+        "city": "San Mateo",
+        "state": "CA",
+        "postal_code": "94401",
+    },
+    "identity": {
+        "given_name": "John",
+        "family_name": "Doe",
+        "date_of_birth": "1990-01-01",
+        "country_of_tax_residence": "USA",
+        "funding_source": ["employment_income"],
+    },
+    "disclosures": {
+        "is_control_person": False,
+        "is_affiliated_exchange_or_finra": False,
+        "is_politically_exposed": False,
+        "immediate_family_exposed": False,
+    },
+    "agreements": [
+        {"agreement": agreement, "signed_at": "2022-08-16T20:19:20Z", "ip_address": "127.0.0.1"}
+        for agreement in ("margin_agreement", "account_agreement", "customer_agreement")
+    ],
+    "documents": [],
+}
+
+
+def parse_orders(raw_orders: list[dict[str, Any]]) -> list[Any]:
+    """Parse the orders like the orders route does."""
+    return [parsers.parse_raw_order(raw_order) for raw_order in raw_orders]
+
+
+def parse_account(account: Account) -> Any:
+    """Parse the account like the accounts route does."""
+    return parsers.parse_account_to_jsonable(account)
+
+
+def best_of(func: Callable[[Any], Any], arg: Any, repeat: int, trusted: bool) -> float:
+    """Get the best time in milliseconds of the function over the repetitions."""
+    SETTINGS.TRUSTED_UPSTREAM_MODELS = trusted
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def to_json(func: Callable[[Any], Any], arg: Any, trusted: bool) -> Any:
+    """Get the JSON of the response like the API serializes it."""
+    SETTINGS.TRUSTED_UPSTREAM_MODELS = trusted
+    return json.loads(FastJSONResponse(func(arg)).body)
+
+
+def main() -> None:
+    """Run the benchmark for the orders and the account."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    raw_orders = [{**RAW_ORDER, "id": str(uuid4())} for _ in range(args.orders)]
+    account = Account(**RAW_ACCOUNT)
+    print(f"{'payload':>8} {'count':>6} {'validated':>10} {'trusted':>10} {'saved':>10}")
+    payloads: list[tuple[str, Callable[[Any], Any], Any, int]] = [
+        ("orders", parse_orders, raw_orders, len(raw_orders)),
+        ("account", parse_account, account, 1),
+    ]
+    for payload, func, arg, count in payloads:
+        assert to_json(func, arg, trusted=True) == to_json(func, arg, trusted=False)
+        validated_ms = best_of(func, arg, args.repeat, trusted=False)
+        trusted_ms = best_of(func, arg, args.repeat, trusted=True)
+        print(
+            f"{payload:>8} {count:>6} {validated_ms:>8.3f}ms {trusted_ms:>8.3f}ms "
+            f"{validated_ms - trusted_ms:>8.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
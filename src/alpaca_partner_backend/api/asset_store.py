@@ -0,0 +1,151 @@
+"""
+Compact in-memory store of the assets, indexed for the lookups of the routes.
+
+The thousands of assets of the catalogue are kept as `AssetRecord`s, whose slots take
+a fraction of the memory of the pydantic models, with:
+
+- hash indexes by symbol and ID, to the active asset if a symbol has been reused, and by name
+  to all the assets with it; the lookups return the records, the models are built only
+  for the responses;
+- the partitions of the assets listed by the routes, the tradable and fractionable ones,
+  by status, class and exchange, so a filter only merges the partitions it matches.
+"""
+import heapq
+from array import array
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any
+from uuid import UUID
+
+from alpaca.trading import Asset, AssetClass, AssetExchange, AssetStatus
+
+AssetsFilter = tuple[AssetStatus | None, AssetClass | None, AssetExchange | None]
+# the fields of the assets with their alias in the JSON of the Broker API
+ASSET_ALIASES = {name: field.alias for name, field in Asset.__fields__.items()}
+
+
+class AssetRecord:
+    """Fields of an `Asset`, in slots instead of the dict and fields set of the model."""
+
+    __slots__ = tuple(ASSET_ALIASES)
+
+    id: UUID  # noqa: A003
+    asset_class: AssetClass
+    exchange: AssetExchange
+    symbol: str
+    name: str | None
+    status: AssetStatus
+    tradable: bool
+    marginable: bool
+    shortable: bool
+    easy_to_borrow: bool
+    fractionable: bool
+    min_order_size: float | None
+    min_trade_increment: float | None
+    price_increment: float | None
+    maintenance_margin_requirement: float | None
+
+    def __init__(self, asset: Asset) -> None:
+        """Copy the fields of the validated asset."""
+        for name in ASSET_ALIASES:
+            setattr(self, name, getattr(asset, name))
+
+    def to_asset(self) -> Asset:
+        """Build the asset model again, without validating it."""
+        return Asset.construct(**{name: getattr(self, name) for name in ASSET_ALIASES})
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the asset by alias, like `Asset.dict(by_alias=True)` to serialize it."""
+        return {alias: getattr(self, name) for name, alias in ASSET_ALIASES.items()}
+
+
+class AssetStore(Mapping[str, AssetRecord]):
+    """Assets by symbol, with the indexes by name and ID and the partitions of the routes."""
+
+    def __init__(self, assets: Iterable[Asset] = ()) -> None:
+        """
+        Store of the assets.
+
+        Parameters
+        ----------
+        `assets`: Iterable[Asset]
+            the assets in the order of the catalogue, which is the order of the listings.
+        """
+        self.records = tuple(AssetRecord(asset) for asset in assets)
+        self._by_symbol: dict[str, int] = {}
+        # the rows of the assets by name, in the store order, as a name can be shared
+        self._by_name: defaultdict[str, list[int]] = defaultdict(list)
+        self._by_id: dict[UUID, int] = {}
+        # the rows of the listed assets by status, class and exchange, in ascending order
+        self._partitions: defaultdict[
+            tuple[AssetStatus, AssetClass, AssetExchange], array[int]
+        ] = defaultdict(lambda: array("L"))
+        # the listed assets of the filters already selected, references to the records
+        self._selections: dict[AssetsFilter, list[AssetRecord]] = {}
+        for row, record in enumerate(self.records):
+            self._index(self._by_symbol, record.symbol, row)
+            if record.name:
+                self._by_name[record.name].append(row)
+            self._by_id[record.id] = row
+            if record.tradable is True and record.fractionable is True:
+                self._partitions[(record.status, record.asset_class, record.exchange)].append(row)
+
+    def _index(self, index: dict[str, int], key: str, row: int) -> None:
+        """Index the row by the key, unless it is taken by an active asset."""
+        current = index.get(key)
+        if current is None or (
+            self.records[current].status != AssetStatus.ACTIVE
+            and self.records[row].status == AssetStatus.ACTIVE
+        ):
+            index[key] = row
+
+    def __getitem__(self, symbol: str) -> AssetRecord:
+        """Get the asset with the symbol, the active one if the symbol has been reused."""
+        return self.records[self._by_symbol[symbol]]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the symbols."""
+        return iter(self._by_symbol)
+
+    def __len__(self) -> int:
+        """Get the number of symbols."""
+        return len(self._by_symbol)
+
+    def get_by_name(self, name: str) -> AssetRecord | None:
+        """Get the asset with the name, the first active one if the name has been reused."""
+        records = self.get_all_by_name(name)
+        return next(
+            (record for record in records if record.status == AssetStatus.ACTIVE),
+            records[0] if records else None,
+        )
+
+    def get_all_by_name(self, name: str) -> list[AssetRecord]:
+        """Get the assets with the name, in the store order."""
+        return [self.records[row] for row in self._by_name.get(name, ())]
+
+    def get_by_id(self, asset_id: UUID | str) -> AssetRecord | None:
+        """Get the asset with the ID."""
+        row = self._by_id.get(UUID(str(asset_id)))
+        return self.records[row] if row is not None else None
+
+    def select(
+        self,
+        status: AssetStatus | None = AssetStatus.ACTIVE,
+        asset_class: AssetClass | None = None,
+        exchange: AssetExchange | None = None,
+    ) -> list[AssetRecord]:
+        """Get the tradable and fractionable assets that match the filters, in the store order."""
+        key = (status, asset_class, exchange)
+        records = self._selections.get(key)
+        if records is None:
+            partitions = [
+                rows
+                for (_status, _asset_class, _exchange), rows in self._partitions.items()
+                if (status is None or _status == status)
+                and (asset_class is None or _asset_class == asset_class)
+                and (exchange is None or _exchange == exchange)
+            ]
+            records = self._selections[key] = [
+                self.records[row] for row in heapq.merge(*partitions)
+            ]
+        return records
@@ -0,0 +1,683 @@
+"""
+Async clients for the Broker and Market Data APIs.
+
+The clients mirror the methods of alpaca-py's `BrokerClient` and `StockHistoricalDataClient`
+used by the routers, while the HTTP requests are delegated to a transport:
+
+- `HTTPXTransport` sends them with a pooled `httpx.AsyncClient`, so an in-flight upstream call
+  does not hold a thread of the threadpool.
+- `ThreadedTransport` is the opt-in fallback that runs the requests of the sync alpaca-py
+  client in the threadpool.
+"""
+import functools
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import anyio
+import httpx
+from alpaca.broker import (
+    Account,
+    BrokerClient,
+    CreateAccountRequest,
+    CreateJournalRequest,
+    GetAccountActivitiesRequest,
+    Journal,
+    Order,
+    TradeAccount,
+)
+from alpaca.common.constants import (
+    ACCOUNT_ACTIVITIES_DEFAULT_PAGE_SIZE,
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_EXCEPTION_CODES,
+    DEFAULT_RETRY_WAIT_SECONDS,
+)
+from alpaca.common.enums import BaseURL, Sort
+from alpaca.common.exceptions import APIError
+from alpaca.common.requests import NonEmptyRequest
+from alpaca.common.rest import RESTClient
+from alpaca.common.types import HTTPResult
+from alpaca.data import BarSet, Quote, StockBarsRequest, StockLatestQuoteRequest
+from alpaca.data.historical.utils import format_dataset_response, format_latest_data_response
+from alpaca.trading import (
+    Asset,
+    BaseActivity,
+    ClosePositionRequest,
+    GetAssetsRequest,
+    GetOrdersRequest,
+    GetPortfolioHistoryRequest,
+    OrderRequest,
+    PortfolioHistory,
+    Position,
+)
+from pydantic import parse_obj_as
+from pydantic.datetime_parse import parse_datetime
+
+log = logging.getLogger(__name__)
+
+# the maximum number of orders of a single request to the Broker API
+ORDERS_MAX_LIMIT = 500
+# the Broker API filters the orders strictly after or until a time, with microseconds,
+# so the cursors are moved by one to include the orders submitted at the cursor
+ORDERS_CURSOR_TICK = timedelta(microseconds=1)
+
+
+def next_orders_filter(
+    orders_filter: GetOrdersRequest,
+    page: list[dict[str, Any]],
+    seen_ids: frozenset[str] = frozenset(),
+) -> tuple[GetOrdersRequest, frozenset[str]]:
+    """
+    Get the filter of the page of orders after the page, by submission time.
+
+    The page ends at a time that other orders might share, the next page includes that time
+    and skips the orders returned already.
+
+    Parameters
+    ----------
+    `orders_filter`: GetOrdersRequest
+        the filter of the page.
+    `page`: list[dict[str, Any]]
+        the raw orders of the page, sorted by submission time.
+    `seen_ids`: frozenset[str]
+        the IDs of the orders returned before the page, submitted at its first time.
+
+    Returns
+    -------
+    `tuple[GetOrdersRequest, frozenset[str]]`:
+        the filter of the next page, and the IDs of the orders submitted at its cursor.
+    """
+    cursor = page[-1]["submitted_at"]
+    at_cursor = frozenset(order["id"] for order in page if order["submitted_at"] == cursor)
+    if page[0]["submitted_at"] == cursor:
+        # the whole page has been submitted at the same time as the previous one
+        at_cursor |= seen_ids
+    return orders_filter_from(orders_filter, parse_datetime(cursor)), at_cursor
+
+
+def orders_filter_from(orders_filter: GetOrdersRequest, cursor: datetime) -> GetOrdersRequest:
+    """Get the filter of the orders from the submission time included, in its direction."""
+    next_filter = orders_filter.copy()
+    if orders_filter.direction == Sort.ASC:
+        next_filter.after = cursor - ORDERS_CURSOR_TICK
+    else:
+        next_filter.until = cursor + ORDERS_CURSOR_TICK
+    return next_filter
+
+
+def _to_request_fields(request: NonEmptyRequest) -> dict[str, Any]:
+    """
+    Get the fields of the request to send, with the datetimes in UTC.
+
+    alpaca-py formats the datetimes as UTC by appending a Z, so the aware ones are converted
+    to naive UTC datetimes first, e.g. the ones parsed from the query params of the routes.
+    """
+    aware = {
+        name: value.astimezone(timezone.utc).replace(tzinfo=None)
+        for name, value in request
+        if isinstance(value, datetime) and value.tzinfo is not None
+    }
+    return (request.copy(update=aware) if aware else request).to_request_fields()
+
+
+def _to_params(data: dict[str, Any] | None) -> dict[str, Any]:
+    """Encode the query params like requests does: skip empty values, the others as strings."""
+    return {
+        k: v if isinstance(v, str | int | float) else str(v)
+        for k, v in (data or {}).items()
+        if v is not None
+    }
+
+
+class AsyncTransport(ABC):
+    """Interface to send the requests of the async clients."""
+
+    @abstractmethod
+    async def request(
+        self,
+        method: str,
+        path: str,
+        data: dict[str, Any] | None = None,
+        api_version: str | None = None,
+    ) -> HTTPResult:
+        """
+        Send a request and return the decoded JSON response.
+
+        Parameters
+        ----------
+        `method`: str
+            the HTTP method.
+        `path`: str
+            the endpoint path after the API version.
+        `data`: dict[str, Any] | None
+            the query parameters for GET and DELETE, the JSON payload otherwise.
+        `api_version`: str | None
+            the API version, defaults to the one of the client.
+
+        Raises
+        ------
+        `APIError`:
+            if the API returns an error status code.
+        """
+
+    @abstractmethod
+    async def request_content(self, path: str, api_version: str | None = None) -> bytes:
+        """Send a GET request and return the raw content of the response."""
+
+    @abstractmethod
+    async def aclose(self) -> None:
+        """Release the connections of the transport."""
+
+
+class HTTPXTransport(AsyncTransport):
+    """Transport with a pooled keep-alive `httpx.AsyncClient`, HTTP/2 if enabled."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        base_url: str,
+        api_version: str,
+        headers: dict[str, str],
+        limits: httpx.Limits | None = None,
+        timeout: float = 10.0,
+        http2: bool = False,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """
+        Transport with a pooled HTTP client.
+
+        Parameters
+        ----------
+        `base_url`: str
+            the base URL of the API.
+        `api_version`: str
+            the default API version.
+        `headers`: dict[str, str]
+            the headers sent with every request, including authentication.
+        `limits`: httpx.Limits | None
+            the limits of the connection pool.
+        `timeout`: float
+            the timeout in seconds of every request.
+        `http2`: bool
+            whether to negotiate HTTP/2, it requires the `h2` package.
+        `transport`: httpx.AsyncBaseTransport | None
+            the low level transport, overridden in the tests.
+        """
+        self.api_version = api_version
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            limits=limits or httpx.Limits(),
+            timeout=timeout,
+            http2=http2,
+            transport=transport,
+        )
+
+    @classmethod
+    def from_rest_client(cls, rest_client: RESTClient, **kwargs: Any) -> "HTTPXTransport":
+        """Create the transport with the URL, version and credentials of an alpaca-py client."""
+        base_url = rest_client._base_url
+        return cls(
+            # the default URLs are `BaseURL` members, whose `str` is not the value
+            base_url=base_url.value if isinstance(base_url, BaseURL) else base_url,
+            api_version=rest_client._api_version,
+            headers=rest_client._get_default_headers(),
+            **kwargs,
+        )
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        data: dict[str, Any] | None = None,
+        api_version: str | None = None,
+    ) -> httpx.Response:
+        """Send the request retrying on rate limits like alpaca-py does."""
+        url = f"/{api_version or self.api_version}{path}"
+        if method.upper() in ["GET", "DELETE"]:
+            request = self.client.build_request(method, url, params=_to_params(data))
+        else:
+            request = self.client.build_request(method, url, json=data)
+        for retry in range(DEFAULT_RETRY_ATTEMPTS, -1, -1):
+            response = await self.client.send(request)
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as http_error:
+                if response.status_code in DEFAULT_RETRY_EXCEPTION_CODES and retry > 0:
+                    await anyio.sleep(DEFAULT_RETRY_WAIT_SECONDS)
+                    continue
+                raise APIError(response.text, http_error) from http_error
+            break
+        return response
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        data: dict[str, Any] | None = None,
+        api_version: str | None = None,
+    ) -> HTTPResult:
+        """Send the request with the pooled client."""
+        response = await self._send(method, path, data=data, api_version=api_version)
+        return response.json() if response.content else None
+
+    async def request_content(self, path: str, api_version: str | None = None) -> bytes:
+        """Send the GET request with the pooled client."""
+        response = await self._send("GET", path, api_version=api_version)
+        return response.content
+
+    async def stream_lines(
+        self,
+        path: str,
+        data: dict[str, Any] | None = None,
+        api_version: str | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Send a GET request and iterate over the lines of the response as they arrive.
+
+        The response has no read timeout, since a stream such as the events of the Broker API
+        can be idle for longer than the timeout of the requests.
+
+        Raises
+        ------
+        `APIError`:
+            if the API returns an error status code.
+        """
+        async with self.client.stream(
+            "GET",
+            f"/{api_version or self.api_version}{path}",
+            params=_to_params(data),
+            timeout=httpx.Timeout(self.client.timeout.connect, read=None),
+        ) as response:
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as http_error:
+                await response.aread()
+                raise APIError(response.text, http_error) from http_error
+            async for line in response.aiter_lines():
+                yield line
+
+    async def aclose(self) -> None:
+        """Close the pooled client."""
+        await self.client.aclose()
+
+
+class ThreadedTransport(AsyncTransport):
+    """Fallback transport running the requests of a sync alpaca-py client in the threadpool."""
+
+    def __init__(self, rest_client: RESTClient) -> None:
+        """
+        Transport with a sync client.
+
+        Parameters
+        ----------
+        `rest_client`: RESTClient
+            the alpaca-py client that sends the requests.
+        """
+        self.rest_client = rest_client
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        data: dict[str, Any] | None = None,
+        api_version: str | None = None,
+    ) -> HTTPResult:
+        """Send the request with the sync client in a worker thread."""
+        return await anyio.to_thread.run_sync(
+            functools.partial(
+                self.rest_client._request,
+                method,
+                path,
+                data,
+                api_version=api_version,
+            )
+        )
+
+    def _get_content(self, path: str, api_version: str | None = None) -> bytes:
+        """Send the GET request with the session of the sync client."""
+        response = self.rest_client._session.get(
+            url=f"{self.rest_client._base_url}/{api_version or self.rest_client._api_version}{path}",
+            headers=self.rest_client._get_default_headers(),
+        )
+        try:
+            response.raise_for_status()
+        except Exception as http_error:
+            raise APIError(response.text, http_error) from http_error
+        return response.content
+
+    async def request_content(self, path: str, api_version: str | None = None) -> bytes:
+        """Send the GET request with the sync client in a worker thread."""
+        return await anyio.to_thread.run_sync(
+            functools.partial(self._get_content, path, api_version=api_version)
+        )
+
+    async def aclose(self) -> None:
+        """Nothing to release, the connections belong to the sync client."""
+
+
+class AsyncBrokerClient:
+    """Async client for the Broker API endpoints used by the routers."""
+
+    def __init__(self, transport: AsyncTransport) -> None:
+        """
+        Async Broker API client.
+
+        Parameters
+        ----------
+        `transport`: AsyncTransport
+            the transport that sends the requests.
+        """
+        self.transport = transport
+
+    async def get(self, path: str, data: dict[str, Any] | None = None) -> HTTPResult:
+        """Send a GET request and return the raw response."""
+        return await self.transport.request("GET", path, data)
+
+    async def create_account(self, account_data: CreateAccountRequest) -> Account:
+        """Create an account."""
+        response = await self.transport.request(
+            "POST", "/accounts", account_data.to_request_fields()
+        )
+        assert isinstance(response, dict)
+        return Account(**response)
+
+    async def get_account_by_id(self, account_id: str) -> Account:
+        """Get the account with that ID."""
+        response = await self.transport.request("GET", f"/accounts/{account_id}")
+        assert isinstance(response, dict)
+        return Account(**response)
+
+    async def get_trade_account_by_id(self, account_id: str) -> TradeAccount:
+        """Get the trading information of the account with that ID."""
+        response = await self.transport.request("GET", f"/trading/accounts/{account_id}/account")
+        assert isinstance(response, dict)
+        return TradeAccount(**response)
+
+    async def get_portfolio_history_for_account(
+        self,
+        account_id: str,
+        history_filter: GetPortfolioHistoryRequest | None = None,
+    ) -> PortfolioHistory:
+        """Get the portfolio history of the account."""
+        response = await self.transport.request(
+            "GET",
+            f"/trading/accounts/{account_id}/account/portfolio/history",
+            _to_request_fields(history_filter) if history_filter else {},
+        )
+        assert isinstance(response, dict)
+        return PortfolioHistory(**response)
+
+    async def get_account_activities_page(
+        self,
+        activity_filter: GetAccountActivitiesRequest,
+    ) -> list[BaseActivity]:
+        """Get a single page of the activities matching the filter."""
+        request_fields = _to_request_fields(activity_filter)
+        if isinstance(request_fields.get("activity_types"), list):
+            request_fields["activity_types"] = ",".join(request_fields["activity_types"])
+        result = await self.transport.request("GET", "/accounts/activities", request_fields)
+        if not isinstance(result, list):
+            return []
+        return [BrokerClient._parse_activity(activity) for activity in result]
+
+    async def iter_account_activities(
+        self,
+        activity_filter: GetAccountActivitiesRequest,
+    ) -> AsyncIterator[list[BaseActivity]]:
+        """Iterate over the pages of the activities matching the filter, as they arrive."""
+        page_filter = activity_filter.copy()
+        page_size = activity_filter.page_size or ACCOUNT_ACTIVITIES_DEFAULT_PAGE_SIZE
+        while True:
+            page = await self.get_account_activities_page(page_filter)
+            if page:
+                yield page
+            # a date filter makes the API return all the results in one page
+            if len(page) < page_size:
+                break
+            page_filter.page_token = page[-1].id
+
+    async def get_account_activities(
+        self,
+        activity_filter: GetAccountActivitiesRequest,
+    ) -> list[BaseActivity]:
+        """Get all the activities matching the filter, following the pagination."""
+        return [
+            activity
+            async for page in self.iter_account_activities(activity_filter)
+            for activity in page
+        ]
+
+    async def get_all_assets(self, asset_filter: GetAssetsRequest | None = None) -> list[Asset]:
+        """Get the assets matching the filter, all of them by default."""
+        response = await self.transport.request(
+            "GET", "/assets", _to_request_fields(asset_filter) if asset_filter else {}
+        )
+        assert isinstance(response, list)
+        return parse_obj_as(list[Asset], response)
+
+    async def get_asset(self, symbol_or_asset_id: str) -> Asset:
+        """Get the asset with that symbol or ID."""
+        response = await self.transport.request("GET", f"/assets/{symbol_or_asset_id}")
+        assert isinstance(response, dict)
+        return Asset(**response)
+
+    async def get_all_positions_for_account(self, account_id: str) -> list[Position]:
+        """Get the open positions of the account."""
+        response = await self.transport.request("GET", f"/trading/accounts/{account_id}/positions")
+        assert isinstance(response, list)
+        return parse_obj_as(list[Position], response)
+
+    async def close_position_for_account(
+        self,
+        account_id: str,
+        symbol_or_asset_id: str,
+        close_options: ClosePositionRequest | None = None,
+    ) -> dict[str, Any]:
+        """Close the position in the symbol, or a part of it, and return the raw closing order."""
+        response = await self.transport.request(
+            "DELETE",
+            f"/trading/accounts/{account_id}/positions/{symbol_or_asset_id}",
+            close_options.to_request_fields() if close_options else {},
+        )
+        assert isinstance(response, dict)
+        return response
+
+    async def submit_order_for_account(self, account_id: str, order_data: OrderRequest) -> Order:
+        """Submit an order for the account."""
+        response = await self.transport.request(
+            "POST", f"/trading/accounts/{account_id}/orders", order_data.to_request_fields()
+        )
+        assert isinstance(response, dict)
+        return Order(**response)
+
+    async def get_orders_for_account(
+        self,
+        account_id: str,
+        filter: GetOrdersRequest | None = None,  # noqa: A002
+    ) -> list[dict[str, Any]]:
+        """Get the raw orders of the account matching the filter."""
+        params = _to_request_fields(filter) if filter is not None else {}
+        if isinstance(params.get("symbols"), list):
+            params["symbols"] = ",".join(params["symbols"])
+        response = await self.transport.request(
+            "GET", f"/trading/accounts/{account_id}/orders", params
+        )
+        assert isinstance(response, list)
+        return response
+
+    async def iter_orders_for_account(
+        self,
+        account_id: str,
+        filter: GetOrdersRequest,  # noqa: A002
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Iterate over the pages of the raw orders of the account matching the filter.
+
+        The orders are sorted by submission time, so the next page starts at the time
+        of the last order of the page, see `next_orders_filter`.
+        """
+        page_filter = filter.copy()
+        page_filter.limit = page_filter.limit or ORDERS_MAX_LIMIT
+        seen_ids: frozenset[str] = frozenset()
+        while True:
+            page, more = await self.get_orders_page_for_account(account_id, page_filter, seen_ids)
+            if page:
+                yield page
+            if not more:
+                break
+            page_filter, seen_ids = next_orders_filter(page_filter, page, seen_ids)
+
+    async def get_orders_page_for_account(
+        self,
+        account_id: str,
+        filter: GetOrdersRequest,  # noqa: A002
+        seen_ids: frozenset[str] = frozenset(),
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """
+        Get a page of the raw orders of the account, without the ones returned already.
+
+        Returns
+        -------
+        `tuple[list[dict[str, Any]], bool]`:
+            the orders, at most the limit of the filter, and if there might be more.
+        """
+        limit = filter.limit or ORDERS_MAX_LIMIT
+        page_filter = filter.copy()
+        # the orders returned already count in the limit of the Broker API
+        page_filter.limit = min(limit + len(seen_ids), ORDERS_MAX_LIMIT)
+        raw_orders = await self.get_orders_for_account(account_id, page_filter)
+        page = [order for order in raw_orders if order["id"] not in seen_ids]
+        more = len(page) > limit or (bool(page) and len(raw_orders) == page_filter.limit)
+        return page[:limit], more
+
+    async def get_all_orders_for_account(
+        self,
+        account_id: str,
+        filter: GetOrdersRequest,  # noqa: A002
+    ) -> list[dict[str, Any]]:
+        """Get all the raw orders of the account matching the filter, following the pages."""
+        return [
+            order
+            async for page in self.iter_orders_for_account(account_id, filter)
+            for order in page
+        ]
+
+    async def get_order_for_account_by_id(self, account_id: str, order_id: str) -> dict[str, Any]:
+        """Get the raw order of the account."""
+        response = await self.transport.request(
+            "GET", f"/trading/accounts/{account_id}/orders/{order_id}"
+        )
+        assert isinstance(response, dict)
+        return response
+
+    async def get_order_for_account_by_client_id(
+        self,
+        account_id: str,
+        client_order_id: str,
+    ) -> dict[str, Any]:
+        """Get the raw order of the account by the client order ID."""
+        response = await self.transport.request(
+            "GET",
+            f"/trading/accounts/{account_id}/orders:by_client_order_id",
+            {"client_order_id": client_order_id},
+        )
+        assert isinstance(response, dict)
+        return response
+
+    async def cancel_order_for_account_by_id(self, account_id: str, order_id: str) -> None:
+        """Cancel the order of the account."""
+        await self.transport.request("DELETE", f"/trading/accounts/{account_id}/orders/{order_id}")
+
+    async def create_journal(self, journal_data: CreateJournalRequest) -> Journal:
+        """Create a journal between two accounts."""
+        response = await self.transport.request(
+            "POST", "/journals", journal_data.to_request_fields()
+        )
+        assert isinstance(response, dict)
+        return Journal(**response)
+
+    async def aclose(self) -> None:
+        """Release the connections of the transport."""
+        await self.transport.aclose()
+
+
+class AsyncDataClient:
+    """Async client for the Market Data API endpoints used by the routers."""
+
+    def __init__(self, transport: AsyncTransport) -> None:
+        """
+        Async Market Data API client.
+
+        Parameters
+        ----------
+        `transport`: AsyncTransport
+            the transport that sends the requests.
+        """
+        self.transport = transport
+
+    async def _get_stock_pages(
+        self,
+        path: str,
+        params: dict[str, Any],
+        latest: bool = False,
+    ) -> dict[str, Any]:
+        """Get the stock data from all the pages of the response, by symbol."""
+        data_by_symbol: defaultdict[str, Any] = defaultdict(list)
+        page_token = None
+        while True:
+            response = await self.transport.request(
+                "GET", path, {**params, "page_token": page_token}
+            )
+            assert isinstance(response, dict)
+            if latest:
+                format_latest_data_response(response, data_by_symbol)
+            else:
+                format_dataset_response(response, data_by_symbol)
+            page_token = response.get("next_page_token", None)
+            if page_token is None:
+                break
+        return dict(data_by_symbol)
+
+    async def get_stock_bars_raw(
+        self,
+        request_params: StockBarsRequest,
+    ) -> dict[str, list[dict[str, Any]]]:
+        """Get the raw bars of a symbol or list of symbols, without parsing them to models."""
+        params = request_params.to_request_fields()
+        symbols = params.pop("symbol_or_symbols")
+        if isinstance(symbols, str):
+            path = f"/stocks/{symbols}/bars"
+        else:
+            path = "/stocks/bars"
+            params["symbols"] = ",".join(symbols)
+        return await self._get_stock_pages(path, params)
+
+    async def get_stock_bars(self, request_params: StockBarsRequest) -> BarSet:
+        """Get the bars of a symbol or list of symbols."""
+        return BarSet(await self.get_stock_bars_raw(request_params))
+
+    async def get_stock_latest_quote(
+        self,
+        request_params: StockLatestQuoteRequest,
+    ) -> dict[str, Quote]:
+        """Get the latest quote of a symbol or list of symbols."""
+        params = request_params.to_request_fields()
+        symbols = params.pop("symbol_or_symbols")
+        if isinstance(symbols, str):
+            path = f"/stocks/{symbols}/quotes/latest"
+        else:
+            path = "/stocks/quotes/latest"
+            params["symbols"] = ",".join(symbols)
+        raw_quotes = await self._get_stock_pages(path, params, latest=True)
+        return {symbol: Quote(symbol, raw_quote) for symbol, raw_quote in raw_quotes.items()}
+
+    async def get_logo(self, symbol: str) -> bytes:
+        """Get the PNG logo of the symbol."""
+        return await self.transport.request_content(f"/logos/{symbol}", api_version="v1beta1")
+
+    async def aclose(self) -> None:
+        """Release the connections of the transport."""
+        await self.transport.aclose()
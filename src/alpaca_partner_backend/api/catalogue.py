@@ -0,0 +1,176 @@
+"""
+Catalogue of the assets of the Broker API, refreshed in the background.
+
+The assets are downloaded once at startup and then on a schedule, so the routes never wait
+for the download of thousands of assets and the delisted or halted ones disappear without
+a restart. A refresh replaces the whole snapshot at once, and if it fails the assets of the
+previous one keep being served until the next.
+
+With a database the assets are stored in the assets collection, so the workers that start,
+or refresh, after another one downloaded them load them from MongoDB instead.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import anyio
+from alpaca.trading import AssetClass, AssetExchange, AssetStatus
+from fastapi.concurrency import run_in_threadpool
+
+from alpaca_partner_backend.api.asset_store import AssetRecord, AssetStore
+from alpaca_partner_backend.api.async_clients import AsyncBrokerClient
+from alpaca_partner_backend.database import MongoDatabase
+from alpaca_partner_backend.models import AssetCatalogueInfo
+from alpaca_partner_backend.utils.concurrency import SingleFlight
+
+log = logging.getLogger(__name__)
+
+
+class _Snapshot(NamedTuple):
+    """Assets of a refresh, with the time of the refresh."""
+
+    store: AssetStore
+    refreshed_at: datetime | None
+
+
+class AssetCatalogue:
+    """Assets of all the statuses, classes and exchanges, refreshed on a schedule."""
+
+    def __init__(
+        self,
+        broker_client: AsyncBrokerClient,
+        database: MongoDatabase | None = None,
+        refresh_seconds: float = 15 * 60,
+        retry_seconds: float = 60,
+    ) -> None:
+        """
+        Catalogue of the assets.
+
+        Parameters
+        ----------
+        `broker_client`: AsyncBrokerClient
+            the client that downloads the assets.
+        `database`: MongoDatabase | None
+            the database that stores the assets for the other workers, None to keep them
+            only in memory.
+        `refresh_seconds`: float
+            the time between the refreshes.
+        `retry_seconds`: float
+            the time to wait before retrying a failed refresh.
+        """
+        self.broker_client = broker_client
+        self.database = database
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self._snapshot = _Snapshot(AssetStore(), None)
+        self._stale = False
+        self._refreshes: SingleFlight[None] = SingleFlight()
+        self._refresher: asyncio.Task[None] | None = None
+
+    async def _load_stored(self) -> bool:
+        """
+        Load the stored assets if they have been refreshed within the refresh time.
+
+        Returns
+        -------
+        `bool`:
+            True if the snapshot is up to date with the stored assets.
+        """
+        if self.database is None:
+            return False
+        refreshed_at = await run_in_threadpool(self.database.get_assets_refreshed_at)
+        if refreshed_at is None:
+            return False
+        if (datetime.now(timezone.utc) - refreshed_at).total_seconds() >= self.refresh_seconds:
+            return False
+        if refreshed_at != self._snapshot.refreshed_at:
+            assets = await run_in_threadpool(self.database.get_assets, refreshed_at)
+            if not assets:
+                # replaced by the refresh of another worker since, download them instead
+                return False
+            self._snapshot = _Snapshot(AssetStore(assets), refreshed_at)
+            log.info("Loaded the catalogue of %s assets from the database", len(assets))
+        return True
+
+    async def _download(self) -> None:
+        """Download the assets and replace the snapshot, unless they have been stored already."""
+        if await self._load_stored():
+            self._stale = False
+            return
+        assets = await self.broker_client.get_all_assets()
+        now = datetime.now(timezone.utc)
+        # MongoDB stores the datetimes with milliseconds, compared with the snapshot's
+        refreshed_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        if self.database is not None:
+            await run_in_threadpool(self.database.save_assets, assets, refreshed_at)
+        self._snapshot = _Snapshot(AssetStore(assets), refreshed_at)
+        self._stale = False
+        log.info("Refreshed the catalogue of %s assets", len(assets))
+
+    async def refresh(self) -> None:
+        """
+        Download the assets again, or await the download in progress.
+
+        Raises
+        ------
+        `APIError | httpx.HTTPError`:
+            if the download failed, the assets of the previous refresh are kept.
+        """
+        try:
+            await self._refreshes.run("assets", self._download)
+        except Exception:
+            self._stale = True
+            raise
+
+    async def _refresh_periodically(self) -> None:
+        """Refresh the catalogue on schedule until cancelled, sooner after a failure."""
+        while True:
+            await anyio.sleep(self.retry_seconds if self._stale else self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception:
+                log.exception("Could not refresh the assets catalogue, serving the stale one")
+
+    async def start(self) -> None:
+        """Load the catalogue and start refreshing it in the background."""
+        try:
+            await self.refresh()
+        except Exception:
+            log.exception("Could not load the assets catalogue, retrying in the background")
+        if self._refresher is None:
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        """Stop refreshing the catalogue."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    async def _get_snapshot(self) -> _Snapshot:
+        """Get the current snapshot, loaded first if the catalogue has not been started."""
+        if self._snapshot.refreshed_at is None:
+            await self.refresh()
+        return self._snapshot
+
+    async def get_store(self) -> AssetStore:
+        """Get the store of the assets, indexed by symbol, name and ID."""
+        return (await self._get_snapshot()).store
+
+    async def get_assets(
+        self,
+        status: AssetStatus | None = AssetStatus.ACTIVE,
+        asset_class: AssetClass | None = None,
+        exchange: AssetExchange | None = None,
+    ) -> list[AssetRecord]:
+        """Get the assets that match the filters and are tradable and fractionable."""
+        return (await self.get_store()).select(status, asset_class, exchange)
+
+    def info(self) -> AssetCatalogueInfo:
+        """Get the time of the last refresh and the number of assets."""
+        snapshot = self._snapshot
+        return AssetCatalogueInfo(
+            refreshed_at=snapshot.refreshed_at,
+            assets=len(snapshot.store.records),
+            stale=self._stale,
+        )
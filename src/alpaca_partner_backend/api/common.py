@@ -2,9 +2,21 @@
 
 from functools import lru_cache
 
+import httpx
 from alpaca.broker import BrokerClient
+from alpaca.common.rest import RESTClient
 from alpaca.data import StockHistoricalDataClient
 
+from alpaca_partner_backend.api.async_clients import (
+    AsyncBrokerClient,
+    AsyncDataClient,
+    AsyncTransport,
+    HTTPXTransport,
+    ThreadedTransport,
+)
+from alpaca_partner_backend.api.catalogue import AssetCatalogue
+from alpaca_partner_backend.api.events import BrokerEventSource, EventHub
+from alpaca_partner_backend.database import get_db
 from alpaca_partner_backend.settings import SETTINGS
 
 
@@ -36,3 +48,53 @@ def get_data_client() -> StockHistoricalDataClient:
         url_override="https://data.sandbox.alpaca.markets",
         use_basic_auth=True,
     )
+
+
+def _get_transport(rest_client: RESTClient) -> AsyncTransport:
+    """Get the transport for the async clients, the sync client is used only if configured."""
+    if SETTINGS.USE_SYNC_CLIENTS:
+        return ThreadedTransport(rest_client)
+    return HTTPXTransport.from_rest_client(
+        rest_client,
+        limits=httpx.Limits(
+            max_connections=SETTINGS.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=SETTINGS.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        timeout=SETTINGS.UPSTREAM_TIMEOUT_SECONDS,
+        http2=SETTINGS.UPSTREAM_HTTP2,
+    )
+
+
+@lru_cache
+def get_async_broker_client() -> AsyncBrokerClient:
+    """Get the async broker client and cache it to share its connection pool."""
+    return AsyncBrokerClient(_get_transport(get_broker_client()))
+
+
+@lru_cache
+def get_async_data_client() -> AsyncDataClient:
+    """Get the async market data client and cache it to share its connection pool."""
+    return AsyncDataClient(_get_transport(get_data_client()))
+
+
+@lru_cache
+def get_event_hub() -> EventHub:
+    """Get the hub of the Broker API events, shared by the clients to subscribe only once."""
+    return EventHub(
+        BrokerEventSource(
+            HTTPXTransport.from_rest_client(get_broker_client()),
+            reconnect_seconds=SETTINGS.EVENTS_RECONNECT_SECONDS,
+        ),
+        buffer_size=SETTINGS.EVENTS_SUBSCRIBER_BUFFER,
+    )
+
+
+@lru_cache
+def get_asset_catalogue() -> AssetCatalogue:
+    """Get the catalogue of the assets, shared by the routes and stored in the database."""
+    return AssetCatalogue(
+        get_async_broker_client(),
+        get_db(),
+        refresh_seconds=SETTINGS.ASSETS_CATALOGUE_REFRESH_SECONDS,
+        retry_seconds=SETTINGS.ASSETS_CATALOGUE_RETRY_SECONDS,
+    )
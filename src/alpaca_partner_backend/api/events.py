@@ -0,0 +1,336 @@
+"""
+Fan-out of the Broker API event streams to the clients of each account.
+
+A single upstream subscription to the trade, account status and journal status events
+of all the accounts replaces the polling of the orders, positions and trading account
+by each client:
+
+- `BrokerEventSource` streams the server-sent events of the Broker API,
+  reconnecting from the last event received.
+- `LocalEventSource` is the in-memory stand-in for the tests and the local development.
+- `EventHub` consumes a source while there are subscribers,
+  and sends each event to the subscribers of its accounts.
+
+The functions registered with `on_event`, e.g. the invalidation of a cache,
+are called with each event the hubs receive.
+
+The journal events carry only the journal ID, their accounts are the ones recorded with
+`record_journal` when the journal is created, or else requested to the Broker API.
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+import math
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable, Iterable
+from typing import Any, NamedTuple, TypeAlias
+
+import anyio
+import httpx
+import orjson
+from alpaca.broker import Journal
+from alpaca.common.exceptions import APIError
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+
+from alpaca_partner_backend.api.async_clients import HTTPXTransport
+from alpaca_partner_backend.enums import EventStream
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+# the paths of the event streams of the Broker API
+EVENT_STREAM_PATHS = {
+    EventStream.TRADES: "/events/trades",
+    EventStream.ACCOUNTS: "/events/accounts/status",
+    EventStream.JOURNALS: "/events/journals/status",
+}
+# the accounts of the journals by journal ID, from and to
+journal_accounts: TTLCache[str, tuple[str, ...]] = TTLCache(
+    maxsize=SETTINGS.JOURNALS_CACHE_MAXSIZE,
+    ttl=SETTINGS.JOURNALS_CACHE_TTL_SECONDS,
+)
+
+
+def record_journal(journal: Journal) -> None:
+    """Record the accounts of the journal, for its status events."""
+    journal_accounts.set(str(journal.id), (str(journal.from_account), str(journal.to_account)))
+
+
+class Event(NamedTuple):
+    """Event of a Broker API stream, with the accounts it concerns."""
+
+    stream: EventStream
+    event_id: str
+    account_ids: tuple[str, ...]
+    data: dict[str, Any]
+
+    @classmethod
+    def from_data(cls, stream: EventStream, data: dict[str, Any]) -> "Event":
+        """
+        Create the event from its data, the journals concern both their recorded accounts.
+
+        Raises
+        ------
+        `KeyError`:
+            if the data has no account ID, or no journal ID for a journal.
+        """
+        if stream is EventStream.JOURNALS:
+            account_ids = journal_accounts.get(str(data["journal_id"])) or ()
+        else:
+            account_ids = (str(data["account_id"]),)
+        return cls(stream, str(data.get("event_id", "")), account_ids, data)
+
+    def to_sse(self) -> bytes:
+        """Format the event as a server-sent event, named after its stream."""
+        return (
+            f"event: {self.stream.value}\nid: {self.event_id}\ndata: ".encode()
+            + orjson.dumps(self.data)
+            + b"\n\n"
+        )
+
+
+async def parse_sse(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Parse the lines of a server-sent events stream into the data of each event.
+
+    The comments, such as the heartbeats, and the other fields are skipped.
+    """
+    data: list[str] = []
+    async for line in lines:
+        if not line:
+            if data:
+                yield "\n".join(data)
+            data = []
+            continue
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        yield "\n".join(data)
+
+
+EventListener: TypeAlias = Callable[[Event], None]
+# the functions called with each event of a stream, registered with `on_event`
+_listeners: defaultdict[EventStream, list[EventListener]] = defaultdict(list)
+
+
+def on_event(stream: EventStream) -> Callable[[EventListener], EventListener]:
+    """
+    Register the decorated function to be called with each event of the stream.
+
+    The function is called by the hub that received the event, so it must not block.
+    """
+
+    def _register(listener: EventListener) -> EventListener:
+        _listeners[stream].append(listener)
+        return listener
+
+    return _register
+
+
+class EventSource(ABC):
+    """Source of the events of all the accounts."""
+
+    @abstractmethod
+    async def run(self, publish: Callable[[Event], None]) -> None:
+        """
+        Publish the events as they arrive, until the source is closed.
+
+        Parameters
+        ----------
+        `publish`: Callable[[Event], None]
+            the callback of each event, it must not block.
+        """
+
+
+class BrokerEventSource(EventSource):
+    """Server-sent events of the Broker API, one subscription for each stream."""
+
+    def __init__(
+        self,
+        transport: HTTPXTransport,
+        streams: Iterable[EventStream] = tuple(EventStream),
+        reconnect_seconds: float = 5.0,
+    ) -> None:
+        """
+        Events of the Broker API.
+
+        Parameters
+        ----------
+        `transport`: HTTPXTransport
+            the transport with the credentials of the Broker API.
+        `streams`: Iterable[EventStream]
+            the streams to subscribe to, all of them by default.
+        `reconnect_seconds`: float
+            the time to wait before reconnecting after a stream has been interrupted.
+        """
+        self.transport = transport
+        self.streams = tuple(streams)
+        self.reconnect_seconds = reconnect_seconds
+
+    async def _record_journal(self, journal_id: str) -> None:
+        """Request the journal to the Broker API, unless its accounts have been recorded."""
+        if journal_accounts.get(journal_id) is not None:
+            return
+        try:
+            journal = await self.transport.request("GET", f"/journals/{journal_id}")
+            assert isinstance(journal, dict)
+            record_journal(Journal(**journal))
+        except (httpx.HTTPError, APIError, AssertionError, ValueError) as error:
+            log.warning("Could not get the accounts of the journal %s: %r", journal_id, error)
+
+    async def _run_stream(self, stream: EventStream, publish: Callable[[Event], None]) -> None:
+        """Publish the events of a stream, resuming after the last one if interrupted."""
+        since_id: str | None = None
+        while True:
+            try:
+                async for data in parse_sse(
+                    self.transport.stream_lines(EVENT_STREAM_PATHS[stream], {"since_id": since_id})
+                ):
+                    try:
+                        raw_event: dict[str, Any] = orjson.loads(data)
+                        # the stream is resumed after the event, even if it is skipped
+                        since_id = str(raw_event.get("event_id") or "") or since_id
+                        if stream is EventStream.JOURNALS:
+                            await self._record_journal(str(raw_event["journal_id"]))
+                        event = Event.from_data(stream, raw_event)
+                    except (orjson.JSONDecodeError, AttributeError, KeyError):
+                        log.warning("Skipping the malformed %s event %r", stream.value, data)
+                        continue
+                    publish(event)
+                log.warning("The %s events stream has been closed", stream.value)
+            except (httpx.HTTPError, APIError) as error:
+                log.warning("The %s events stream has been interrupted: %r", stream.value, error)
+            await anyio.sleep(self.reconnect_seconds)
+
+    async def run(self, publish: Callable[[Event], None]) -> None:
+        """Publish the events of all the streams, reconnecting to each of them until cancelled."""
+        async with anyio.create_task_group() as task_group:
+            for stream in self.streams:
+                task_group.start_soon(functools.partial(self._run_stream, stream, publish))
+
+
+class LocalEventSource(EventSource):
+    """In-memory source of the events published locally, until it is closed."""
+
+    def __init__(self, events: Iterable[Event] = ()) -> None:
+        """
+        Local events, e.g. of the tests.
+
+        Parameters
+        ----------
+        `events`: Iterable[Event]
+            the events published already.
+        """
+        self._send: MemoryObjectSendStream[Event]
+        self._receive: MemoryObjectReceiveStream[Event]
+        self._send, self._receive = anyio.create_memory_object_stream(math.inf)
+        for event in events:
+            self.publish(event)
+
+    def publish(self, event: Event) -> None:
+        """Publish the event to the subscribers of its accounts."""
+        self._send.send_nowait(event)
+
+    def close(self) -> None:
+        """Close the source, the subscribers are disconnected after the events published."""
+        self._send.close()
+
+    async def run(self, publish: Callable[[Event], None]) -> None:
+        """Publish the local events until the source is closed."""
+        async for event in self._receive:
+            publish(event)
+
+
+class EventHub:
+    """
+    Fan-out of the events of a source to the subscribers of each account.
+
+    The source is consumed only while there are subscribers, by a task of the event loop
+    shared by all of them. A subscriber whose buffer is full is disconnected instead of
+    blocking the others, it can reconnect and get the current state again.
+    """
+
+    def __init__(self, source: EventSource, buffer_size: int = 100) -> None:
+        """
+        Hub of the events of a source.
+
+        Parameters
+        ----------
+        `source`: EventSource
+            the source of the events of all the accounts.
+        `buffer_size`: int
+            the events buffered for each subscriber.
+        """
+        self.source = source
+        self.buffer_size = buffer_size
+        self._subscribers: defaultdict[str, set[MemoryObjectSendStream[Event]]] = defaultdict(set)
+        self._consumer: asyncio.Task[None] | None = None
+
+    def _unsubscribe(self, account_id: str, send: MemoryObjectSendStream[Event]) -> None:
+        """Remove the subscriber and close its stream."""
+        subscribers = self._subscribers.get(account_id)
+        if subscribers is not None:
+            subscribers.discard(send)
+            if not subscribers:
+                del self._subscribers[account_id]
+        send.close()
+
+    def publish(self, event: Event) -> None:
+        """Send the event to the listeners and to the subscribers of its accounts, without waiting."""
+        for listener in _listeners.get(event.stream, ()):
+            try:
+                listener(event)
+            except Exception:
+                log.exception("The %s listener of the %s events failed", listener, event.stream)
+        for account_id in event.account_ids:
+            for send in list(self._subscribers.get(account_id, ())):
+                try:
+                    send.send_nowait(event)
+                except anyio.WouldBlock:
+                    log.warning("Disconnecting a slow subscriber of the account %s", account_id)
+                    self._unsubscribe(account_id, send)
+                except (anyio.BrokenResourceError, anyio.ClosedResourceError):
+                    self._unsubscribe(account_id, send)
+
+    async def _consume(self) -> None:
+        """Publish the events of the source, and disconnect the subscribers when it ends."""
+        try:
+            await self.source.run(self.publish)
+        except Exception:
+            log.exception("The events source has failed")
+        finally:
+            # a consumer cancelled after the last subscriber left might have been replaced
+            if self._consumer is asyncio.current_task():
+                self._consumer = None
+                for account_id, subscribers in list(self._subscribers.items()):
+                    for send in list(subscribers):
+                        self._unsubscribe(account_id, send)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, account_id: str) -> AsyncIterator[MemoryObjectReceiveStream[Event]]:
+        """
+        Subscribe to the events of the account.
+
+        Yields
+        ------
+        `MemoryObjectReceiveStream[Event]`:
+            the events of the account, it ends if the subscriber has been disconnected.
+        """
+        send: MemoryObjectSendStream[Event]
+        receive: MemoryObjectReceiveStream[Event]
+        send, receive = anyio.create_memory_object_stream(self.buffer_size)
+        self._subscribers[account_id].add(send)
+        if self._consumer is None:
+            self._consumer = asyncio.get_running_loop().create_task(self._consume())
+        try:
+            with receive:
+                yield receive
+        finally:
+            self._unsubscribe(account_id, send)
+            if not self._subscribers and self._consumer is not None:
+                self._consumer.cancel()
+                self._consumer = None
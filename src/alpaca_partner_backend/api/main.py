@@ -5,6 +5,7 @@ import logging
 import traceback
 
 import coloredlogs
+import httpx
 from alpaca.common.exceptions import APIError as BrokerAPIError
 from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,9 +13,21 @@ from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pymongo.errors import DuplicateKeyError
 
+from alpaca_partner_backend.api.common import (
+    get_asset_catalogue,
+    get_async_broker_client,
+    get_async_data_client,
+)
+from alpaca_partner_backend.api.pre_trade import PreTradeError
+from alpaca_partner_backend.api.responses import (
+    IDEMPOTENT_REPLAYED_HEADER,
+    NEXT_PAGE_TOKEN_HEADER,
+    WATERMARK_HEADER,
+)
 from alpaca_partner_backend.api.routes import (
     accounts,
     assets,
+    events,
     funding,
     logos,
     orders,
@@ -26,6 +39,8 @@ from alpaca_partner_backend.database import MongoDatabase, get_db
 from alpaca_partner_backend.models import Token
 from alpaca_partner_backend.utils.security import create_access_token
 
+log = logging.getLogger(__name__)
+
 app = FastAPI(debug=True)
 
 app.add_middleware(
@@ -40,10 +55,12 @@ app.add_middleware(
     ],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_PAGE_TOKEN_HEADER, WATERMARK_HEADER, IDEMPOTENT_REPLAYED_HEADER],
 )
 
 app.include_router(accounts.router)
 app.include_router(assets.router)
+app.include_router(events.router)
 app.include_router(funding.router)
 app.include_router(logos.router)
 app.include_router(orders.router)
@@ -62,6 +79,12 @@ def handle_broker_api_errors(request: Request, exc: BrokerAPIError) -> JSONRespo
     )
 
 
+@app.exception_handler(PreTradeError)
+def handle_pre_trade_errors(request: Request, exc: PreTradeError) -> JSONResponse:
+    """Pre-trade error converter, with the same response of the BrokerAPIError."""
+    return JSONResponse(status_code=exc.status_code, content=exc.message)
+
+
 @app.exception_handler(DuplicateKeyError)
 def handle_mongo_duplicate_errors(
     request: Request,
@@ -78,6 +101,20 @@ def handle_mongo_duplicate_errors(
     )
 
 
+@app.exception_handler(TimeoutError)
+@app.exception_handler(httpx.TimeoutException)
+def handle_upstream_timeouts(
+    request: Request,
+    exc: TimeoutError | httpx.TimeoutException,
+) -> JSONResponse:
+    """Upstream timeout converter."""
+    log.warning("Upstream timeout on %s: %s", request.url.path, exc)
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content=str(exc) or "The upstream API did not respond in time.",
+    )
+
+
 @app.exception_handler(KeyError)
 def handle_key_errors(
     request: Request,
@@ -103,6 +140,21 @@ def startup_event() -> None:
     coloredlogs.install()
 
 
+@app.on_event("startup")
+async def start_asset_catalogue() -> None:
+    """Load the assets catalogue before serving the requests, and refresh it in the background."""
+    await get_asset_catalogue().start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """Run API shutdown events."""
+    await get_asset_catalogue().stop()
+    # Close the connection pools of the upstream clients
+    await get_async_broker_client().aclose()
+    await get_async_data_client().aclose()
+
+
 @app.post("/token")
 def login_with_request_form(
     database: MongoDatabase = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
@@ -114,6 +166,8 @@ def login_with_request_form(
     )
     access_token = create_access_token(
         data={"sub": user.email},
+        user_id=str(user.id),
+        account_id=user.alpaca_account_id,
     )
 
     return Token(access_token=access_token, token_type="bearer")
@@ -1,18 +1,100 @@
 """Parse models for the API endpoints."""
-import pandas as pd
-from alpaca.broker import Account, ActivityType, TradeAccount
+import functools
+import json
+import logging
+import operator
+from collections.abc import Callable, Mapping
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, TypeVar, overload
+from uuid import uuid4
+
+import httpx
+import numpy as np
+from alpaca.broker import Account, ActivityType, Order, TradeAccount
+from alpaca.common.exceptions import APIError
 from alpaca.data import Quote
-from alpaca.trading import BaseActivity, OrderSide
+from alpaca.trading import BaseActivity, OrderClass, OrderSide
+from fastapi import status
+from pydantic import BaseModel
+from pydantic.datetime_parse import parse_date, parse_datetime
+from pydantic.fields import SHAPE_LIST
 
-from alpaca_partner_backend.enums import ActivityName
+from alpaca_partner_backend.api.pre_trade import PreTradeError
+from alpaca_partner_backend.enums import ActivityName, BarsField
 from alpaca_partner_backend.models import (
     AccountJson,
     AccountTrading,
     Activity,
+    BatchOrderResult,
     QuoteJson,
     User,
     UserOut,
 )
+from alpaca_partner_backend.settings import SETTINGS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+BatchResultT = TypeVar("BatchResultT", bound=BatchOrderResult)
+
+# the field types whose JSON changes when the raw values are validated, with their parsers
+TRUSTED_FIELD_PARSERS: dict[type, Callable[[Any], Any]] = {
+    datetime: parse_datetime,
+    date: parse_date,
+    float: float,
+    int: int,
+}
+
+# keys of the bar fields in the raw responses of the market data API
+RAW_BARS_KEYS = {
+    BarsField.OPEN: "o",
+    BarsField.HIGH: "h",
+    BarsField.LOW: "l",
+    BarsField.CLOSE: "c",
+    BarsField.VOLUME: "v",
+    BarsField.TRADE_COUNT: "n",
+    BarsField.VWAP: "vw",
+}
+
+
+@functools.cache
+def _trusted_fields(
+    model: type[BaseModel],
+) -> list[tuple[str, Callable[[Any], Any] | None, bool]]:
+    """Get the alias of each field of the model, with the parser of its values and if a list."""
+    fields = []
+    for field in model.__fields__.values():
+        parser: Callable[[Any], Any] | None = TRUSTED_FIELD_PARSERS.get(field.type_)
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            parser = functools.partial(construct_trusted, field.type_)
+        fields.append((field.alias, parser, field.shape == SHAPE_LIST))
+    return fields
+
+
+def construct_trusted(model: type[ModelT], data: Mapping[str, Any] | BaseModel) -> ModelT:
+    """
+    Build the model from data that has already been validated, e.g. by the Broker API.
+
+    Only the values whose JSON would change, like datetimes and nested models, are parsed,
+    so the JSON of the model is the same of the validated one, but much faster to build.
+    The keys that are not fields of the model are dropped like in the validation.
+    """
+    if isinstance(data, model):
+        return data
+    if isinstance(data, BaseModel):
+        data = {field.alias: getattr(data, name) for name, field in data.__fields__.items()}
+    values = {}
+    for alias, parser, is_list in _trusted_fields(model):
+        if alias not in data:
+            continue
+        value = data[alias]
+        if parser is not None and value is not None:
+            value = [parser(item) for item in value] if is_list else parser(value)
+        values[alias] = value
+    return model.construct(**values)
 
 
 def parse_account_to_jsonable(account: Account) -> AccountJson:
@@ -21,7 +103,91 @@ def parse_account_to_jsonable(account: Account) -> AccountJson:
 
     Takes care of UUID to str conversion.
     """
-    return AccountJson(id=str(account.id), **account.dict(exclude={"id"}))
+    if not SETTINGS.TRUSTED_UPSTREAM_MODELS:
+        return AccountJson(id=str(account.id), **account.dict(exclude={"id"}))
+    documents = [
+        document if document.id else document.copy(update={"id": str(uuid4())})
+        for document in account.documents or []
+    ]
+    return construct_trusted(
+        AccountJson,
+        {
+            **{name: getattr(account, name, None) for name in AccountJson.__fields__},
+            "id": str(account.id),
+            "documents": documents if account.documents is not None else None,
+        },
+    )
+
+
+@overload
+def parse_raw_order(raw_order: dict[str, Any]) -> Order:
+    ...
+
+
+@overload
+def parse_raw_order(raw_order: dict[str, Any], model: type[ModelT]) -> ModelT:
+    ...
+
+
+def parse_raw_order(raw_order: dict[str, Any], model: type[BaseModel] = Order) -> BaseModel:
+    """
+    Parse a raw order of the Broker API, with no commission if it is missing.
+
+    The order is built without validation if the upstream models are trusted in the settings.
+    """
+    if not SETTINGS.TRUSTED_UPSTREAM_MODELS:
+        return model(**{"commission": 0, **raw_order})
+    # like the alpaca-py orders, the orders without a class are simple orders
+    raw_order = {
+        "commission": 0,
+        **raw_order,
+        "order_class": raw_order.get("order_class") or OrderClass.SIMPLE,
+    }
+    if raw_order.get("legs"):
+        raw_order["legs"] = [
+            {**leg, "order_class": leg.get("order_class") or OrderClass.SIMPLE}
+            for leg in raw_order["legs"]
+        ]
+    return construct_trusted(model, raw_order)
+
+
+def parse_batch_result(
+    result: Order | Exception,
+    model: type[BatchResultT] = BatchOrderResult,  # type: ignore[assignment]
+    **fields: Any,
+) -> BatchResultT:
+    """
+    Parse the order submitted or the error raised, with the status code of the order.
+
+    Parameters
+    ----------
+    `result`: Order | Exception
+        the order of a batch, or the error raised submitting it.
+    `model`: type[BatchResultT]
+        the model of the result.
+    `fields`: Any
+        the other fields of the model, e.g. the symbol of the position closed.
+    """
+    if isinstance(result, Order):
+        return model(status_code=status.HTTP_200_OK, order=result, **fields)
+    if isinstance(result, PreTradeError):
+        return model(status_code=result.status_code, error=result.message, **fields)
+    if isinstance(result, APIError):
+        try:
+            error = json.loads(result.response.content).get("message", str(result))
+        except (AttributeError, ValueError):
+            error = str(result)
+        return model(
+            status_code=result.status_code or status.HTTP_502_BAD_GATEWAY, error=error, **fields
+        )
+    if isinstance(result, TimeoutError | httpx.TimeoutException):
+        return model(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            error=str(result) or "The upstream API did not respond in time.",
+            **fields,
+        )
+    log.error("Unexpected error submitting an order of a batch", exc_info=result)
+    return model(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, error=str(result), **fields)
 
 
 def parse_account_to_trading(account: TradeAccount) -> AccountTrading:
@@ -47,53 +213,116 @@ def parse_user_to_output(user: User) -> UserOut:
     return UserOut(email=user.email)
 
 
-def parse_df_to_list(df: pd.DataFrame) -> list[list[str]]:
+def parse_df_to_list(df: "pd.DataFrame") -> list[list[str]]:
     """Parse a dataframe to a list of its headers and values."""
     return [df.columns.to_list(), *df.values.tolist()]
 
 
+def parse_columns_to_list(columns: Mapping[str, np.ndarray]) -> list[list[Any]]:
+    """
+    Parse arrays by column to a list of their headers and values by row.
+
+    Same output of `parse_df_to_list`, but each column is converted to Python objects
+    with its own type, instead of upcasting all the values to a common one.
+    """
+    rows = zip(*(column.tolist() for column in columns.values()), strict=True)
+    return [list(columns), *map(list, rows)]
+
+
+def parse_unix_to_days(timestamps: np.ndarray | list[int]) -> np.ndarray:
+    """Format the UNIX timestamps in seconds as UTC days, such as 2023-01-03."""
+    return np.datetime_as_string(np.asarray(timestamps, dtype="datetime64[s]"), unit="D")
+
+
+def parse_raw_bars_to_columns(raw_bars: list[dict[str, Any]]) -> dict[str, np.ndarray]:
+    """
+    Parse the raw bars of the market data API to arrays by column.
+
+    The timestamps are formatted as days and the other fields are floats,
+    like in the dataframe of the `BarSet`.
+    """
+    values = np.array(
+        [operator.itemgetter(*RAW_BARS_KEYS.values())(bar) for bar in raw_bars],
+        dtype=np.float64,
+    ).reshape(len(raw_bars), len(RAW_BARS_KEYS))
+    # the timestamps are RFC 3339 strings in UTC, so their first 10 characters are the day
+    days = np.array([bar["t"] for bar in raw_bars], dtype="U10")
+    return {
+        "timestamp": days,
+        **{field.value: values[:, i] for i, field in enumerate(RAW_BARS_KEYS)},
+    }
+
+
+def parse_equity_eod_to_columns(equity_eod: list[tuple[int, float]]) -> dict[str, np.ndarray]:
+    """Parse the end of day equity by UNIX timestamp to arrays of days and equity."""
+    values = np.array(equity_eod, dtype=np.float64).reshape(len(equity_eod), 2)
+    return {
+        "day": parse_unix_to_days(values[:, 0].astype(np.int64)),
+        "equity": values[:, 1],
+    }
+
+
+def parse_equity_eod_to_list(equity_eod: list[tuple[int, float]]) -> list[list[Any]]:
+    """Parse the end of day equity by UNIX timestamp to a list of headers and values by day."""
+    return parse_columns_to_list(parse_equity_eod_to_columns(equity_eod))
+
+
+def _fill_name(activity: BaseActivity, _amount: float) -> ActivityName:
+    """Name a fill by the side of the order."""
+    side = getattr(activity, "side", None)
+    return ActivityName.BUY_ORDER if side == OrderSide.BUY else ActivityName.SELL_ORDER
+
+
+def _journal_name(_activity: BaseActivity, amount: float) -> ActivityName:
+    """Name a cash journal by the direction of the cash."""
+    return ActivityName.JNLC_DEPOSIT if amount > 0 else ActivityName.JNLC_WITHDRAWAL
+
+
+def _fee_name(activity: BaseActivity, _amount: float) -> ActivityName:
+    """Name a fee by its description."""
+    description = str(getattr(activity, "description", None))
+    if "REG" in description:
+        return ActivityName.REG_FEE
+    if "TAF" in description:
+        return ActivityName.TAF_FEE
+    return ActivityName.FEE
+
+
+# name of each activity type, the ones that depend on the activity are in ACTIVITY_NAME_RULES
+ACTIVITY_NAMES: dict[ActivityType, ActivityName] = {
+    ActivityType(name.name): name for name in ActivityName if name.name in ActivityType.__members__
+} | {ActivityType.CSD: ActivityName.ACH_DEPOSIT, ActivityType.CSW: ActivityName.ACH_WITHDRAWAL}
+ACTIVITY_NAME_RULES: dict[ActivityType, Callable[[BaseActivity, float], ActivityName]] = {
+    ActivityType.FILL: _fill_name,
+    ActivityType.JNLC: _journal_name,
+    ActivityType.FEE: _fee_name,
+}
+
+
 def parse_activities(account_activities: list[BaseActivity]) -> list[Activity]:
-    """Parse activities from Alpaca's API to a common Activity base model."""
+    """
+    Parse activities from Alpaca's API to a common Activity base model.
+
+    The name of each activity is looked up by type in `ACTIVITY_NAMES` and `ACTIVITY_NAME_RULES`,
+    and the activities are built without validation, since their fields are already validated
+    by the models of alpaca-py.
+    """
     _activities = []
     for activity in account_activities:
         _type = activity.activity_type
-        _activity = activity.dict()
-        _side = _activity.get("side", None)
-        _date = (
-            _activity.get("date", None)
-            or _activity.get("transaction_time", None)
-            or _activity.get("system_date", None)
-        )
-        _amount = _activity.get("net_amount", None) or round(
-            _activity.get("price", 0) * _activity.get("qty", 0), 2
+        _amount = getattr(activity, "net_amount", None) or round(
+            (getattr(activity, "price", None) or 0) * (getattr(activity, "qty", None) or 0), 2
         )
-        if _type == ActivityType.FILL:
-            _name = ActivityName.BUY_ORDER if _side == OrderSide.BUY else ActivityName.SELL_ORDER
-        elif _type == ActivityType.JNLC:
-            _name = ActivityName.JNLC_DEPOSIT if _amount > 0 else ActivityName.JNLC_WITHDRAWAL
-        elif _type == ActivityType.CSD:
-            _name = ActivityName.ACH_DEPOSIT
-        elif _type == ActivityType.CSW:
-            _name = ActivityName.ACH_WITHDRAWAL
-        elif _type == ActivityType.FEE:
-            _description = str(_activity.get("description"))
-            if "REG" in _description:
-                _name = ActivityName.REG_FEE
-            elif "TAF" in _description:
-                _name = ActivityName.TAF_FEE
-            else:
-                _name = ActivityName.FEE
-        elif _type == ActivityType.DIV:
-            _name = ActivityName.DIV
-        else:
-            _name = _type
+        _rule = ACTIVITY_NAME_RULES.get(_type)
         _activities.append(
-            Activity(
+            Activity.construct(
                 activity_type=_type,
-                activity_name=_name,
-                date=_date,
-                amount=_amount,
-                symbol=_activity.get("symbol", None),
+                activity_name=_rule(activity, _amount) if _rule else ACTIVITY_NAMES[_type],
+                date=getattr(activity, "date", None)
+                or getattr(activity, "transaction_time", None)
+                or getattr(activity, "system_date", None),
+                amount=float(_amount),
+                symbol=getattr(activity, "symbol", None),
             )
         )
     return _activities
@@ -0,0 +1,104 @@
+"""Pre-trade checks of the orders, to reject locally the ones that the Broker API would reject."""
+from alpaca.trading import Asset, AssetClass, OrderRequest, OrderSide, TradeAccount
+from fastapi import status
+
+from alpaca_partner_backend.api.asset_store import AssetRecord
+
+
+class PreTradeError(Exception):
+    """Order rejected locally, with the status code and message of the Broker API error."""
+
+    def __init__(self, status_code: int, message: str) -> None:
+        """
+        Order rejected by a pre-trade check.
+
+        Parameters
+        ----------
+        `status_code`: int
+            the status code the Broker API would respond with.
+        `message`: str
+            the error message, the same of the Broker API.
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def _is_fractional(order_request: OrderRequest) -> bool:
+    """Check if the order is for a fraction of a share, by notional or by quantity."""
+    if order_request.notional is not None:
+        return True
+    return order_request.qty is not None and order_request.qty % 1 != 0
+
+
+def get_order_cost(order_request: OrderRequest) -> float | None:
+    """
+    Get the most the order can cost, the notional or the quantity at the limit price.
+
+    Returns
+    -------
+    `float | None`:
+        the cost of the buy orders, None for the sell orders and the market orders by quantity,
+        whose price is known only when they are filled.
+    """
+    if order_request.side != OrderSide.BUY:
+        return None
+    if order_request.notional is not None:
+        return order_request.notional
+    # the limit price is a field of the limit order requests only
+    limit_price = getattr(order_request, "limit_price", None)
+    if order_request.qty is not None and limit_price is not None:
+        return order_request.qty * limit_price
+    return None
+
+
+def check_asset(order_request: OrderRequest, asset: Asset | AssetRecord | None) -> None:
+    """
+    Check that the asset of the order can be traded, with fractional quantities if needed.
+
+    The assets missing from the catalogue are left to the Broker API,
+    since they might have been listed after it has been cached.
+
+    Raises
+    ------
+    `PreTradeError`:
+        422 if the asset is not tradable, or the order is fractional and the asset is not.
+    """
+    if asset is None:
+        return
+    if not asset.tradable:
+        raise PreTradeError(
+            status.HTTP_422_UNPROCESSABLE_ENTITY, f'asset "{asset.symbol}" is not tradable'
+        )
+    if _is_fractional(order_request) and not asset.fractionable:
+        raise PreTradeError(
+            status.HTTP_422_UNPROCESSABLE_ENTITY, f'asset "{asset.symbol}" is not fractionable'
+        )
+
+
+def check_account(
+    order_request: OrderRequest,
+    asset: Asset | AssetRecord | None,
+    trade_account: TradeAccount,
+) -> None:
+    """
+    Check that the account can trade and has the buying power for the order.
+
+    The crypto orders are checked against the non-marginable buying power.
+
+    Raises
+    ------
+    `PreTradeError`:
+        403 if the trading is blocked for the account or its buying power is insufficient.
+    """
+    if trade_account.trading_blocked or trade_account.account_blocked:
+        raise PreTradeError(status.HTTP_403_FORBIDDEN, "account is not allowed to trade")
+    cost = get_order_cost(order_request)
+    if cost is None:
+        return
+    is_crypto = asset is not None and asset.asset_class == AssetClass.CRYPTO
+    buying_power = (
+        trade_account.non_marginable_buying_power if is_crypto else trade_account.buying_power
+    )
+    if buying_power is not None and cost > float(buying_power):
+        raise PreTradeError(status.HTTP_403_FORBIDDEN, "insufficient buying power")
@@ -0,0 +1,180 @@
+"""Response classes of the API and responses in the media type negotiated with the client."""
+from collections.abc import AsyncIterator, Mapping
+from decimal import Decimal
+from typing import Any
+
+import msgpack
+import numpy as np
+import orjson
+from bson import ObjectId
+from fastapi import Header, HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from alpaca_partner_backend.api import parsers
+from alpaca_partner_backend.enums import MediaType
+from alpaca_partner_backend.settings import SETTINGS
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+# header with the cursor of the next page of the paginated routes
+NEXT_PAGE_TOKEN_HEADER = "X-Next-Page-Token"
+# header with the watermark to request only what has been updated after the response
+WATERMARK_HEADER = "X-Watermark"
+# headers of the requests that can be retried safely and of their replayed responses
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAYED_HEADER = "Idempotent-Replayed"
+
+# OpenAPI documentation of the responses of the routes with tabular data
+TABULAR_RESPONSES: dict[int | str, dict[str, Any]] = {
+    200: {
+        "description": "Rows with the headers first by default, "
+        "arrays by column with the columnar JSON and MessagePack media types.",
+        "content": {media_type.value: {} for media_type in MediaType},
+    },
+}
+
+
+def _default(obj: Any) -> Any:
+    """Convert the types that orjson does not serialize natively, like `jsonable_encoder` does."""
+    if isinstance(obj, BaseModel):
+        # nested UUIDs, datetimes and enums are serialized natively by orjson
+        return obj.dict(by_alias=True)
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, set | frozenset):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response serialized with orjson.
+
+    The content can also be pydantic models, UUIDs, datetimes, enums, ObjectIds
+    and NumPy arrays, so the routes can skip FastAPI's `jsonable_encoder`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        """Serialize the content to JSON bytes."""
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+def get_json_response_class() -> type[JSONResponse]:
+    """Get the JSON response class of the app, orjson unless disabled in the settings."""
+    return FastJSONResponse if SETTINGS.FAST_JSON_RESPONSES else JSONResponse
+
+
+def json_response(content: Any, **kwargs: Any) -> JSONResponse:
+    """
+    Serialize the content, e.g. a list of pydantic models, without re-validating it.
+
+    Returning a response skips the validation of the response model and `jsonable_encoder`,
+    which dominate the response time of the routes with thousands of models.
+    """
+    if SETTINGS.FAST_JSON_RESPONSES:
+        return FastJSONResponse(content, **kwargs)
+    return JSONResponse(jsonable_encoder(content), **kwargs)
+
+
+def _parse_accept(accept: str) -> list[tuple[str, float]]:
+    """Parse the media ranges of the Accept header with their quality, the best first."""
+    media_ranges = []
+    for media_range in accept.split(","):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            media_ranges.append((media_type.lower(), quality))
+    # the sort is stable, so the media ranges with the same quality keep their order
+    return sorted(media_ranges, key=lambda media_range: -media_range[1])
+
+
+def negotiate_media_type(accept: str | None = Header(default=None)) -> MediaType:
+    """
+    Get the media type of the response from the Accept header.
+
+    JSON rows are the default, also for wildcards and when the header is missing.
+
+    Raises
+    ------
+    `HTTPException`:
+        406 if none of the media types accepted by the client is supported.
+    """
+    if not accept:
+        return MediaType.JSON
+    for media_type, _ in _parse_accept(accept):
+        if media_type in {"*/*", "application/*"}:
+            return MediaType.JSON
+        try:
+            return MediaType(media_type)
+        except ValueError:
+            continue
+    raise HTTPException(
+        status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        detail=f"The supported media types are {', '.join(m.value for m in MediaType)}.",
+    )
+
+
+def accepts_ndjson(accept: str | None = Header(default=None)) -> bool:
+    """Check if the client prefers a stream of newline-delimited JSON, from the Accept header."""
+    media_ranges = _parse_accept(accept) if accept else []
+    return bool(media_ranges) and media_ranges[0][0] == NDJSON_MEDIA_TYPE
+
+
+def ndjson_response(pages: AsyncIterator[list[Any]], **kwargs: Any) -> StreamingResponse:
+    """
+    Stream the items of the pages as newline-delimited JSON, each page as soon as it arrives.
+
+    Parameters
+    ----------
+    `pages`: AsyncIterator[list[Any]]
+        the pages of items, e.g. pydantic models.
+    `kwargs`: Any
+        the other arguments of the `StreamingResponse`, such as the headers.
+    """
+
+    async def _lines() -> AsyncIterator[bytes]:
+        async for page in pages:
+            yield b"".join(orjson.dumps(item, default=_default) + b"\n" for item in page)
+
+    return StreamingResponse(_lines(), media_type=NDJSON_MEDIA_TYPE, **kwargs)
+
+
+def columns_response(columns: Mapping[str, np.ndarray], media_type: MediaType) -> Response:
+    """
+    Encode the arrays by column in the media type.
+
+    Parameters
+    ----------
+    `columns`: Mapping[str, np.ndarray]
+        the arrays by column name, all with the same length.
+    `media_type`: MediaType
+        the negotiated media type.
+
+    Returns
+    -------
+    `Response`:
+        rows with the headers first for JSON, an object with an array by column otherwise.
+    """
+    headers = {"Vary": "Accept"}
+    json_response_class = get_json_response_class()
+    if media_type is MediaType.JSON:
+        return json_response_class(parsers.parse_columns_to_list(columns), headers=headers)
+    content = {name: column.tolist() for name, column in columns.items()}
+    if media_type is MediaType.MSGPACK:
+        return Response(msgpack.packb(content), media_type=media_type.value, headers=headers)
+    return json_response_class(content, media_type=media_type.value, headers=headers)
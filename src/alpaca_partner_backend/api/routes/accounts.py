@@ -1,20 +1,35 @@
 """Accounts endpoint router."""
 
+import functools
 import logging
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
-import pandas as pd
 from alpaca.broker import Account, BrokerClient, GetAccountActivitiesRequest, TradeAccount
-from alpaca.trading import GetPortfolioHistoryRequest, PortfolioHistory
-from fastapi import APIRouter, Depends, HTTPException, status
+from alpaca.common.enums import Sort
+from alpaca.trading import ActivityType, GetPortfolioHistoryRequest, PortfolioHistory
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import EmailStr
 
 from alpaca_partner_backend.api import parsers
-from alpaca_partner_backend.api.common import get_broker_client
-from alpaca_partner_backend.api.routes.users import get_current_user
+from alpaca_partner_backend.api.async_clients import AsyncBrokerClient
+from alpaca_partner_backend.api.common import get_async_broker_client, get_broker_client
+from alpaca_partner_backend.api.responses import (
+    NDJSON_MEDIA_TYPE,
+    NEXT_PAGE_TOKEN_HEADER,
+    TABULAR_RESPONSES,
+    accepts_ndjson,
+    columns_response,
+    ndjson_response,
+    negotiate_media_type,
+)
+from alpaca_partner_backend.api.routes.users import _get_token_claims, oauth2_scheme
 from alpaca_partner_backend.database import MongoDatabase, get_db
-from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.enums import MediaType, Routers
 from alpaca_partner_backend.models import (
+    AccountContext,
     AccountJson,
     AccountTrading,
     AuthCredentials,
@@ -22,6 +37,9 @@ from alpaca_partner_backend.models import (
     User,
 )
 from alpaca_partner_backend.models.api import Activity
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
+from alpaca_partner_backend.utils.concurrency import gather
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -33,10 +51,10 @@ router = APIRouter(
 
 
 @router.post("/")
-def create_account(
+async def create_account(
     account_request: CreateAccountRequest,
     database: MongoDatabase = Depends(get_db),
-    broker_client: BrokerClient = Depends(get_broker_client),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> AccountJson:
     """Create an Alpaca account from the account request.
 
@@ -50,25 +68,32 @@ def create_account(
     AccountJson:
         The account that has been created.
     """
-    insert_result = database.create_user(
+    insert_result = await run_in_threadpool(
+        database.create_user,
         AuthCredentials(
             email=account_request.contact.email_address,
             password=account_request.password,
-        )
+        ),
     )
     log.info("User %s created", insert_result.inserted_id)
     log.info("Account creation request.")
-    account = broker_client.create_account(account_request)
+    account = await broker_client.create_account(account_request)
     assert isinstance(account, Account), "The account has not being parsed for pydantic validation."
+    await run_in_threadpool(
+        database.set_user_alpaca_account,
+        email=account_request.contact.email_address,
+        account_id=str(account.id),
+        account_number=account.account_number,
+    )
     return parsers.parse_account_to_jsonable(account)
 
 
-def _get_account_id_by_email(
+def _find_account_by_email(
     email: EmailStr,
     broker_client: BrokerClient,
-) -> str:
+) -> dict[str, Any]:
     """
-    Get the account ID with a specific email.
+    Search the Broker API for the account with a specific email.
 
     Parameters
     ----------
@@ -82,8 +107,8 @@ def _get_account_id_by_email(
 
     Returns
     -------
-    `str`:
-        the Alpaca account ID with that email.
+    `dict[str, Any]`:
+        the raw Alpaca account with that email.
     """
     _email = str(email)
     _not_found_error = HTTPException(
@@ -97,14 +122,75 @@ def _get_account_id_by_email(
     # the account with the same email address
     for account in accounts:
         if account["contact"]["email_address"] == _email:
-            return account["id"]
+            return account
     raise _not_found_error
 
 
-@router.get("/")
-def get_account_info(
-    user: User = Depends(get_current_user),
+def _get_account_id(
+    user: User,
+    database: MongoDatabase,
+    broker_client: BrokerClient,
+) -> str:
+    """
+    Get the Alpaca account ID of the user.
+
+    The ID is read from the user document, the Broker API is searched by email
+    only for users that are not linked to their account yet and the result is
+    stored on the user document for the next requests.
+
+    Parameters
+    ----------
+    `user`: User
+        the current user.
+
+    Returns
+    -------
+    `str`:
+        the Alpaca account ID of the user.
+    """
+    if user.alpaca_account_id:
+        return user.alpaca_account_id
+    account = _find_account_by_email(user.email, broker_client=broker_client)
+    database.set_user_alpaca_account(
+        email=user.email,
+        account_id=account["id"],
+        account_number=account.get("account_number"),
+    )
+    return str(account["id"])
+
+
+async def get_current_account(
+    token: str = Depends(oauth2_scheme),
+    database: MongoDatabase = Depends(get_db),
     broker_client: BrokerClient = Depends(get_broker_client),
+) -> AccountContext:
+    """
+    Get the Alpaca account of the current user from the access token.
+
+    Tokens minted after the user has been linked to its account carry the user ID
+    and the account ID in their signed claims, so neither MongoDB nor the Broker API
+    are called. Older tokens fall back to the user document in the threadpool.
+
+    Returns
+    -------
+    `AccountContext`:
+        the user and account IDs of the current user.
+    """
+    claims = _get_token_claims(token)
+    user_id, account_id = claims.get("uid"), claims.get("account_id")
+    if not user_id or not account_id:
+        user = await run_in_threadpool(database.get_user_by_email, email=claims["sub"])
+        user_id = str(user.id)
+        account_id = await run_in_threadpool(
+            _get_account_id, user, database=database, broker_client=broker_client
+        )
+    return AccountContext(user_id=user_id, email=claims["sub"], account_id=account_id)
+
+
+@router.get("/")
+async def get_account_info(
+    account: AccountContext = Depends(get_current_account),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> AccountJson:
     """
     Get the account with a specific email.
@@ -119,15 +205,29 @@ def get_account_info(
     `AccountJson`:
         the Alpaca account with that email.
     """
-    account_id = _get_account_id_by_email(user.email, broker_client=broker_client)
-    account = broker_client.get_account_by_id(account_id=account_id)
-    return parsers.parse_account_to_jsonable(account)
+    return parsers.parse_account_to_jsonable(
+        await broker_client.get_account_by_id(account_id=account.account_id)
+    )
+
+
+# the latest trading account by account ID, the snapshot of the pre-trade checks of the orders
+trade_accounts_cache: TTLCache[str, TradeAccount] = TTLCache(
+    maxsize=SETTINGS.TRADE_ACCOUNTS_CACHE_MAXSIZE,
+    ttl=SETTINGS.TRADE_ACCOUNTS_CACHE_TTL_SECONDS,
+)
+
+
+async def get_trade_account(account_id: str, broker_client: AsyncBrokerClient) -> TradeAccount:
+    """Get the trading account from the Broker API and cache it as the latest snapshot."""
+    trade_account = await broker_client.get_trade_account_by_id(account_id=account_id)
+    trade_accounts_cache.set(account_id, trade_account)
+    return trade_account
 
 
 @router.get("/trading")
-def get_account_trading_info(
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_broker_client),
+async def get_account_trading_info(
+    account: AccountContext = Depends(get_current_account),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> AccountTrading:
     """
     Get the account trading information for a specific account ID.
@@ -138,21 +238,38 @@ def get_account_trading_info(
         the trading information for that account.
     """
     return parsers.parse_account_to_trading(
-        broker_client.get_trade_account_by_id(
-            account_id=_get_account_id_by_email(user.email, broker_client=broker_client)
-        )
+        await get_trade_account(account.account_id, broker_client)
     )
 
 
-@router.get("/portfolio/history")
-def get_portfolio_history(
+TIMEPERIOD_UNITS = {"D": 1, "W": 7, "M": 31, "A": 366}
+
+
+def _parse_timeperiod(timeperiod: str) -> timedelta:
+    """Parse a duration in number + unit, such as 1D, rounded up to whole days."""
+    number, unit = timeperiod[:-1], timeperiod[-1:].upper()
+    if not number.isdigit() or unit not in TIMEPERIOD_UNITS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid timeperiod {timeperiod}, the unit can be D, W, M or A.",
+        )
+    return timedelta(days=int(number) * TIMEPERIOD_UNITS[unit])
+
+
+@router.get("/portfolio/history", responses=TABULAR_RESPONSES)
+async def get_portfolio_history(
     timeperiod: str = "1M",
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_broker_client),
-) -> list[list[Any]]:
+    account: AccountContext = Depends(get_current_account),
+    database: MongoDatabase = Depends(get_db),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+    media_type: MediaType = Depends(negotiate_media_type),
+) -> Response:
     """
     Get the account trading information for a specific account ID.
 
+    The end of day equity is stored in MongoDB, so only the days after the last stored one
+    are downloaded, unless the timeperiod starts before the stored ones.
+
     Parameters
     ----------
     `timeperiod`: (Optional[str])
@@ -162,58 +279,205 @@ def get_portfolio_history(
 
     Returns
     -------
-    `list[EquityEOD]`:
-        the list of equity values at end of each day for that account.
+    `Response`:
+        the equity values at end of each day for that account,
+        as rows or by column depending on the Accept header.
     """
-    _acct_id = _get_account_id_by_email(user.email, broker_client=broker_client)
-    ptf_history = broker_client.get_portfolio_history_for_account(
-        account_id=_acct_id,
-        history_filter=GetPortfolioHistoryRequest(
-            timeframe="1D",
-            period=timeperiod,
-        ),
+    _acct_id = account.account_id
+    _now = datetime.now(tz=timezone.utc)
+    start = int((_now - _parse_timeperiod(timeperiod)).timestamp())
+    coverage = await run_in_threadpool(database.get_equity_eod_coverage, _acct_id)
+    if coverage is None or coverage[0] > start:
+        period, downloaded_start = timeperiod, start
+    else:
+        # the last stored day is downloaded again, in case the market was open
+        _last_stored = datetime.fromtimestamp(coverage[1], tz=timezone.utc)
+        period, downloaded_start = f"{(_now - _last_stored).days + 1}D", coverage[0]
+    # the history and today's equity are independent, so they are requested concurrently
+    results = await gather(
+        {
+            "portfolio_history": broker_client.get_portfolio_history_for_account(
+                account_id=_acct_id,
+                history_filter=GetPortfolioHistoryRequest(
+                    timeframe="1D",
+                    period=period,
+                ),
+            ),
+            "trade_account": broker_client.get_trade_account_by_id(account_id=_acct_id),
+        },
+        timeout=SETTINGS.UPSTREAM_TIMEOUT_SECONDS,
     )
+    ptf_history = results["portfolio_history"]
     assert isinstance(ptf_history, PortfolioHistory)
-    acct_trading = broker_client.get_trade_account_by_id(account_id=_acct_id)
+    acct_trading = results["trade_account"]
     assert isinstance(acct_trading, TradeAccount)
-    ptf_history_df = pd.DataFrame(
-        {
-            "day": ptf_history.timestamp,
-            "equity": ptf_history.equity,
-        }
-    )
-    # replace today's equity from portfolio history
-    # with the account current equity
     assert acct_trading.equity
-    ptf_history_df.iloc[-1, 1] = float(acct_trading.equity)
-    ptf_history_df["day"] = pd.to_datetime(ptf_history_df["day"], unit="s").dt.strftime("%Y-%m-%d")
-    return parsers.parse_df_to_list(ptf_history_df)
+    # the last day is today, or the last trading day if the market is closed:
+    # its equity can still change, so it is not stored
+    # and it is replaced with the account current equity
+    await run_in_threadpool(
+        database.save_equity_eod,
+        _acct_id,
+        timestamps=ptf_history.timestamp[:-1],
+        equity=ptf_history.equity[:-1],
+        start=downloaded_start,
+    )
+    equity_eod = await run_in_threadpool(database.get_equity_eod, _acct_id, start=start)
+    if ptf_history.timestamp:
+        equity_eod.append((ptf_history.timestamp[-1], float(acct_trading.equity)))
+    return columns_response(parsers.parse_equity_eod_to_columns(equity_eod), media_type)
 
 
-@router.get("/activities")
-def get_account_activities(
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_broker_client),
-) -> list[Activity]:
+# the maximum page size of the Broker API, used to sync and stream the ledger
+ACTIVITIES_PAGE_SIZE = 100
+
+
+async def _sync_activities(
+    account_id: str,
+    database: MongoDatabase,
+    broker_client: AsyncBrokerClient,
+) -> None:
+    """Store in the ledger the activities of the account after the last stored one."""
+    last_activity_id = await run_in_threadpool(database.get_last_activity_id, account_id)
+    activity_filter = GetAccountActivitiesRequest(
+        account_id=account_id,
+        page_size=ACTIVITIES_PAGE_SIZE,
+        page_token=last_activity_id,
+        direction=Sort.ASC,
+    )
+    async for page in broker_client.iter_account_activities(activity_filter):
+        await run_in_threadpool(
+            database.save_activities,
+            account_id,
+            list(zip((a.id for a in page), parsers.parse_activities(page), strict=True)),
+        )
+
+
+async def _iter_ledger_pages(
+    database: MongoDatabase,
+    account_id: str,
+    page_token: str | None,
+    **query: Any,
+) -> AsyncIterator[list[Activity]]:
+    """Iterate over the pages of the activities of the ledger matching the query."""
+    while True:
+        page = await run_in_threadpool(
+            functools.partial(
+                database.get_activities,
+                account_id,
+                page_token=page_token,
+                limit=ACTIVITIES_PAGE_SIZE,
+                **query,
+            )
+        )
+        if page:
+            yield [activity for _, activity in page]
+        if len(page) < ACTIVITIES_PAGE_SIZE:
+            break
+        page_token = page[-1][0]
+
+
+def _filter_symbol(activities: list[Activity], symbol: str | None) -> list[Activity]:
+    """Keep the activities in the symbol, all of them if None."""
+    return [a for a in activities if a.symbol == symbol] if symbol else activities
+
+
+@router.get(
+    "/activities",
+    response_model=list[Activity],
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def get_account_activities(  # noqa: PLR0913
+    response: Response,
+    page_size: int | None = Query(default=None, gt=0, le=ACTIVITIES_PAGE_SIZE),
+    page_token: str | None = None,
+    after: datetime | None = None,
+    until: datetime | None = None,
+    activity_types: list[ActivityType] | None = Query(default=None),
+    symbol: str | None = None,
+    direction: Sort | None = None,
+    stream: bool = Depends(accepts_ndjson),
+    account: AccountContext = Depends(get_current_account),
+    database: MongoDatabase = Depends(get_db),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+) -> list[Activity] | Response:
     """
-    Get the account trading information for a specific account ID.
+    Get the activities of the account, filtered and paginated like the Broker API.
+
+    The activities are served from the MongoDB ledger, after storing the ones
+    that are more recent than the last stored activity,
+    unless the ledger is disabled in the settings.
 
     Parameters
     ----------
-    `timeperiod`: (Optional[str])
-        the duration of the data in number + unit, such as 1D.
-        Unit can be D for day, W for week, M for month and A for year.
-        Defaults to 1M.
+    `page_size`: int | None
+        the number of activities of a single page, all the activities are returned if None.
+        The token of the next page, if any, is returned in the `X-Next-Page-Token` header.
+    `page_token`: str | None
+        the token of the page to start from.
+    `after`: datetime | None
+        the activities after this time.
+    `until`: datetime | None
+        the activities until this time.
+    `activity_types`: list[ActivityType] | None
+        the types of activities, all if None.
+    `symbol`: str | None
+        the symbol of the activities, all if None.
+    `direction`: Sort | None
+        the time order of the activities, descending by default.
 
     Returns
     -------
-    `list[EquityEOD]`:
-        the list of equity values at end of each day for that account.
+    `list[Activity]`:
+        the activities, or a stream of newline-delimited JSON activities
+        with all the pages if the Accept header is `application/x-ndjson`.
     """
-    activities = broker_client.get_account_activities(
-        activity_filter=GetAccountActivitiesRequest(
-            account_id=_get_account_id_by_email(user.email, broker_client=broker_client)
+    if SETTINGS.ACTIVITIES_LEDGER:
+        await _sync_activities(account.account_id, database, broker_client)
+        query = {
+            "after": after,
+            "until": until,
+            "activity_types": [t.value for t in activity_types or []],
+            "symbol": symbol,
+            "ascending": direction == Sort.ASC,
+        }
+        if stream:
+            return ndjson_response(
+                _iter_ledger_pages(database, account.account_id, page_token, **query)
+            )
+        page = await run_in_threadpool(
+            functools.partial(
+                database.get_activities,
+                account.account_id,
+                page_token=page_token,
+                limit=page_size or 0,
+                **query,
+            )
         )
+        if page_size and len(page) == page_size:
+            response.headers[NEXT_PAGE_TOKEN_HEADER] = page[-1][0]
+        return [activity for _, activity in page]
+
+    # without the ledger the activities are requested to the Broker API,
+    # which does not filter them by symbol
+    activity_filter = GetAccountActivitiesRequest(
+        account_id=account.account_id,
+        page_size=page_size,
+        page_token=page_token,
+        after=after,
+        until=until,
+        activity_types=activity_types,
+        direction=direction,
     )
-    assert isinstance(activities, list)
-    return parsers.parse_activities(activities)
+    if stream:
+        return ndjson_response(
+            _filter_symbol(parsers.parse_activities(page), symbol)
+            async for page in broker_client.iter_account_activities(activity_filter)
+        )
+    if page_size is None:
+        activities = await broker_client.get_account_activities(activity_filter=activity_filter)
+    else:
+        activities = await broker_client.get_account_activities_page(activity_filter)
+        if len(activities) == page_size:
+            response.headers[NEXT_PAGE_TOKEN_HEADER] = activities[-1].id
+    return _filter_symbol(parsers.parse_activities(activities), symbol)
@@ -1,15 +1,17 @@
 """Router for assets endpoints."""
 
 import logging
-from functools import lru_cache
 
-from alpaca.broker import BrokerClient
 from alpaca.common.exceptions import APIError
-from alpaca.trading import Asset, AssetClass, AssetExchange, AssetStatus, GetAssetsRequest
-from fastapi import APIRouter, Depends, HTTPException, status
+from alpaca.trading import Asset, AssetClass, AssetExchange, AssetStatus
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
-from alpaca_partner_backend.api.common import get_broker_client
+from alpaca_partner_backend.api.async_clients import AsyncBrokerClient
+from alpaca_partner_backend.api.catalogue import AssetCatalogue
+from alpaca_partner_backend.api.common import get_asset_catalogue, get_async_broker_client
+from alpaca_partner_backend.api.responses import json_response
 from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.models import AssetCatalogueInfo
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -20,38 +22,21 @@ router = APIRouter(
 )
 
 
-@lru_cache
-def _cache_broker_api_call(
-    broker_client: BrokerClient,
-    status: AssetStatus | None = AssetStatus.ACTIVE,
-    asset_class: AssetClass | None = None,
-    exchange: AssetExchange | None = None,
-) -> list[Asset]:
-    """
-    Cache the broker API call to the assets endpoint.
-
-    Least-recently-used cache but in the future it might be
-    considered to use mongo to store an assets collection.
-    """
-    assets = broker_client.get_all_assets(
-        GetAssetsRequest(
-            status=status,
-            asset_class=asset_class,
-            exchange=exchange,
-        )
-    )
-    assert isinstance(assets, list)
-    # filter out assets that are non tradable and not fractionable
-    return [a for a in assets if a.tradable is True and a.fractionable is True]
+@router.get("/catalogue")
+def get_catalogue_info(
+    catalogue: AssetCatalogue = Depends(get_asset_catalogue),
+) -> AssetCatalogueInfo:
+    """Get the time of the last refresh of the assets catalogue and the number of assets."""
+    return catalogue.info()
 
 
-@router.get("/")
-def get_assets(
+@router.get("/", response_model=list[Asset])
+async def get_assets(
     status: AssetStatus | None = AssetStatus.ACTIVE,
     asset_class: AssetClass | None = None,
     exchange: AssetExchange | None = None,
-    broker_client: BrokerClient = Depends(get_broker_client),
-) -> list[Asset]:
+    catalogue: AssetCatalogue = Depends(get_asset_catalogue),
+) -> Response:
     """
     Get the assets that match the filters.
 
@@ -66,20 +51,25 @@ def get_assets(
     list[Asset]:
         the assets that match the filters.
     """
-    return _cache_broker_api_call(
-        broker_client=broker_client,
-        status=status,
-        asset_class=asset_class,
-        exchange=exchange,
+    # thousands of assets: serialize them directly instead of re-validating them
+    return json_response(
+        [
+            record.to_dict()
+            for record in await catalogue.get_assets(
+                status=status,
+                asset_class=asset_class,
+                exchange=exchange,
+            )
+        ]
     )
 
 
 @router.get("/symbols")
-def get_symbols(
+async def get_symbols(
     status: AssetStatus | None = None,
     asset_class: AssetClass | None = None,
     exchange: AssetExchange | None = None,
-    broker_client: BrokerClient = Depends(get_broker_client),
+    catalogue: AssetCatalogue = Depends(get_asset_catalogue),
 ) -> list[str]:
     """
     Get the account with a specific email.
@@ -97,8 +87,7 @@ def get_symbols(
     """
     return [
         a.symbol
-        for a in _cache_broker_api_call(
-            broker_client=broker_client,
+        for a in await catalogue.get_assets(
             status=status,
             asset_class=asset_class,
             exchange=exchange,
@@ -107,9 +96,10 @@ def get_symbols(
 
 
 @router.get("/symbols/{symbol}")
-def get_asset_by_symbol(
+async def get_asset_by_symbol(
     symbol: str,
-    broker_client: BrokerClient = Depends(get_broker_client),
+    catalogue: AssetCatalogue = Depends(get_asset_catalogue),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> Asset:
     """
     Get the account with a specific email.
@@ -125,23 +115,25 @@ def get_asset_by_symbol(
     `Asset`:
         the asset with that symbol.
     """
+    record = (await catalogue.get_store()).get(symbol)
+    if record is not None:
+        return record.to_asset()
+    # the assets listed after the last refresh of the catalogue are requested to the Broker API
     try:
-        asset = broker_client.get_asset(symbol)
+        return await broker_client.get_asset(symbol)
     except APIError as broker_api_error:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No asset with symbol {symbol} was found.",
         ) from broker_api_error
-    assert isinstance(asset, Asset)
-    return asset
 
 
 @router.get("/names")
-def get_names(
+async def get_names(
     status: AssetStatus | None = None,
     asset_class: AssetClass | None = None,
     exchange: AssetExchange | None = None,
-    broker_client: BrokerClient = Depends(get_broker_client),
+    catalogue: AssetCatalogue = Depends(get_asset_catalogue),
 ) -> list[str]:
     """
     Get the account with a specific email.
@@ -159,8 +151,7 @@ def get_names(
     """
     return [
         a.name
-        for a in _cache_broker_api_call(
-            broker_client=broker_client,
+        for a in await catalogue.get_assets(
             status=status,
             asset_class=asset_class,
             exchange=exchange,
@@ -170,9 +161,9 @@ def get_names(
 
 
 @router.get("/names/{name}")
-def get_asset_by_name(
+async def get_asset_by_name(
     name: str,
-    broker_client: BrokerClient = Depends(get_broker_client),
+    catalogue: AssetCatalogue = Depends(get_asset_catalogue),
 ) -> Asset:
     """
     Get the asset with a specific name.
@@ -187,9 +178,14 @@ def get_asset_by_name(
     Asset:
         the asset matching the name.
     """
-    for a in _cache_broker_api_call(broker_client=broker_client):
-        if a.name == name:
-            return a
+    # like the names listed, the first active asset with the name that is tradable and fractionable
+    for record in (await catalogue.get_store()).get_all_by_name(name):
+        if (
+            record.status == AssetStatus.ACTIVE
+            and record.tradable is True
+            and record.fractionable is True
+        ):
+            return record.to_asset()
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail=f"No asset with name {name} was found.",
@@ -0,0 +1,67 @@
+"""Router for the events of the current account, streamed to the clients."""
+import logging
+from collections.abc import AsyncIterator
+
+import anyio
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from alpaca_partner_backend.api.common import get_event_hub
+from alpaca_partner_backend.api.events import Event, EventHub
+from alpaca_partner_backend.api.responses import SSE_MEDIA_TYPE
+from alpaca_partner_backend.api.routes.accounts import get_current_account
+from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.models import AccountContext
+from alpaca_partner_backend.settings import SETTINGS
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix=Routers.EVENTS.value,
+    tags=[Routers.EVENTS.name],
+)
+
+HEARTBEAT = b": heartbeat\n\n"
+
+
+@router.get(
+    "/",
+    responses={200: {"content": {SSE_MEDIA_TYPE: {}}}},
+    response_class=StreamingResponse,
+)
+async def stream_events(
+    account: AccountContext = Depends(get_current_account),
+    hub: EventHub = Depends(get_event_hub),
+) -> StreamingResponse:
+    """
+    Stream the trade, account status and journal events of the current account.
+
+    The events are server-sent events named after their stream, `trades`, `accounts`
+    or `journals`, with the JSON of the Broker API event as data, so the clients
+    can refresh the orders, positions and trading account when they change
+    instead of polling them.
+
+    Returns
+    -------
+    `StreamingResponse`:
+        the stream of the events, with a comment after `EVENTS_HEARTBEAT_SECONDS`
+        without events to keep the connection alive.
+    """
+
+    async def _events() -> AsyncIterator[bytes]:
+        async with hub.subscribe(account.account_id) as events:
+            while True:
+                event: Event | None = None
+                with anyio.move_on_after(SETTINGS.EVENTS_HEARTBEAT_SECONDS):
+                    try:
+                        event = await events.receive()
+                    except anyio.EndOfStream:
+                        return
+                yield HEARTBEAT if event is None else event.to_sse()
+
+    return StreamingResponse(
+        _events(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
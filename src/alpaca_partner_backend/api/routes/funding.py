@@ -1,14 +1,15 @@
 """Router for market data."""
 import logging
 
-from alpaca.broker import BrokerClient, CreateJournalRequest, Journal, JournalEntryType
+from alpaca.broker import CreateJournalRequest, Journal, JournalEntryType
 from fastapi import APIRouter, Depends
 
-from alpaca_partner_backend.api.common import get_broker_client
-from alpaca_partner_backend.api.routes.accounts import _get_account_id_by_email
-from alpaca_partner_backend.api.routes.users import get_current_user
+from alpaca_partner_backend.api.async_clients import AsyncBrokerClient
+from alpaca_partner_backend.api.common import get_async_broker_client
+from alpaca_partner_backend.api.events import record_journal
+from alpaca_partner_backend.api.routes.accounts import get_current_account
 from alpaca_partner_backend.enums import Routers
-from alpaca_partner_backend.models import JournalRequestBody, User
+from alpaca_partner_backend.models import AccountContext, JournalRequestBody
 from alpaca_partner_backend.settings import SETTINGS
 
 logging.basicConfig(level=logging.INFO)
@@ -21,14 +22,16 @@ router = APIRouter(
 
 
 @router.post("/journal")
-def create_journal(
+async def create_journal(
     request_body: JournalRequestBody,
-    broker_client: BrokerClient = Depends(get_broker_client),
-    user: User = Depends(get_current_user),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+    account: AccountContext = Depends(get_current_account),
 ) -> Journal:
     """
     Create a journal to transfer money to/from the sweep account to/from the user.
 
+    Its accounts are recorded, so its status events are streamed to the user.
+
     Parameters
     ----------
     `to_user`: bool
@@ -36,8 +39,8 @@ def create_journal(
     `amount`: float
         the amount of the cash journal.
     """
-    user_acct_id = _get_account_id_by_email(user.email, broker_client=broker_client)
-    journal = broker_client.create_journal(
+    user_acct_id = account.account_id
+    journal = await broker_client.create_journal(
         CreateJournalRequest(
             from_account=SETTINGS.SWEEP_ACCOUNT_ID if request_body.to_user else user_acct_id,
             to_account=user_acct_id if request_body.to_user else SETTINGS.SWEEP_ACCOUNT_ID,
@@ -46,4 +49,5 @@ def create_journal(
         )
     )
     assert isinstance(journal, Journal)
+    record_journal(journal)
     return journal
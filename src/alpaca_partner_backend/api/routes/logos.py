@@ -1,13 +1,14 @@
 """Router for logos."""
+import hashlib
 import logging
-from functools import lru_cache
 
-import requests
-from alpaca.data import StockHistoricalDataClient
-from fastapi import APIRouter, Depends, Response, status
+from fastapi import APIRouter, Depends, Header, Response, status
 
-from alpaca_partner_backend.api.common import get_data_client
+from alpaca_partner_backend.api.async_clients import AsyncDataClient
+from alpaca_partner_backend.api.common import get_async_data_client
 from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -17,35 +18,59 @@ router = APIRouter(
     tags=[Routers.LOGOS.name],
 )
 
+# the logos by symbol with their ETag
+logos_cache: TTLCache[str, tuple[str, bytes]] = TTLCache(
+    maxsize=SETTINGS.MARKET_DATA_CACHE_MAXSIZE,
+    ttl=SETTINGS.LOGOS_CACHE_TTL_SECONDS,
+)
+
+
+def get_logo_url(symbol: str) -> str:
+    """Get the URL of the logo of the symbol in this API."""
+    return f"{Routers.LOGOS.value}/{symbol}"
+
 
-@lru_cache
-def _cached_get_logo(
-    data_client: StockHistoricalDataClient,
+def get_cached_logo_etag(symbol: str) -> str | None:
+    """Get the ETag of the logo of the symbol if it is cached, without downloading it."""
+    cached = logos_cache.get(symbol)
+    return cached[0] if cached is not None else None
+
+
+async def _cached_get_logo(
+    data_client: AsyncDataClient,
     symbol: str,
-) -> bytes:
-    """Cache the logos call to the data client."""
-    response = requests.get(
-        url=f"{data_client._base_url}/v1beta1/logos/{symbol}",
-        headers=data_client._get_auth_headers(),
-    )
-    assert response.status_code == status.HTTP_200_OK, response.status_code
-    return response.content
+) -> tuple[str, bytes]:
+    """Cache the logos call to the data client, with the ETag of each logo."""
+    cached = logos_cache.get(symbol)
+    if cached is None:
+        logo_bytes = await data_client.get_logo(symbol)
+        cached = (f'"{hashlib.sha256(logo_bytes).hexdigest()[:32]}"', logo_bytes)
+        logos_cache.set(symbol, cached)
+    return cached
 
 
 @router.get(
     "/{symbol}",
     responses={
         200: {"content": {"image/png": {}}},
+        304: {"description": "The logo has not changed since the one with the ETag."},
     },
     response_class=Response,
 )
-def get_logo(
+async def get_logo(
     symbol: str,
-    data_client: StockHistoricalDataClient = Depends(get_data_client),
+    if_none_match: str | None = Header(default=None),
+    data_client: AsyncDataClient = Depends(get_async_data_client),
 ) -> Response:
-    """Get the logo for a certain symbol."""
-    logo_bytes = _cached_get_logo(
+    """Get the logo for a certain symbol, with an ETag for the conditional requests."""
+    etag, logo_bytes = await _cached_get_logo(
         data_client=data_client,
         symbol=symbol,
     )
-    return Response(content=logo_bytes, media_type="image/png")
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={SETTINGS.LOGOS_CACHE_TTL_SECONDS}",
+    }
+    if if_none_match is not None and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=logo_bytes, media_type="image/png", headers=headers)
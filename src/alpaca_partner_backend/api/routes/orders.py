@@ -1,17 +1,68 @@
 """Orders endpoints router."""
+import functools
+import hashlib
+import json
 import logging
+import operator
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from typing import Any, NoReturn
+from uuid import NAMESPACE_URL, uuid5
 
-from alpaca.broker import BrokerClient, Order
-from alpaca.trading import GetOrdersRequest, OrderRequest, QueryOrderStatus
-from fastapi import APIRouter, Depends
+from alpaca.broker import Order
+from alpaca.common.enums import Sort
+from alpaca.common.exceptions import APIError
+from alpaca.trading import (
+    Asset,
+    GetOrdersRequest,
+    OrderRequest,
+    OrderSide,
+    OrderStatus,
+    QueryOrderStatus,
+)
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from pydantic.datetime_parse import parse_datetime
 
-from alpaca_partner_backend.api.common import get_broker_client, get_raw_broker_client
-from alpaca_partner_backend.api.routes.accounts import _get_account_id_by_email
-from alpaca_partner_backend.api.routes.users import get_current_user
-from alpaca_partner_backend.enums import Routers
-from alpaca_partner_backend.models import (
-    User,
+from alpaca_partner_backend.api import parsers, pre_trade
+from alpaca_partner_backend.api.asset_store import AssetRecord
+from alpaca_partner_backend.api.async_clients import (
+    ORDERS_MAX_LIMIT,
+    AsyncBrokerClient,
+    next_orders_filter,
+    orders_filter_from,
+)
+from alpaca_partner_backend.api.catalogue import AssetCatalogue
+from alpaca_partner_backend.api.common import get_asset_catalogue, get_async_broker_client
+from alpaca_partner_backend.api.responses import (
+    IDEMPOTENCY_KEY_HEADER,
+    IDEMPOTENT_REPLAYED_HEADER,
+    NEXT_PAGE_TOKEN_HEADER,
+    WATERMARK_HEADER,
+    json_response,
 )
+from alpaca_partner_backend.api.routes.accounts import (
+    get_current_account,
+    get_trade_account,
+    trade_accounts_cache,
+)
+from alpaca_partner_backend.api.routes.positions import invalidate_positions
+from alpaca_partner_backend.database import MongoDatabase, get_db
+from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.models import AccountContext, BatchOrderResult
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
+from alpaca_partner_backend.utils.concurrency import SingleFlight, gather, gather_settled
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -22,73 +73,568 @@ router = APIRouter(
 )
 
 
+async def _store_order(
+    account_id: str,
+    order_id: str,
+    database: MongoDatabase,
+    broker_client: AsyncBrokerClient,
+) -> None:
+    """Store the current state of the order, the reconciliation catches up if it fails."""
+    try:
+        raw_order = await broker_client.get_order_for_account_by_id(account_id, order_id)
+        await run_in_threadpool(database.save_orders, account_id, [raw_order])
+    except Exception:
+        log.exception("Could not store the order %s of the account %s", order_id, account_id)
+
+
+async def _reconcile_orders(
+    account_id: str,
+    database: MongoDatabase,
+    broker_client: AsyncBrokerClient,
+) -> None:
+    """
+    Store the orders of the account updated since the last reconciliation with the Broker API.
+
+    The first time all the orders are stored, then only the ones updated after the last stored
+    update, at most once every `ORDERS_RECONCILE_INTERVAL_SECONDS`.
+    """
+    now = datetime.now(tz=timezone.utc)
+    sync = await run_in_threadpool(database.get_orders_sync, account_id)
+    reconciled_at, watermark = sync if sync is not None else (None, None)
+    interval = timedelta(seconds=SETTINGS.ORDERS_RECONCILE_INTERVAL_SECONDS)
+    if reconciled_at is not None and now - reconciled_at < interval:
+        return
+    if watermark is None:
+        raw_orders = await broker_client.get_all_orders_for_account(
+            account_id, GetOrdersRequest(status=QueryOrderStatus.ALL)
+        )
+    else:
+        raw_orders = await _get_raw_orders_updated_since(broker_client, account_id, watermark)
+    await run_in_threadpool(database.save_orders, account_id, raw_orders)
+    watermark = max(
+        (parse_datetime(raw_order["updated_at"]) for raw_order in raw_orders),
+        default=watermark,
+    )
+    await run_in_threadpool(database.set_orders_sync, account_id, now, watermark)
+
+
+async def get_pre_trade_assets(
+    catalogue: AssetCatalogue = Depends(get_asset_catalogue),
+) -> Mapping[str, Asset | AssetRecord] | None:
+    """Get the assets by symbol for the pre-trade checks, None if they are disabled."""
+    if not SETTINGS.PRE_TRADE_CHECKS:
+        return None
+    return await catalogue.get_store()
+
+
+async def _refresh_trade_account(account_id: str, broker_client: AsyncBrokerClient) -> None:
+    """Refresh the trading account snapshot after an order changed its buying power."""
+    try:
+        await get_trade_account(account_id, broker_client)
+    except Exception:
+        log.exception("Could not refresh the trading account %s", account_id)
+
+
+async def _check_order(
+    order_request: OrderRequest,
+    account_id: str,
+    assets: Mapping[str, Asset | AssetRecord],
+    broker_client: AsyncBrokerClient,
+) -> None:
+    """
+    Check the order locally before submitting it, see `api.pre_trade`.
+
+    The account is checked only against a cached snapshot, so the checks do not add a round trip
+    to the orders that pass them. The snapshot is refreshed before rejecting an order,
+    since a deposit or a sale after it has been taken might have increased the buying power.
+
+    Raises
+    ------
+    `PreTradeError`:
+        if the Broker API would reject the order.
+    """
+    asset = assets.get(order_request.symbol)
+    pre_trade.check_asset(order_request, asset)
+    trade_account = trade_accounts_cache.get(account_id)
+    if trade_account is None:
+        return
+    try:
+        pre_trade.check_account(order_request, asset, trade_account)
+    except pre_trade.PreTradeError:
+        trade_account = await get_trade_account(account_id, broker_client)
+        pre_trade.check_account(order_request, asset, trade_account)
+
+
+async def _submit_order(
+    order_request: OrderRequest,
+    account_id: str,
+    assets: Mapping[str, Asset | AssetRecord] | None,
+    broker_client: AsyncBrokerClient,
+) -> Order:
+    """Submit the order to the Broker API, after the pre-trade checks if they are enabled."""
+    if assets is not None:
+        await _check_order(order_request, account_id, assets, broker_client)
+    # using OrderRequest from trading module since the one from Broker it's not working
+    order = await broker_client.submit_order_for_account(
+        account_id=account_id, order_data=order_request
+    )
+    assert isinstance(order, Order)
+    invalidate_positions(account_id)
+    return order
+
+
+# the responses of the orders with an idempotency key by user and key,
+# in front of the ones stored in MongoDB
+idempotent_orders_cache: TTLCache[tuple[str, str], tuple[str, dict[str, Any]]] = TTLCache(
+    maxsize=SETTINGS.IDEMPOTENCY_CACHE_MAXSIZE,
+    ttl=SETTINGS.IDEMPOTENCY_KEYS_TTL_SECONDS,
+)
+# the submissions in flight by user and idempotency key, awaited by the retries
+idempotent_submissions: SingleFlight[tuple[str, dict[str, Any], bool]] = SingleFlight()
+# the fields of the order requests that the Broker API returns as is with the orders
+ORDER_REQUEST_FIELDS = {
+    "symbol",
+    "qty",
+    "notional",
+    "side",
+    "type",
+    "time_in_force",
+    "order_class",
+    "extended_hours",
+}
+
+
+def _reject_reused_key() -> NoReturn:
+    """Reject the request with an idempotency key that has been used for another order."""
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=f"The {IDEMPOTENCY_KEY_HEADER} has already been used for another order.",
+    )
+
+
+def _check_fingerprint(stored_fingerprint: str, fingerprint: str) -> None:
+    """Check that the idempotency key has not been used for another request."""
+    if stored_fingerprint != fingerprint:
+        _reject_reused_key()
+
+
+def _fingerprint(order_request: OrderRequest) -> str:
+    """Hash the order request, to recognize the retries of an idempotency key."""
+    return hashlib.sha256(order_request.json(sort_keys=True).encode()).hexdigest()
+
+
+def _order_matches_request(raw_order: dict[str, Any], order_request: OrderRequest) -> bool:
+    """Check that the raw order has been submitted with the parameters of the request."""
+    request_fields = json.loads(order_request.json(include=ORDER_REQUEST_FIELDS, exclude_none=True))
+    for field, value in request_fields.items():
+        raw_value = raw_order.get(field)
+        if isinstance(value, float) and raw_value is not None:
+            # the quantities of the raw orders are strings
+            raw_value = float(raw_value)
+        if raw_value != value:
+            return False
+    return True
+
+
+async def _submit_idempotent_order(  # noqa: PLR0913
+    order_request: OrderRequest,
+    idempotency_key: str,
+    account: AccountContext,
+    assets: Mapping[str, Asset | AssetRecord] | None,
+    database: MongoDatabase,
+    broker_client: AsyncBrokerClient,
+) -> tuple[str, dict[str, Any], bool]:
+    """
+    Submit the order once per idempotency key of the user, or get the stored response.
+
+    The client order ID is derived from the key, so the Broker API rejects the duplicates
+    submitted by other processes, and the order that has been submitted is returned instead
+    if it has the parameters of the request.
+
+    Returns
+    -------
+    `tuple[str, dict[str, Any], bool]`:
+        the fingerprint of the request of the order, the raw order, and if it is a stored response.
+
+    Raises
+    ------
+    `HTTPException`:
+        422 if the idempotency key has been used for another order.
+    """
+    cache_key = (str(account.email), idempotency_key)
+    fingerprint = _fingerprint(order_request)
+    stored = idempotent_orders_cache.get(cache_key) or await run_in_threadpool(
+        database.get_idempotent_response, *cache_key
+    )
+    if stored is not None:
+        _check_fingerprint(stored[0], fingerprint)
+        idempotent_orders_cache.set(cache_key, stored)
+        return stored[0], stored[1], True
+
+    client_order_id = order_request.client_order_id or str(
+        uuid5(NAMESPACE_URL, f"{account.account_id}/{idempotency_key}")
+    )
+    try:
+        order = await _submit_order(
+            order_request.copy(update={"client_order_id": client_order_id}),
+            account.account_id,
+            assets,
+            broker_client,
+        )
+        raw_order = json.loads(order.json())
+    except APIError as broker_api_error:
+        if broker_api_error.status_code != status.HTTP_422_UNPROCESSABLE_ENTITY or (
+            "client_order_id" not in str(broker_api_error)
+        ):
+            raise
+        # submitted by another process, which might not have stored its response yet
+        stored = await run_in_threadpool(database.get_idempotent_response, *cache_key)
+        if stored is not None:
+            _check_fingerprint(stored[0], fingerprint)
+            idempotent_orders_cache.set(cache_key, stored)
+            return stored[0], stored[1], True
+        raw_order = await broker_client.get_order_for_account_by_client_id(
+            account.account_id, client_order_id
+        )
+        if not _order_matches_request(raw_order, order_request):
+            _reject_reused_key()
+    await run_in_threadpool(database.save_idempotent_response, *cache_key, fingerprint, raw_order)
+    idempotent_orders_cache.set(cache_key, (fingerprint, raw_order))
+    return fingerprint, raw_order, False
+
+
 @router.post("/")
-def create_order(
+async def create_order(  # noqa: PLR0913
     order_request: OrderRequest,
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_broker_client),
+    response: Response,
+    background_tasks: BackgroundTasks,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    account: AccountContext = Depends(get_current_account),
+    assets: Mapping[str, Asset | AssetRecord] | None = Depends(get_pre_trade_assets),
+    database: MongoDatabase = Depends(get_db),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> Order:
-    """Create an order for the current user account.
+    """Create an order for the current user account, and store it in the orders history.
+
+    With an `Idempotency-Key` header the order is submitted only once per key,
+    and the retries get the same response, with the `Idempotent-Replayed` header.
+    The retries sent while the order is being submitted await its response.
+
+    With `PRE_TRADE_CHECKS` the orders that the Broker API would reject,
+    e.g. for an asset that is not tradable, are rejected locally with the same error.
 
     Parameters
     ----------
     `order_request`: OrderRequest
         The parameters for the order request.
+    `idempotency_key`: str | None
+        The key that identifies the order among the retries, e.g. a UUID.
 
     Returns
     -------
     Order:
         The order that has been created.
     """
-    acct_id = _get_account_id_by_email(email=user.email, broker_client=broker_client)
-    # using OrderRequest from trading module since the one from Broker it's not working
-    order = broker_client.submit_order_for_account(account_id=acct_id, order_data=order_request)  # type: ignore
-    assert isinstance(order, Order)
-    return order
+    acct_id = account.account_id
+    if assets is not None:
+        background_tasks.add_task(_refresh_trade_account, acct_id, broker_client)
+    if idempotency_key is None:
+        order = await _submit_order(order_request, acct_id, assets, broker_client)
+        background_tasks.add_task(database.save_orders, acct_id, [json.loads(order.json())])
+        return order
 
+    (fingerprint, raw_order, replayed), shared = await idempotent_submissions.run(
+        (str(account.email), idempotency_key),
+        functools.partial(
+            _submit_idempotent_order,
+            order_request,
+            idempotency_key,
+            account,
+            assets,
+            database,
+            broker_client,
+        ),
+    )
+    if shared:
+        # the retry sent while the order was being submitted might be another order
+        _check_fingerprint(fingerprint, _fingerprint(order_request))
+    if replayed or shared:
+        response.headers[IDEMPOTENT_REPLAYED_HEADER] = "true"
+    else:
+        background_tasks.add_task(database.save_orders, acct_id, [raw_order])
+    return parsers.parse_raw_order(raw_order)
+
+
+def _reject_page_token(page_token: str) -> NoReturn:
+    """Reject the request with a page token of another route."""
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=f"Invalid page token {page_token!r}.",
+    )
+
+
+def _parse_orders_page_token(page_token: str) -> tuple[datetime, list[str]]:
+    """
+    Parse the page token, the submission time of the cursor and the IDs of the orders at it.
+
+    Returns
+    -------
+    `tuple[datetime, list[str]]`:
+        the submission time of the last order of the previous page,
+        and the IDs of the orders submitted at that time returned already.
+
+    Raises
+    ------
+    `HTTPException`:
+        422 if the page token is not one of the orders routes.
+    """
+    cursor, *order_ids = page_token.split(",")
+    try:
+        return parse_datetime(cursor), order_ids
+    except (ValueError, TypeError):
+        _reject_page_token(page_token)
+
+
+async def _get_raw_orders_updated_since(
+    broker_client: AsyncBrokerClient,
+    account_id: str,
+    updated_since: datetime,
+) -> list[dict[str, Any]]:
+    """
+    Get the raw orders of the account updated after the watermark, the last updated first.
+
+    The Broker API filters the orders only by submission time, so the orders are searched
+    among the open ones and the closed ones submitted within the lookback of the watermark.
+    """
+    lookback = timedelta(days=SETTINGS.ORDERS_SYNC_LOOKBACK_DAYS)
+    results = await gather(
+        {
+            "open": broker_client.get_all_orders_for_account(
+                account_id, GetOrdersRequest(status=QueryOrderStatus.OPEN)
+            ),
+            "closed": broker_client.get_all_orders_for_account(
+                account_id,
+                GetOrdersRequest(status=QueryOrderStatus.CLOSED, after=updated_since - lookback),
+            ),
+        },
+        timeout=SETTINGS.UPSTREAM_TIMEOUT_SECONDS,
+    )
+    # an order can be in both results if it has been closed in between
+    updated = {
+        raw_order["id"]: (updated_at, raw_order)
+        for raw_order in (*results["open"], *results["closed"])
+        if (updated_at := parse_datetime(raw_order["updated_at"])) > updated_since
+    }
+    by_time = sorted(updated.values(), key=operator.itemgetter(0), reverse=True)
+    return [raw_order for _, raw_order in by_time]
 
-@router.get("/")
-def get_all_orders(
-    limit: int = 500,
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_raw_broker_client),
-) -> list[Order]:
-    """Create an order for the current user account.
+
+@router.post("/batch")
+async def create_orders(  # noqa: PLR0913
+    background_tasks: BackgroundTasks,
+    order_requests: list[OrderRequest] = Body(
+        min_items=1, max_items=SETTINGS.ORDERS_BATCH_MAX_SIZE
+    ),
+    account: AccountContext = Depends(get_current_account),
+    assets: Mapping[str, Asset | AssetRecord] | None = Depends(get_pre_trade_assets),
+    database: MongoDatabase = Depends(get_db),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+) -> list[BatchOrderResult]:
+    """Create a batch of orders for the current user account, concurrently.
+
+    At most `ORDERS_BATCH_CONCURRENCY` orders are submitted to the Broker API at the same time,
+    and an order that fails does not stop the others.
+    With `PRE_TRADE_CHECKS` each order is checked on its own against the account snapshot.
 
     Parameters
     ----------
-    `orders_request`: OrderRequest
-        The parameters for the order request.
+    `order_requests`: list[OrderRequest]
+        The parameters of each order.
+
+    Returns
+    -------
+    `list[BatchOrderResult]`:
+        The result of each order in the same order of the requests:
+        the order that has been created, or the status code and the message of the error.
+    """
+    acct_id = account.account_id
+    if assets is not None:
+        background_tasks.add_task(_refresh_trade_account, acct_id, broker_client)
+    results = await gather_settled(
+        [
+            _submit_order(order_request, acct_id, assets, broker_client)
+            for order_request in order_requests
+        ],
+        max_concurrency=SETTINGS.ORDERS_BATCH_CONCURRENCY,
+    )
+    orders = [result for result in results if isinstance(result, Order)]
+    background_tasks.add_task(
+        database.save_orders, acct_id, [json.loads(order.json()) for order in orders]
+    )
+    return [parsers.parse_batch_result(result) for result in results]
+
+
+@router.get("/", response_model=list[Order])
+async def get_all_orders(  # noqa: PLR0913
+    limit: int = Query(default=ORDERS_MAX_LIMIT, gt=0, le=ORDERS_MAX_LIMIT),
+    after: datetime | None = None,
+    until: datetime | None = None,
+    direction: Sort | None = None,
+    page_token: str | None = None,
+    updated_since: datetime | None = None,
+    account: AccountContext = Depends(get_current_account),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+) -> Response:
+    """Get the orders of the current user account, by submission time.
+
+    Parameters
+    ----------
+    `limit`: int
+        the maximum number of orders. If there are more, the cursor of the next page
+        is returned in the `X-Next-Page-Token` header.
+    `after`: datetime | None
+        the orders submitted after this time.
+    `until`: datetime | None
+        the orders submitted until this time.
+    `direction`: Sort | None
+        the time order of the orders, descending by default.
+    `page_token`: str | None
+        the `X-Next-Page-Token` of the previous page, with the same other parameters.
+        The next page starts at the submission time of the last order of the previous one,
+        without its orders, so the orders submitted at the same time are not skipped.
+    `updated_since`: datetime | None
+        the watermark of the incremental mode: all the orders updated after it are returned,
+        the last updated first, and the other parameters are ignored.
+        The watermark of the next request is returned in the `X-Watermark` header.
 
     Returns
     -------
     `list[Order]`:
         The orders for the current user account.
     """
-    acct_id = _get_account_id_by_email(email=user.email, broker_client=broker_client)
-    _orders = broker_client.get_orders_for_account(
-        account_id=acct_id,
-        filter=GetOrdersRequest(
+    acct_id = account.account_id
+    headers: dict[str, str] = {}
+    if updated_since is not None:
+        if updated_since.tzinfo is None:
+            updated_since = updated_since.replace(tzinfo=timezone.utc)
+        _orders = await _get_raw_orders_updated_since(broker_client, acct_id, updated_since)
+        headers[WATERMARK_HEADER] = (
+            _orders[0]["updated_at"] if _orders else updated_since.isoformat()
+        )
+    else:
+        orders_filter = GetOrdersRequest(
             status=QueryOrderStatus.ALL,
             limit=limit,
-        ),
+            after=after,
+            until=until,
+            direction=direction,
+        )
+        seen_ids: frozenset[str] = frozenset()
+        if page_token is not None:
+            submitted_at, order_ids = _parse_orders_page_token(page_token)
+            orders_filter = orders_filter_from(orders_filter, submitted_at)
+            seen_ids = frozenset(order_ids)
+        _orders, more = await broker_client.get_orders_page_for_account(
+            acct_id, orders_filter, seen_ids
+        )
+        if more:
+            _, at_cursor = next_orders_filter(orders_filter, _orders, seen_ids)
+            headers[NEXT_PAGE_TOKEN_HEADER] = ",".join(
+                [_orders[-1]["submitted_at"], *sorted(at_cursor)]
+            )
+    orders = [parsers.parse_raw_order(raw_order) for raw_order in _orders]
+    # hundreds of orders: serialize them directly instead of re-validating them
+    return json_response(orders, headers=headers)
+
+
+@router.get("/history", response_model=list[Order])
+async def get_orders_history(  # noqa: PLR0913
+    symbols: list[str] | None = Query(default=None),
+    side: OrderSide | None = None,
+    status: list[OrderStatus] | None = Query(default=None),
+    after: datetime | None = None,
+    until: datetime | None = None,
+    direction: Sort | None = None,
+    limit: int = Query(default=ORDERS_MAX_LIMIT, gt=0, le=ORDERS_MAX_LIMIT),
+    page_token: str | None = None,
+    account: AccountContext = Depends(get_current_account),
+    database: MongoDatabase = Depends(get_db),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+) -> Response:
+    """Search the orders history of the current user account, by submission time.
+
+    The orders are searched in MongoDB, after reconciling them with the Broker API
+    if the last reconciliation is older than `ORDERS_RECONCILE_INTERVAL_SECONDS`.
+
+    Parameters
+    ----------
+    `symbols`: list[str] | None
+        the symbols of the orders, all if None.
+    `side`: OrderSide | None
+        the side of the orders, both if None.
+    `status`: list[OrderStatus] | None
+        the statuses of the orders, all if None.
+    `after`: datetime | None
+        the orders submitted after this time.
+    `until`: datetime | None
+        the orders submitted before this time.
+    `direction`: Sort | None
+        the time order of the orders, descending by default.
+    `limit`: int
+        the maximum number of orders. If there are more, the cursor of the next page
+        is returned in the `X-Next-Page-Token` header.
+    `page_token`: str | None
+        the `X-Next-Page-Token` of the previous page, with the same other parameters.
+        The orders submitted at the same time are ordered by ID, so none is skipped.
+
+    Returns
+    -------
+    `list[Order]`:
+        The orders matching the filters.
+    """
+    acct_id = account.account_id
+    cursor = None
+    if page_token is not None:
+        submitted_at, order_ids = _parse_orders_page_token(page_token)
+        if len(order_ids) != 1:
+            _reject_page_token(page_token)
+        cursor = (submitted_at, order_ids[0])
+    await _reconcile_orders(acct_id, database, broker_client)
+    _orders = await run_in_threadpool(
+        functools.partial(
+            database.get_orders,
+            acct_id,
+            symbols=symbols,
+            side=side.value if side else None,
+            statuses=[s.value for s in status or []],
+            after=after,
+            until=until,
+            ascending=direction == Sort.ASC,
+            limit=limit,
+            cursor=cursor,
+        )
+    )
+    headers: dict[str, str] = {}
+    if len(_orders) == limit:
+        headers[NEXT_PAGE_TOKEN_HEADER] = f"{_orders[-1]['submitted_at']},{_orders[-1]['id']}"
+    return json_response(
+        [parsers.parse_raw_order(raw_order) for raw_order in _orders], headers=headers
     )
-    orders = []
-    for raw_order in _orders:
-        assert isinstance(raw_order, dict)
-        o = Order(**raw_order) if "commission" in raw_order else Order(**raw_order, commission=0)
-        orders.append(o)
-    return orders
 
 
 @router.delete("/{order_id}")
-def cancel_order(
+async def cancel_order(
     order_id: str,
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_broker_client),
+    background_tasks: BackgroundTasks,
+    account: AccountContext = Depends(get_current_account),
+    database: MongoDatabase = Depends(get_db),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> None:
-    """Cancel the order using the order ID."""
-    broker_client.cancel_order_for_account_by_id(
-        account_id=_get_account_id_by_email(email=user.email, broker_client=broker_client),
+    """Cancel the order using the order ID, and store its new status in the orders history."""
+    await broker_client.cancel_order_for_account_by_id(
+        account_id=account.account_id,
         order_id=order_id,
     )
+    # the order might have been partially filled
+    invalidate_positions(account.account_id)
+    background_tasks.add_task(_store_order, account.account_id, order_id, database, broker_client)
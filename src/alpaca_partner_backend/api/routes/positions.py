@@ -1,15 +1,22 @@
 """Router for market data."""
 import logging
+from collections import defaultdict
 
-from alpaca.broker import BrokerClient
-from alpaca.trading import Order, Position
-from fastapi import APIRouter, Depends
+from alpaca.data import StockLatestQuoteRequest
+from alpaca.trading import AssetClass, ClosePositionRequest, Order, Position
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
 
-from alpaca_partner_backend.api.common import get_broker_client, get_raw_broker_client
-from alpaca_partner_backend.api.routes.accounts import _get_account_id_by_email
-from alpaca_partner_backend.api.routes.users import get_current_user
-from alpaca_partner_backend.enums import Routers
-from alpaca_partner_backend.models import User
+from alpaca_partner_backend.api import parsers
+from alpaca_partner_backend.api.async_clients import AsyncBrokerClient, AsyncDataClient
+from alpaca_partner_backend.api.common import get_async_broker_client, get_async_data_client
+from alpaca_partner_backend.api.events import Event, on_event
+from alpaca_partner_backend.api.routes.accounts import get_current_account
+from alpaca_partner_backend.api.routes.logos import get_cached_logo_etag, get_logo_url
+from alpaca_partner_backend.enums import EventStream, Routers
+from alpaca_partner_backend.models import AccountContext, ClosePositionResult, Holding
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
+from alpaca_partner_backend.utils.concurrency import SingleFlight, gather_settled
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -20,31 +27,186 @@ router = APIRouter(
 )
 
 
+# the positions by account ID with the time they have been fetched,
+# kept after they expire for the stale-while-revalidate window
+positions_cache: TTLCache[str, tuple[float, list[Position]]] = TTLCache(
+    maxsize=SETTINGS.POSITIONS_CACHE_MAXSIZE,
+    ttl=SETTINGS.POSITIONS_CACHE_TTL_SECONDS + SETTINGS.POSITIONS_CACHE_STALE_SECONDS,
+)
+# the positions being fetched by account ID and generation, awaited by the concurrent requests
+positions_fetches: SingleFlight[list[Position]] = SingleFlight()
+# the number of invalidations by account ID, the fetches in flight during one are not cached
+positions_generations: defaultdict[str, int] = defaultdict(int)
+
+
+def invalidate_positions(account_id: str) -> None:
+    """Invalidate the cached positions of the account, after an order or a fill."""
+    positions_generations[account_id] += 1
+    positions_cache.invalidate(account_id)
+
+
+@on_event(EventStream.TRADES)
+def _invalidate_positions_on_trade(event: Event) -> None:
+    """
+    Invalidate the positions of the account of a trade event, e.g. a fill.
+
+    The events are received only while a client is subscribed to the events of an account,
+    otherwise the fills that follow the orders are seen once the cached positions expire.
+    """
+    for account_id in event.account_ids:
+        invalidate_positions(account_id)
+
+
+async def _fetch_positions(account_id: str, broker_client: AsyncBrokerClient) -> list[Position]:
+    """Get the positions from the Broker API and cache them, once for the concurrent requests."""
+    generation = positions_generations[account_id]
+
+    async def _fetch() -> list[Position]:
+        positions = await broker_client.get_all_positions_for_account(account_id=account_id)
+        assert isinstance(positions, list)
+        # the positions fetched before an order or a fill are returned but not cached
+        if positions_generations[account_id] == generation:
+            positions_cache.set(account_id, (positions_cache.timer(), positions))
+        return positions
+
+    positions, _ = await positions_fetches.run((account_id, generation), _fetch)
+    return positions
+
+
+async def _refresh_positions(account_id: str, broker_client: AsyncBrokerClient) -> None:
+    """Refresh the stale positions, the next requests get the stale ones until it succeeds."""
+    try:
+        await _fetch_positions(account_id, broker_client)
+    except Exception:
+        log.exception("Could not refresh the positions of the account %s", account_id)
+
+
+async def _get_cached_positions(
+    account_id: str,
+    broker_client: AsyncBrokerClient,
+    background_tasks: BackgroundTasks,
+) -> list[Position]:
+    """Get the cached positions, refreshed in the background if stale, or fetch them."""
+    cached = positions_cache.get(account_id)
+    if cached is None:
+        return await _fetch_positions(account_id, broker_client)
+    fetched_at, positions = cached
+    if positions_cache.timer() - fetched_at >= SETTINGS.POSITIONS_CACHE_TTL_SECONDS:
+        background_tasks.add_task(_refresh_positions, account_id, broker_client)
+    return positions
+
+
 @router.get("/")
-def get_positions(
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_broker_client),
+async def get_positions(
+    background_tasks: BackgroundTasks,
+    account: AccountContext = Depends(get_current_account),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> list[Position]:
-    """Get the positions for the current user account."""
-    positions = broker_client.get_all_positions_for_account(
-        account_id=_get_account_id_by_email(email=user.email, broker_client=broker_client)
+    """
+    Get the positions for the current user account.
+
+    The positions are cached for `POSITIONS_CACHE_TTL_SECONDS`, and invalidated by the orders,
+    the closed positions and the trade events. With `POSITIONS_CACHE_STALE_SECONDS`
+    the expired positions are returned while they are refreshed in the background.
+    """
+    return await _get_cached_positions(account.account_id, broker_client, background_tasks)
+
+
+@router.get("/holdings")
+async def get_holdings(
+    background_tasks: BackgroundTasks,
+    account: AccountContext = Depends(get_current_account),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+    data_client: AsyncDataClient = Depends(get_async_data_client),
+) -> list[Holding]:
+    """
+    Get the positions for the current user account with the latest quote and the logo of each.
+
+    The latest quotes of all the US equities held are requested at once, so the holdings
+    cost at most two upstream requests whatever the number of positions. The logos are not
+    downloaded: their URL is returned, with the ETag of the ones cached for the conditional
+    requests of the client.
+    """
+    positions = await _get_cached_positions(account.account_id, broker_client, background_tasks)
+    symbols = [
+        position.symbol for position in positions if position.asset_class == AssetClass.US_EQUITY
+    ]
+    quotes = (
+        await data_client.get_stock_latest_quote(StockLatestQuoteRequest(symbol_or_symbols=symbols))
+        if symbols
+        else {}
     )
-    assert isinstance(positions, list)
-    return positions
+    return [
+        Holding(
+            position=position,
+            quote=parsers.parse_quote_to_jsonable(quotes[position.symbol])
+            if position.symbol in quotes
+            else None,
+            logo_url=get_logo_url(position.symbol),
+            logo_etag=get_cached_logo_etag(position.symbol),
+        )
+        for position in positions
+    ]
+
+
+@router.delete("/")
+async def close_positions(
+    symbols: list[str] | None = Query(default=None),
+    percentage: float | None = Query(default=None, gt=0, le=100),
+    account: AccountContext = Depends(get_current_account),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
+) -> list[ClosePositionResult]:
+    """
+    Close the positions in the symbols, or all of them, concurrently.
+
+    At most `ORDERS_BATCH_CONCURRENCY` closing orders are submitted to the Broker API
+    at the same time, and a position that cannot be closed does not stop the others.
+
+    Parameters
+    ----------
+    `symbols`: list[str] | None
+        the symbols of the positions to close, all the positions if None.
+    `percentage`: float | None
+        the percentage of each position to close, all of it if None.
+
+    Returns
+    -------
+    `list[ClosePositionResult]`:
+        the result of each position: the closing order, or the status code and the message
+        of the error.
+    """
+    acct_id = account.account_id
+    if symbols is None:
+        symbols = [position.symbol for position in await _fetch_positions(acct_id, broker_client)]
+    close_options = None if percentage is None else ClosePositionRequest(percentage=str(percentage))
+
+    async def _close(symbol: str) -> Order:
+        raw_closing_order = await broker_client.close_position_for_account(
+            account_id=acct_id, symbol_or_asset_id=symbol, close_options=close_options
+        )
+        return parsers.parse_raw_order(raw_closing_order)
+
+    results = await gather_settled(
+        [_close(symbol) for symbol in symbols], max_concurrency=SETTINGS.ORDERS_BATCH_CONCURRENCY
+    )
+    invalidate_positions(acct_id)
+    return [
+        parsers.parse_batch_result(result, model=ClosePositionResult, symbol=symbol)
+        for symbol, result in zip(symbols, results, strict=True)
+    ]
 
 
 @router.delete("/{symbol}")
-def close_position(
+async def close_position(
     symbol: str,
-    user: User = Depends(get_current_user),
-    broker_client: BrokerClient = Depends(get_raw_broker_client),
+    account: AccountContext = Depends(get_current_account),
+    broker_client: AsyncBrokerClient = Depends(get_async_broker_client),
 ) -> Order:
     """Close the position in the symbol."""
-    raw_closing_order = broker_client.close_position_for_account(
-        account_id=_get_account_id_by_email(email=user.email, broker_client=broker_client),
+    raw_closing_order = await broker_client.close_position_for_account(
+        account_id=account.account_id,
         symbol_or_asset_id=symbol,
     )
+    invalidate_positions(account.account_id)
     assert isinstance(raw_closing_order, dict)
-    closing_order = Order(**raw_closing_order, commission=0)
-    assert isinstance(closing_order, Order)
-    return closing_order
+    return parsers.parse_raw_order(raw_closing_order, model=Order)
@@ -1,24 +1,28 @@
 """Router for market data."""
 import logging
 from datetime import datetime, timedelta, timezone
-from functools import lru_cache
-from typing import Any
 
-import pandas as pd
+import numpy as np
 from alpaca.data import (
     Adjustment,
-    BarSet,
     StockBarsRequest,
-    StockHistoricalDataClient,
     StockLatestQuoteRequest,
     TimeFrame,
 )
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
 from alpaca_partner_backend.api import parsers
-from alpaca_partner_backend.api.common import get_data_client
-from alpaca_partner_backend.enums import BarsField, Routers
+from alpaca_partner_backend.api.async_clients import AsyncDataClient
+from alpaca_partner_backend.api.common import get_async_data_client
+from alpaca_partner_backend.api.responses import (
+    TABULAR_RESPONSES,
+    columns_response,
+    negotiate_media_type,
+)
+from alpaca_partner_backend.enums import BarsField, MediaType, Routers
 from alpaca_partner_backend.models.api import QuoteJson
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -28,17 +32,26 @@ router = APIRouter(
     tags=[Routers.PRICES.name],
 )
 
+bars_cache: TTLCache[
+    tuple[str, datetime | None, datetime | None], dict[str, np.ndarray]
+] = TTLCache(
+    maxsize=SETTINGS.MARKET_DATA_CACHE_MAXSIZE,
+    ttl=SETTINGS.BARS_CACHE_TTL_SECONDS,
+)
+
 
-@lru_cache
-def _cached_get_bars(
-    data_client: StockHistoricalDataClient,
+async def _cached_get_bars(
+    data_client: AsyncDataClient,
     symbol: str,
     start: datetime | None = None,
     end: datetime | None = None,
-) -> pd.DataFrame:
-    """Cache the bars call to the data client."""
+) -> dict[str, np.ndarray]:
+    """Cache the bars call to the data client, as arrays by column."""
+    cached = bars_cache.get((symbol, start, end))
+    if cached is not None:
+        return cached
     _now = datetime.now(tz=timezone.utc)
-    bars = data_client.get_stock_bars(
+    raw_bars = await data_client.get_stock_bars_raw(
         StockBarsRequest(
             symbol_or_symbols=symbol,
             start=start or _now - timedelta(days=365 * 2, minutes=15),
@@ -47,49 +60,48 @@ def _cached_get_bars(
             adjustment=Adjustment.ALL,
         )
     )
-    assert isinstance(bars, BarSet)
-    _df = bars.df
-    assert isinstance(_df, pd.DataFrame)
-    _df.reset_index(inplace=True)
-    _df.drop("symbol", inplace=True, axis=1)
-    _df["timestamp"] = pd.to_datetime(_df["timestamp"], unit="s").dt.strftime("%Y-%m-%d")
-    return _df
+    bars = parsers.parse_raw_bars_to_columns(raw_bars.get(symbol, []))
+    bars_cache.set((symbol, start, end), bars)
+    return bars
 
 
-@router.get("/bars")
-def get_bars(
+@router.get("/bars", responses=TABULAR_RESPONSES)
+async def get_bars(  # noqa: PLR0913
     symbol: str,
     start: datetime | None = None,
     end: datetime | None = None,
     bars_field: BarsField | None = None,
-    data_client: StockHistoricalDataClient = Depends(get_data_client),
-) -> list[list[Any]]:
-    """Get the bars for a certain symbol and timeframe."""
-    bars = _cached_get_bars(
+    data_client: AsyncDataClient = Depends(get_async_data_client),
+    media_type: MediaType = Depends(negotiate_media_type),
+) -> Response:
+    """Get the bars for a certain symbol and timeframe, as rows or by column."""
+    bars = await _cached_get_bars(
         data_client=data_client,
         symbol=symbol,
         start=start,
         end=end,
     )
-    return parsers.parse_df_to_list(
-        bars if not bars_field else bars.loc[:, ["timestamp", bars_field]]
+    return columns_response(
+        bars
+        if not bars_field
+        else {"timestamp": bars["timestamp"], bars_field.value: bars[bars_field.value]},
+        media_type,
     )
 
 
 @router.get("/quotes/latest")
-def get_latest_quote(
+async def get_latest_quote(
     symbol: str,
-    data_client: StockHistoricalDataClient = Depends(get_data_client),
+    data_client: AsyncDataClient = Depends(get_async_data_client),
 ) -> QuoteJson:
     """Get the latest quote from IEX for a certain symbol."""
     if not symbol:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No symbol provided"
         )
-    quote = data_client.get_stock_latest_quote(
+    quote = await data_client.get_stock_latest_quote(
         StockLatestQuoteRequest(
             symbol_or_symbols=symbol,
         )
     )
-    assert isinstance(quote, dict)
     return parsers.parse_quote_to_jsonable(quote[symbol])
@@ -1,18 +1,18 @@
 """Accounts endpoint router."""
 
 import logging
+from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
 from pydantic import EmailStr
 
 from alpaca_partner_backend.api.parsers import parse_user_to_output
 from alpaca_partner_backend.database import MongoDatabase, get_db
 from alpaca_partner_backend.enums.api import Routers
 from alpaca_partner_backend.models import AuthCredentials, Token, User, UserOut
-from alpaca_partner_backend.settings import SETTINGS
-from alpaca_partner_backend.utils.security import create_access_token
+from alpaca_partner_backend.utils.security import create_access_token, decode_access_token
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -25,6 +25,23 @@ router = APIRouter(
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
+def _get_token_claims(token: str) -> dict[str, Any]:
+    """Verify the access token and return its claims, the email must be in the `sub` claim."""
+    _headers = {"WWW-Authenticate": "Bearer"}
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid authentication credentials",
+        headers=_headers,
+    )
+    try:
+        payload = decode_access_token(token)
+        if payload.get("sub") is None:
+            raise credentials_exception
+    except JWTError as jwt_exception:
+        raise credentials_exception from jwt_exception
+    return payload
+
+
 def get_current_user(
     database: MongoDatabase = Depends(get_db),
     token: str | None = Depends(oauth2_scheme),
@@ -32,22 +49,8 @@ def get_current_user(
 ) -> User:
     """Function to get the current user and validate it's credentials."""
     assert token or _email, "You must provide an oauth2 token or an email."
-    _headers = {"WWW-Authenticate": "Bearer"}
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid authentication credentials",
-        headers=_headers,
-    )
     if not _email and token:
-        try:
-            payload = jwt.decode(
-                token, SETTINGS.AUTH_SECRET_KEY, algorithms=[SETTINGS.HASHING_ALGORITHM]
-            )
-            _email = payload.get("sub")
-            if _email is None:
-                raise credentials_exception
-        except JWTError as jwt_exception:
-            raise credentials_exception from jwt_exception
+        _email = _get_token_claims(token)["sub"]
     return database.get_user_by_email(email=_email)
 
 
@@ -73,6 +76,8 @@ def login(
     )
     access_token = create_access_token(
         data={"sub": user.email},
+        user_id=str(user.id),
+        account_id=user.alpaca_account_id,
     )
 
     return Token(access_token=access_token, token_type="bearer")
@@ -0,0 +1,56 @@
+"""Command to link the users created before account IDs were stored to their Alpaca accounts."""
+
+import logging
+
+import coloredlogs
+from alpaca.broker import BrokerClient
+from fastapi import HTTPException
+
+from alpaca_partner_backend.api.common import get_broker_client
+from alpaca_partner_backend.api.routes.accounts import _find_account_by_email
+from alpaca_partner_backend.database import MongoDatabase, get_db
+
+log = logging.getLogger(__name__)
+
+
+def backfill_alpaca_accounts(
+    database: MongoDatabase,
+    broker_client: BrokerClient,
+) -> int:
+    """
+    Store the Alpaca account ID on every user document that does not have it yet.
+
+    Parameters
+    ----------
+    `database`: MongoDatabase
+        the database with the users to backfill.
+    `broker_client`: BrokerClient
+        the client used to search the accounts by email.
+
+    Returns
+    -------
+    `int`:
+        the number of users that have been linked to their account.
+    """
+    linked = 0
+    for user in database.get_users_without_alpaca_account():
+        try:
+            account = _find_account_by_email(user.email, broker_client=broker_client)
+        except HTTPException:
+            log.warning("No Alpaca account found for user %s", user.id)
+            continue
+        database.set_user_alpaca_account(
+            email=user.email,
+            account_id=account["id"],
+            account_number=account.get("account_number"),
+        )
+        linked += 1
+    return linked
+
+
+if __name__ == "__main__":
+    coloredlogs.install(level=logging.INFO)
+    log.info(
+        "Linked %s users to their Alpaca account.",
+        backfill_alpaca_accounts(database=get_db(), broker_client=get_broker_client()),
+    )
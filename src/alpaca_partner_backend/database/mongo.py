@@ -1,12 +1,21 @@
 """MongoDB client implementation class for the broker backend."""
+import json
+from collections.abc import Sequence
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any
+
+from alpaca.trading import Asset
 from fastapi import HTTPException, status
 from pydantic import EmailStr
-from pymongo import MongoClient
-from pymongo.collection import Collection, InsertOneResult
+from pydantic.datetime_parse import parse_datetime
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReturnDocument, UpdateOne
+from pymongo.collection import Collection, InsertOneResult, UpdateResult
 from pymongo.database import Database
 
 from alpaca_partner_backend.models import AuthCredentials, User
+from alpaca_partner_backend.models.api import Activity
 from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
 from alpaca_partner_backend.utils.security import get_password_hash, verify_password
 
 
@@ -27,24 +36,551 @@ class MongoDatabase:
         self.database: Database = client["sandbox"]
         self.users_collection: Collection = self.database["users"]
         self.users_collection.create_index("email", unique=True)
+        self.users_collection.create_index("alpaca_account_id", unique=True, sparse=True)
+        self.users_cache: TTLCache[str, User] = TTLCache(
+            maxsize=SETTINGS.USERS_CACHE_MAXSIZE,
+            ttl=SETTINGS.USERS_CACHE_TTL_SECONDS,
+        )
+        self.equity_eod_collection: Collection = self.database["equity_eod"]
+        self.equity_eod_collection.create_index(
+            [("account_id", ASCENDING), ("timestamp", ASCENDING)], unique=True
+        )
+        self.equity_eod_coverage_collection: Collection = self.database["equity_eod_coverage"]
+        self.equity_eod_coverage_collection.create_index("account_id", unique=True)
+        self.activities_collection: Collection = self.database["activities"]
+        self.activities_collection.create_index(
+            [("account_id", ASCENDING), ("id", ASCENDING)], unique=True
+        )
+        self.activities_collection.create_index([("account_id", ASCENDING), ("date", ASCENDING)])
+        self.activities_collection.create_index(
+            [("account_id", ASCENDING), ("symbol", ASCENDING), ("date", ASCENDING)]
+        )
+        self.orders_collection: Collection = self.database["orders"]
+        self.orders_collection.create_index(
+            [("account_id", ASCENDING), ("id", ASCENDING)], unique=True
+        )
+        self.orders_collection.create_index(
+            [("account_id", ASCENDING), ("submitted_at", ASCENDING)]
+        )
+        self.orders_collection.create_index(
+            [("account_id", ASCENDING), ("symbol", ASCENDING), ("submitted_at", ASCENDING)]
+        )
+        self.orders_collection.create_index(
+            [("account_id", ASCENDING), ("status", ASCENDING), ("submitted_at", ASCENDING)]
+        )
+        self.orders_sync_collection: Collection = self.database["orders_sync"]
+        self.orders_sync_collection.create_index("account_id", unique=True)
+        self.idempotency_keys_collection: Collection = self.database["idempotency_keys"]
+        self.idempotency_keys_collection.create_index(
+            [("user", ASCENDING), ("key", ASCENDING)], unique=True
+        )
+        self.idempotency_keys_collection.create_index(
+            "created_at", expireAfterSeconds=SETTINGS.IDEMPOTENCY_KEYS_TTL_SECONDS
+        )
+        self.assets_collection: Collection = self.database["assets"]
+        # each refresh inserts its own generation of the assets, keyed by its time
+        self.assets_collection.create_index(
+            [("refreshed_at", ASCENDING), ("id", ASCENDING)], unique=True
+        )
+        for field in ("symbol", "name", "exchange", "class", "status"):
+            self.assets_collection.create_index([("refreshed_at", ASCENDING), (field, ASCENDING)])
+        self.assets_sync_collection: Collection = self.database["assets_sync"]
+
+    def invalidate_user(self, email: EmailStr) -> None:
+        """Remove the user from the users cache, to be called on every user document update."""
+        self.users_cache.invalidate(str(email))
 
     def create_user(self, auth_credentials: AuthCredentials) -> InsertOneResult:
         """Create a new user with the email and the hash of the password provided."""
-        return self.users_collection.insert_one(
+        insert_result = self.users_collection.insert_one(
             AuthCredentials(
                 email=auth_credentials.email, password=get_password_hash(auth_credentials.password)
             ).dict()
         )
+        self.invalidate_user(auth_credentials.email)
+        return insert_result
 
     def get_all_users(self) -> list[User]:
         """Get all users in the database."""
         return [User(u) for u in list(self.users_collection.find())]
 
     def get_user_by_email(self, email: EmailStr) -> User:
-        """Get the user by email."""
-        doc = self.users_collection.find_one(filter={"email": str(email)})
-        assert doc, f"Document with email {email} not found."
-        return User(**doc)
+        """Get the user by email, from the users cache if it has been read recently."""
+        user = self.users_cache.get(str(email))
+        if user is None:
+            doc = self.users_collection.find_one(filter={"email": str(email)})
+            assert doc, f"Document with email {email} not found."
+            user = User(**doc)
+            self.users_cache.set(str(email), user)
+        return user
+
+    def get_users_without_alpaca_account(self) -> list[User]:
+        """Get the users that have not been linked to an Alpaca account yet."""
+        return [
+            User(**doc)
+            for doc in self.users_collection.find(filter={"alpaca_account_id": {"$exists": False}})
+        ]
+
+    def set_user_alpaca_account(
+        self,
+        email: EmailStr,
+        account_id: str,
+        account_number: str | None = None,
+    ) -> UpdateResult:
+        """
+        Link the user with that email to its Alpaca account.
+
+        Parameters
+        ----------
+        `email`: EmailStr
+            the email of the user.
+        `account_id`: str
+            the Alpaca account ID.
+        `account_number`: str | None
+            the Alpaca account number, if known.
+        """
+        update_result = self.users_collection.update_one(
+            filter={"email": str(email)},
+            update={
+                "$set": {
+                    "alpaca_account_id": str(account_id),
+                    "alpaca_account_number": account_number,
+                }
+            },
+        )
+        self.invalidate_user(email)
+        return update_result
+
+    def get_equity_eod_coverage(self, account_id: str) -> tuple[int, int] | None:
+        """
+        Get the time range of the end of day equity stored for the account.
+
+        Returns
+        -------
+        `tuple[int, int] | None`:
+            the start of the oldest period downloaded and the timestamp of the last stored day,
+            None if nothing has been stored yet.
+        """
+        doc = self.equity_eod_coverage_collection.find_one(filter={"account_id": account_id})
+        return (doc["start"], doc["end"]) if doc else None
+
+    def save_equity_eod(
+        self,
+        account_id: str,
+        timestamps: list[int],
+        equity: list[float],
+        start: int,
+    ) -> None:
+        """
+        Store the end of day equity of the account, the days already stored are overwritten.
+
+        Parameters
+        ----------
+        `account_id`: str
+            the Alpaca account ID.
+        `timestamps`: list[int]
+            the UNIX timestamps of the days.
+        `equity`: list[float]
+            the end of day equity of each day.
+        `start`: int
+            the start of the period that has been downloaded, even if it has no days,
+            e.g. the account has been opened later.
+        """
+        if timestamps:
+            self.equity_eod_collection.bulk_write(
+                [
+                    UpdateOne(
+                        filter={"account_id": account_id, "timestamp": timestamp},
+                        update={"$set": {"equity": value}},
+                        upsert=True,
+                    )
+                    for timestamp, value in zip(timestamps, equity, strict=True)
+                ],
+                ordered=False,
+            )
+        self.equity_eod_coverage_collection.update_one(
+            filter={"account_id": account_id},
+            update={
+                "$min": {"start": start},
+                "$max": {"end": max(timestamps, default=start)},
+            },
+            upsert=True,
+        )
+
+    def get_equity_eod(self, account_id: str, start: int = 0) -> list[tuple[int, float]]:
+        """Get the stored end of day equity of the account from the start timestamp, by day."""
+        return [
+            (doc["timestamp"], doc["equity"])
+            for doc in self.equity_eod_collection.find(
+                filter={"account_id": account_id, "timestamp": {"$gte": start}},
+                projection={"_id": False, "timestamp": True, "equity": True},
+            ).sort("timestamp", ASCENDING)
+        ]
+
+    def get_last_activity_id(self, account_id: str) -> str | None:
+        """Get the ID of the last activity stored for the account, None if there are none."""
+        doc = self.activities_collection.find_one(
+            filter={"account_id": account_id},
+            projection={"_id": False, "id": True},
+            sort=[("id", DESCENDING)],
+        )
+        return doc["id"] if doc else None
+
+    def save_activities(self, account_id: str, activities: Sequence[tuple[str, Activity]]) -> None:
+        """
+        Store the activities of the account, the ones already stored are overwritten.
+
+        Parameters
+        ----------
+        `account_id`: str
+            the Alpaca account ID.
+        `activities`: Sequence[tuple[str, Activity]]
+            the Alpaca activity IDs with the parsed activities.
+        """
+        if not activities:
+            return
+        self.activities_collection.bulk_write(
+            [
+                UpdateOne(
+                    filter={"account_id": account_id, "id": activity_id},
+                    update={
+                        "$set": {
+                            "date": _to_utc_naive(activity.date),
+                            "symbol": activity.symbol,
+                            "activity_type": activity.activity_type.value,
+                            # as JSON, BSON has no plain dates or enums, Activity parses the strings back
+                            "activity": json.loads(activity.json()),
+                        }
+                    },
+                    upsert=True,
+                )
+                for activity_id, activity in activities
+            ],
+            ordered=False,
+        )
+
+    def get_activities(  # noqa: PLR0913
+        self,
+        account_id: str,
+        after: datetime | None = None,
+        until: datetime | None = None,
+        activity_types: Sequence[str] | None = None,
+        symbol: str | None = None,
+        ascending: bool = False,
+        page_token: str | None = None,
+        limit: int = 0,
+    ) -> list[tuple[str, Activity]]:
+        """
+        Get the stored activities of the account, ordered by ID.
+
+        The Alpaca activity IDs start with the time of the activity, so the order is by time.
+
+        Parameters
+        ----------
+        `account_id`: str
+            the Alpaca account ID.
+        `after`: datetime | None
+            the activities after this time.
+        `until`: datetime | None
+            the activities until this time.
+        `activity_types`: Sequence[str] | None
+            the types of activities, all if None.
+        `symbol`: str | None
+            the symbol of the activities, all if None.
+        `ascending`: bool
+            the oldest activities first if True, the most recent ones otherwise.
+        `page_token`: str | None
+            the ID of the last activity of the previous page.
+        `limit`: int
+            the maximum number of activities, no limit if 0.
+
+        Returns
+        -------
+        `list[tuple[str, Activity]]`:
+            the Alpaca activity IDs with the activities.
+        """
+        query: dict = {"account_id": account_id}
+        if after or until:
+            query["date"] = {
+                **({"$gt": _to_utc_naive(after)} if after else {}),
+                **({"$lte": _to_utc_naive(until)} if until else {}),
+            }
+        if activity_types:
+            query["activity_type"] = {"$in": list(activity_types)}
+        if symbol:
+            query["symbol"] = symbol
+        if page_token:
+            query["id"] = {"$gt" if ascending else "$lt": page_token}
+        cursor = self.activities_collection.find(
+            filter=query, projection={"_id": False, "id": True, "activity": True}
+        ).sort("id", ASCENDING if ascending else DESCENDING)
+        return [(doc["id"], Activity(**doc["activity"])) for doc in cursor.limit(limit)]
+
+    def save_orders(self, account_id: str, raw_orders: Sequence[dict[str, Any]]) -> None:
+        """
+        Store the raw orders of the Broker API for the account, replacing the stored ones.
+
+        Parameters
+        ----------
+        `account_id`: str
+            the Alpaca account ID.
+        `raw_orders`: Sequence[dict[str, Any]]
+            the orders as returned by the Broker API.
+        """
+        if not raw_orders:
+            return
+        self.orders_collection.bulk_write(
+            [
+                UpdateOne(
+                    filter={"account_id": account_id, "id": raw_order["id"]},
+                    update={
+                        "$set": {
+                            "symbol": raw_order["symbol"],
+                            "side": raw_order["side"],
+                            "status": raw_order["status"],
+                            "submitted_at": _to_utc_naive(
+                                parse_datetime(raw_order["submitted_at"])
+                            ),
+                            "order": raw_order,
+                        }
+                    },
+                    upsert=True,
+                )
+                for raw_order in raw_orders
+            ],
+            ordered=False,
+        )
+
+    def get_orders_sync(self, account_id: str) -> tuple[datetime, datetime | None] | None:
+        """
+        Get when the orders of the account have been reconciled with the Broker API.
+
+        Returns
+        -------
+        `tuple[datetime, datetime | None] | None`:
+            the time of the last reconciliation and the last update time of the stored orders,
+            None if the orders have never been reconciled.
+        """
+        doc = self.orders_sync_collection.find_one(filter={"account_id": account_id})
+        if not doc:
+            return None
+        watermark = doc["watermark"]
+        return (
+            doc["reconciled_at"].replace(tzinfo=timezone.utc),
+            watermark.replace(tzinfo=timezone.utc) if watermark else None,
+        )
+
+    def set_orders_sync(
+        self,
+        account_id: str,
+        reconciled_at: datetime,
+        watermark: datetime | None,
+    ) -> None:
+        """Store when the orders of the account have been reconciled and their last update."""
+        self.orders_sync_collection.update_one(
+            filter={"account_id": account_id},
+            update={
+                "$set": {
+                    "reconciled_at": _to_utc_naive(reconciled_at),
+                    "watermark": _to_utc_naive(watermark) if watermark else None,
+                }
+            },
+            upsert=True,
+        )
+
+    def get_orders(  # noqa: PLR0913
+        self,
+        account_id: str,
+        symbols: Sequence[str] | None = None,
+        side: str | None = None,
+        statuses: Sequence[str] | None = None,
+        after: datetime | None = None,
+        until: datetime | None = None,
+        ascending: bool = False,
+        limit: int = 0,
+        cursor: tuple[datetime, str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Get the stored raw orders of the account, ordered by submission time and ID.
+
+        Parameters
+        ----------
+        `account_id`: str
+            the Alpaca account ID.
+        `symbols`: Sequence[str] | None
+            the symbols of the orders, all if None.
+        `side`: str | None
+            the side of the orders, both if None.
+        `statuses`: Sequence[str] | None
+            the statuses of the orders, all if None.
+        `after`: datetime | None
+            the orders submitted after this time.
+        `until`: datetime | None
+            the orders submitted before this time.
+        `ascending`: bool
+            the oldest orders first if True, the most recent ones otherwise.
+        `limit`: int
+            the maximum number of orders, no limit if 0.
+        `cursor`: tuple[datetime, str] | None
+            the submission time and the ID of the last order of the previous page,
+            the orders submitted at the same time are ordered by ID.
+
+        Returns
+        -------
+        `list[dict[str, Any]]`:
+            the orders as returned by the Broker API.
+        """
+        query: dict = {"account_id": account_id}
+        if symbols:
+            query["symbol"] = {"$in": list(symbols)}
+        if side:
+            query["side"] = side
+        if statuses:
+            query["status"] = {"$in": list(statuses)}
+        if after or until:
+            query["submitted_at"] = {
+                **({"$gt": _to_utc_naive(after)} if after else {}),
+                **({"$lt": _to_utc_naive(until)} if until else {}),
+            }
+        if cursor:
+            cursor_submitted_at, cursor_id = _to_utc_naive(cursor[0]), cursor[1]
+            operator = "$gt" if ascending else "$lt"
+            query["$or"] = [
+                {"submitted_at": {operator: cursor_submitted_at}},
+                {"submitted_at": cursor_submitted_at, "id": {operator: cursor_id}},
+            ]
+        sort_direction = ASCENDING if ascending else DESCENDING
+        docs = self.orders_collection.find(
+            filter=query, projection={"_id": False, "order": True}
+        ).sort([("submitted_at", sort_direction), ("id", sort_direction)])
+        return [doc["order"] for doc in docs.limit(limit)]
+
+    def get_idempotent_response(self, user: str, key: str) -> tuple[str, Any] | None:
+        """
+        Get the response stored for the idempotency key of the user, if not expired.
+
+        Returns
+        -------
+        `tuple[str, Any] | None`:
+            the fingerprint of the request and its response, None if not stored.
+        """
+        created_after = datetime.now(tz=timezone.utc) - timedelta(
+            seconds=SETTINGS.IDEMPOTENCY_KEYS_TTL_SECONDS
+        )
+        doc = self.idempotency_keys_collection.find_one(
+            filter={"user": user, "key": key, "created_at": {"$gt": _to_utc_naive(created_after)}}
+        )
+        return (doc["fingerprint"], doc["response"]) if doc else None
+
+    def save_idempotent_response(
+        self,
+        user: str,
+        key: str,
+        fingerprint: str,
+        response: Any,
+    ) -> None:
+        """
+        Store the response for the idempotency key of the user, the first one stored is kept.
+
+        Parameters
+        ----------
+        `user`: str
+            the user that sent the request, e.g. the email.
+        `key`: str
+            the idempotency key sent by the client.
+        `fingerprint`: str
+            the hash of the request, to detect a key reused with another request.
+        `response`: Any
+            the response to replay, which must be BSON serializable.
+        """
+        self.idempotency_keys_collection.update_one(
+            filter={"user": user, "key": key},
+            update={
+                "$setOnInsert": {
+                    "fingerprint": fingerprint,
+                    "response": response,
+                    "created_at": _to_utc_naive(datetime.now(tz=timezone.utc)),
+                }
+            },
+            upsert=True,
+        )
+
+    def save_assets(self, assets: Sequence[Asset], refreshed_at: datetime) -> None:
+        """
+        Replace the stored assets with the ones of a refresh of the catalogue.
+
+        The assets are stored as a new generation, the assets sync document is then moved to it
+        unless a later refresh has been stored already, and the older generations are deleted.
+        Workers refreshing at the same time never delete the assets of the last refresh.
+
+        Parameters
+        ----------
+        `assets`: Sequence[Asset]
+            all the assets of the Broker API.
+        `refreshed_at`: datetime
+            the time of the refresh.
+        """
+        refreshed_at = _to_utc_naive(refreshed_at)
+        if assets:
+            self.assets_collection.bulk_write(
+                [
+                    UpdateOne(
+                        filter={"refreshed_at": refreshed_at, "id": str(asset.id)},
+                        update={
+                            "$set": {
+                                "symbol": asset.symbol,
+                                "name": asset.name,
+                                "exchange": asset.exchange.value,
+                                "class": asset.asset_class.value,
+                                "status": asset.status.value,
+                                # by alias, the fields of the asset model are named after them
+                                "asset": json.loads(asset.json(by_alias=True)),
+                            }
+                        },
+                        upsert=True,
+                    )
+                    for asset in assets
+                ],
+                ordered=False,
+            )
+        sync = self.assets_sync_collection.find_one_and_update(
+            filter={"_id": "assets"},
+            update={"$max": {"refreshed_at": refreshed_at}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.assets_collection.delete_many(filter={"refreshed_at": {"$lt": sync["refreshed_at"]}})
+
+    def get_assets_refreshed_at(self) -> datetime | None:
+        """Get the time of the last refresh of the stored assets, None if never stored."""
+        doc = self.assets_sync_collection.find_one(filter={"_id": "assets"})
+        return doc["refreshed_at"].replace(tzinfo=timezone.utc) if doc else None
+
+    def get_assets(self, refreshed_at: datetime | None = None) -> list[Asset]:
+        """
+        Get the stored assets of a refresh.
+
+        Parameters
+        ----------
+        `refreshed_at`: datetime | None
+            the time of the refresh, the last one by default.
+
+        Returns
+        -------
+        `list[Asset]`:
+            the assets, empty if the refresh has been replaced by a later one since.
+        """
+        if refreshed_at is None:
+            refreshed_at = self.get_assets_refreshed_at()
+            if refreshed_at is None:
+                return []
+        return [
+            Asset(**doc["asset"])
+            for doc in self.assets_collection.find(
+                filter={"refreshed_at": _to_utc_naive(refreshed_at)},
+                projection={"_id": False, "asset": True},
+            )
+        ]
 
     def authenticate_user(
         self,
@@ -60,3 +596,12 @@ class MongoDatabase:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         return user
+
+
+def _to_utc_naive(value: datetime | date) -> datetime:
+    """Convert a date or a datetime to a naive UTC datetime, like MongoDB stores them."""
+    if not isinstance(value, datetime):
+        return datetime.combine(value, time())
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
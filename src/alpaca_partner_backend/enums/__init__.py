@@ -1,10 +1,18 @@
 """Initialization of enums module."""
 from alpaca_partner_backend.enums.accounts import CountryCode
-from alpaca_partner_backend.enums.api import ActivityName, BarsField, Routers
+from alpaca_partner_backend.enums.api import (
+    ActivityName,
+    BarsField,
+    EventStream,
+    MediaType,
+    Routers,
+)
 
 __all__ = [
     "CountryCode",
     "Routers",
     "BarsField",
     "ActivityName",
+    "EventStream",
+    "MediaType",
 ]
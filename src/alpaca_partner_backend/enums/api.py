@@ -7,6 +7,7 @@ class Routers(str, Enum):
 
     ACCOUNTS = "/accounts"
     ASSETS = "/assets"
+    EVENTS = "/events"
     FUNDING = "/funding"
     LOGOS = "/logos"
     ORDERS = "/orders"
@@ -15,6 +16,22 @@ class Routers(str, Enum):
     USERS = "/users"
 
 
+class EventStream(str, Enum):
+    """Event streams of the Broker API, the name of the events sent to the clients."""
+
+    TRADES = "trades"
+    ACCOUNTS = "accounts"
+    JOURNALS = "journals"
+
+
+class MediaType(str, Enum):
+    """Media types of the responses with tabular data, negotiated with the Accept header."""
+
+    JSON = "application/json"
+    COLUMNAR_JSON = "application/vnd.columnar+json"
+    MSGPACK = "application/msgpack"
+
+
 class BarsField(str, Enum):
     """Field of a BarSet object."""
 
@@ -3,12 +3,17 @@ from alpaca_partner_backend.models.api import (
     AccountJson,
     AccountTrading,
     Activity,
+    AssetCatalogueInfo,
+    BatchOrderResult,
+    ClosePositionResult,
     CreateAccountRequest,
+    Holding,
     JournalRequestBody,
     QuoteJson,
 )
 from alpaca_partner_backend.models.database import DatabaseDocument
 from alpaca_partner_backend.models.user import (
+    AccountContext,
     AuthCredentials,
     Token,
     User,
@@ -16,12 +21,17 @@ from alpaca_partner_backend.models.user import (
 )
 
 __all__ = [
+    "AccountContext",
     "AccountTrading",
     "Activity",
+    "AssetCatalogueInfo",
     "AuthCredentials",
+    "BatchOrderResult",
+    "ClosePositionResult",
     "CreateAccountRequest",
     "DatabaseDocument",
     "AccountJson",
+    "Holding",
     "JournalRequestBody",
     "Token",
     "QuoteJson",
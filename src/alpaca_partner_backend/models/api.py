@@ -10,10 +10,12 @@ from alpaca.broker import (
     Contact,
     Disclosures,
     Identity,
+    Order,
     SupportedCurrencies,
     TrustedContact,
 )
 from alpaca.broker import CreateAccountRequest as AlpacaCreateAccountRequest
+from alpaca.trading import Position
 from alpaca.trading.enums import AccountStatus
 from pydantic import BaseModel
 
@@ -101,6 +103,20 @@ class Activity(BaseModel):
     symbol: str | None
 
 
+class BatchOrderResult(BaseModel):
+    """Result of an order of a batch, the order if it has been submitted or the error."""
+
+    status_code: int
+    order: Order | None = None
+    error: str | None = None
+
+
+class ClosePositionResult(BatchOrderResult):
+    """Result of the closure of a position, the closing order or the error."""
+
+    symbol: str
+
+
 class QuoteJson(BaseModel):
     """Base model to return only necessary quote fields."""
 
@@ -110,3 +126,21 @@ class QuoteJson(BaseModel):
     ask_price: float
     bid_exchange: str
     bid_price: float
+
+
+class Holding(BaseModel):
+    """Position with the latest quote and the logo of its symbol, a row of the holdings."""
+
+    position: Position
+    quote: QuoteJson | None = None
+    logo_url: str
+    logo_etag: str | None = None
+
+
+class AssetCatalogueInfo(BaseModel):
+    """State of the assets catalogue, to monitor its refreshes."""
+
+    refreshed_at: datetime | None = None
+    assets: int
+    # the last refresh failed, the assets are the ones of the previous one
+    stale: bool
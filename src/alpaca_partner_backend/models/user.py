@@ -1,7 +1,5 @@
 """Base models for the user."""
 
-from uuid import UUID
-
 from pydantic import BaseModel, EmailStr
 
 from alpaca_partner_backend.models import DatabaseDocument
@@ -13,7 +11,22 @@ class UserBase(BaseModel):
     email: EmailStr
 
 
-class User(UserBase, DatabaseDocument):
+class UserWithAlpacaAccount(UserBase):
+    """Base model for the User linked to an Alpaca account.
+
+    Attributes
+    ----------
+    `alpaca_account_id`: str | None
+        The Alpaca account ID, stored as a string since MongoDB has no native UUID field.
+    `alpaca_account_number`: str | None
+        The Alpaca account number.
+    """
+
+    alpaca_account_id: str | None = None
+    alpaca_account_number: str | None = None
+
+
+class User(UserWithAlpacaAccount, DatabaseDocument):
     """User data model for the User stored in MongoDB.
 
     Attributes
@@ -31,11 +44,23 @@ class UserOut(UserBase):
     email: EmailStr
 
 
-class UserWithAlpacaAccount(UserBase):
-    """Output model for the User."""
+class AccountContext(BaseModel):
+    """
+    Model to represent the authenticated user read from the access token claims.
 
-    alpaca_account_id: UUID
-    alpaca_account_number: int
+    Attributes
+    ----------
+    `user_id` : str
+        The ID of the user document.
+    `email` : EmailStr
+        Email address of the user.
+    `account_id` : str
+        The Alpaca account ID of the user.
+    """
+
+    user_id: str
+    email: EmailStr
+    account_id: str
 
 
 class AuthCredentials(BaseModel):
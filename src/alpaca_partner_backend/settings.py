@@ -15,12 +15,75 @@ class Settings(BaseSettings):
 
     # Database:
     MONGO_DB_URI: str
+    # serve the activities from the MongoDB ledger, synced incrementally from the Broker API
+    ACTIVITIES_LEDGER: bool = True
 
     # User authentication:
     AUTH_SECRET_KEY: str
     HASHING_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Upstream HTTP transport:
+    USE_SYNC_CLIENTS: bool = False
+    UPSTREAM_HTTP2: bool = False
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_TIMEOUT_SECONDS: float = 10.0
+
+    # Orders:
+    # the orders updated since a watermark are searched among the open ones
+    # and the closed ones submitted this number of days before it,
+    # since the good till canceled orders expire after 90 days
+    ORDERS_SYNC_LOOKBACK_DAYS: int = 90
+    # the orders history is reconciled with the Broker API at most this often
+    ORDERS_RECONCILE_INTERVAL_SECONDS: int = 60
+    ORDERS_BATCH_MAX_SIZE: int = 100
+    # the orders of a batch submitted to the Broker API at the same time
+    ORDERS_BATCH_CONCURRENCY: int = 10
+    # the responses of the orders with an Idempotency-Key are replayed for this time
+    IDEMPOTENCY_KEYS_TTL_SECONDS: int = 60 * 60 * 24
+    # reject locally the orders that the Broker API would reject, from the cached assets
+    # and trading account, instead of waiting for the round trip
+    PRE_TRADE_CHECKS: bool = False
+
+    # Assets:
+    # the catalogue of the assets is downloaded at startup and then refreshed this often,
+    # or after the retry time if the last refresh failed
+    ASSETS_CATALOGUE_REFRESH_SECONDS: int = 60 * 15
+    ASSETS_CATALOGUE_RETRY_SECONDS: int = 60
+
+    # Events:
+    # the events buffered for each client, the clients that fall behind are disconnected
+    EVENTS_SUBSCRIBER_BUFFER: int = 100
+    # a comment is sent to the clients after this time without events, to keep the connection
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    EVENTS_RECONNECT_SECONDS: float = 5.0
+
+    # Responses:
+    # serialize with orjson the responses of the routes that return them directly
+    FAST_JSON_RESPONSES: bool = True
+    # build the models of the Broker API responses without validating them again
+    TRUSTED_UPSTREAM_MODELS: bool = False
+
+    # In-process caches:
+    TOKENS_CACHE_MAXSIZE: int = 4096
+    USERS_CACHE_MAXSIZE: int = 1024
+    USERS_CACHE_TTL_SECONDS: int = 60
+    MARKET_DATA_CACHE_MAXSIZE: int = 128
+    BARS_CACHE_TTL_SECONDS: int = 60 * 60
+    LOGOS_CACHE_TTL_SECONDS: int = 60 * 60 * 24
+    IDEMPOTENCY_CACHE_MAXSIZE: int = 1024
+    TRADE_ACCOUNTS_CACHE_MAXSIZE: int = 1024
+    TRADE_ACCOUNTS_CACHE_TTL_SECONDS: int = 10
+    POSITIONS_CACHE_MAXSIZE: int = 1024
+    POSITIONS_CACHE_TTL_SECONDS: int = 5
+    # the expired positions are served for this time while they are refreshed in the background,
+    # stale-while-revalidate, disabled if 0
+    POSITIONS_CACHE_STALE_SECONDS: int = 0
+    # the accounts of the journals, for their status events that carry only the journal ID
+    JOURNALS_CACHE_MAXSIZE: int = 4096
+    JOURNALS_CACHE_TTL_SECONDS: int = 60 * 60 * 24
+
     class Config:
         """Configuration for settings."""
 
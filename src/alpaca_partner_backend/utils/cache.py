@@ -0,0 +1,101 @@
+"""Utils for in-process caching."""
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, NamedTuple, TypeVar
+
+KT = TypeVar("KT", bound=Hashable)
+VT = TypeVar("VT")
+
+
+class CacheInfo(NamedTuple):
+    """Cache statistics, same fields of `functools.lru_cache().cache_info()`."""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class TTLCache(Generic[KT, VT]):
+    """
+    Least-recently-used cache whose entries expire after a time to live.
+
+    All the operations hold a lock, so the cache can be shared by the sync routes
+    that run in the threadpool.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Least-recently-used cache with a time to live.
+
+        Parameters
+        ----------
+        `maxsize`: int
+            the maximum number of entries, the least recently used is evicted first.
+        `ttl`: float
+            the default time to live of the entries in seconds.
+        `timer`: Callable[[], float]
+            the clock used for the expiration, overridden in the tests.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[KT, tuple[float, VT]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of entries, including the expired ones not evicted yet."""
+        return len(self._data)
+
+    def get(self, key: KT) -> VT | None:
+        """Get the value for the key if present and not expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= self.timer():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: KT, value: VT, ttl: float | None = None) -> None:  # noqa: A003
+        """Store the value for the key, `ttl` overrides the default time to live."""
+        _ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if _ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self.timer() + _ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: KT) -> None:
+        """Remove the key from the cache."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self) -> CacheInfo:
+        """Get the hit and miss counters and the size of the cache."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
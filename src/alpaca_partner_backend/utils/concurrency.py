@@ -0,0 +1,161 @@
+"""Utils to await independent calls concurrently."""
+import functools
+import logging
+import time
+from collections.abc import Awaitable, Callable, Hashable, Mapping, Sequence
+from typing import Any, Generic, TypeVar
+
+import anyio
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def gather(
+    calls: Mapping[str, Awaitable[Any]],
+    timeout: float | None = None,
+    timeouts: Mapping[str, float] | None = None,
+) -> dict[str, Any]:
+    """
+    Await the calls concurrently and log how long each of them took.
+
+    If a call fails or times out the others are cancelled and the error is raised.
+
+    Parameters
+    ----------
+    `calls`: Mapping[str, Awaitable[Any]]
+        the calls to await by name, e.g. the coroutines of the async broker client.
+    `timeout`: float | None
+        the default timeout in seconds of each call, no timeout if None.
+    `timeouts`: Mapping[str, float] | None
+        the timeouts in seconds that override the default one for some calls.
+
+    Returns
+    -------
+    `dict[str, Any]`:
+        the results of the calls by name.
+
+    Raises
+    ------
+    `TimeoutError`:
+        if a call does not complete within its timeout.
+    """
+    results: dict[str, Any] = {}
+    elapsed: dict[str, float] = {}
+    errors: list[Exception] = []
+
+    async def _await(name: str, call: Awaitable[Any], cancel_scope: anyio.CancelScope) -> None:
+        _timeout = (timeouts or {}).get(name, timeout)
+        start = time.perf_counter()
+        try:
+            with anyio.fail_after(_timeout):
+                results[name] = await call
+        except TimeoutError:
+            errors.append(TimeoutError(f"The {name} call timed out after {_timeout} seconds"))
+            cancel_scope.cancel()
+        except Exception as exc:
+            # raise the first error as is instead of the exception group of the task group
+            errors.append(exc)
+            cancel_scope.cancel()
+        finally:
+            elapsed[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    async with anyio.create_task_group() as task_group:
+        for name, call in calls.items():
+            task_group.start_soon(
+                functools.partial(_await, name, call, task_group.cancel_scope), name=name
+            )
+    log.info(
+        "Gathered %s calls in %.1fms (%s)",
+        len(calls),
+        (time.perf_counter() - start) * 1000,
+        ", ".join(f"{name}: {seconds * 1000:.1f}ms" for name, seconds in elapsed.items()),
+    )
+    if errors:
+        raise errors[0]
+    return results
+
+
+async def gather_settled(
+    calls: Sequence[Awaitable[Any]],
+    max_concurrency: int,
+) -> list[Any]:
+    """
+    Await the calls with a bounded concurrency, without cancelling the others if one fails.
+
+    Parameters
+    ----------
+    `calls`: Sequence[Awaitable[Any]]
+        the calls to await, e.g. the coroutines of the async broker client.
+    `max_concurrency`: int
+        the maximum number of calls awaited at the same time.
+
+    Returns
+    -------
+    `list[Any]`:
+        the result of each call in the same order, or the error it raised.
+    """
+    results: list[Any] = [None] * len(calls)
+    limiter = anyio.CapacityLimiter(max_concurrency)
+
+    async def _await(index: int, call: Awaitable[Any]) -> None:
+        async with limiter:
+            try:
+                results[index] = await call
+            except Exception as exc:
+                results[index] = exc
+
+    start = time.perf_counter()
+    async with anyio.create_task_group() as task_group:
+        for index, call in enumerate(calls):
+            task_group.start_soon(functools.partial(_await, index, call))
+    log.info(
+        "Settled %s calls in %.1fms, %s failed",
+        len(calls),
+        (time.perf_counter() - start) * 1000,
+        sum(isinstance(result, Exception) for result in results),
+    )
+    return results
+
+
+class SingleFlight(Generic[T]):
+    """
+    Deduplicate the concurrent calls by key: the duplicates await the call in flight.
+
+    The duplicates get the same result or error of the call in flight. If it is cancelled,
+    e.g. the client disconnected, one of the duplicates calls again.
+    """
+
+    def __init__(self) -> None:
+        """Deduplicate the concurrent calls by key."""
+        self._calls: dict[Hashable, tuple[anyio.Event, dict[str, Any]]] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        Call the function, or await the call in flight with the same key.
+
+        Returns
+        -------
+        `tuple[T, bool]`:
+            the result, and if it is the one of another call in flight.
+        """
+        while key in self._calls:
+            event, outcome = self._calls[key]
+            await event.wait()
+            if "error" in outcome:
+                raise outcome["error"]
+            if "result" in outcome:
+                return outcome["result"], True
+        event, outcome = anyio.Event(), {}
+        self._calls[key] = (event, outcome)
+        try:
+            outcome["result"] = await func()
+        except Exception as exc:
+            outcome["error"] = exc
+            raise
+        finally:
+            del self._calls[key]
+            event.set()
+        return outcome["result"], False
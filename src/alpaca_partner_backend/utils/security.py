@@ -1,8 +1,11 @@
 """Utils for security and encoding."""
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Any
 
 from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.cache import TTLCache
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from passlib.context import CryptContext
@@ -11,6 +14,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# decoded claims by token digest, each entry expires with its token
+tokens_cache: TTLCache[str, dict[str, Any]] = TTLCache(
+    maxsize=SETTINGS.TOKENS_CACHE_MAXSIZE,
+    ttl=SETTINGS.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
 
 def get_password_hash(password: str) -> str:
     """Get the hash of the password provided."""
@@ -22,12 +31,57 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
-    """Create the JWT access token."""
+def create_access_token(
+    data: dict[str, Any],
+    expires_delta: timedelta | None = None,
+    user_id: str | None = None,
+    account_id: str | None = None,
+) -> str:
+    """
+    Create the JWT access token.
+
+    Parameters
+    ----------
+    `data`: dict[str, Any]
+        the claims to encode, the user email is expected in the `sub` claim.
+    `expires_delta`: timedelta | None
+        the validity of the token.
+    `user_id`: str | None
+        the ID of the user document, encoded in the `uid` claim.
+    `account_id`: str | None
+        the Alpaca account ID of the user, encoded in the `account_id` claim.
+    """
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(SETTINGS.ACCESS_TOKEN_EXPIRE_MINUTES, minutes=15)
     to_encode.update({"exp": expire})
+    if user_id:
+        to_encode.update({"uid": user_id})
+    if account_id:
+        to_encode.update({"account_id": account_id})
     return jwt.encode(to_encode, SETTINGS.AUTH_SECRET_KEY, algorithm=SETTINGS.HASHING_ALGORITHM)
+
+
+def decode_access_token(token: str) -> dict[str, Any]:
+    """
+    Verify the signature and expiration of the JWT access token and return its claims.
+
+    The claims of valid tokens are cached until the token expires,
+    so the signature is verified once per token.
+
+    Raises
+    ------
+    `JWTError`:
+        if the token is not valid.
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    claims = tokens_cache.get(digest)
+    if claims is None:
+        claims = jwt.decode(
+            token, SETTINGS.AUTH_SECRET_KEY, algorithms=[SETTINGS.HASHING_ALGORITHM]
+        )
+        if "exp" in claims:
+            tokens_cache.set(digest, claims, ttl=claims["exp"] - time.time())
+    return dict(claims)
@@ -1,13 +1,28 @@
 """Test accouts router."""
+import functools
+import json
+from datetime import datetime, timedelta, timezone
+
+import anyio
 import httpx
+import pytest
 from alpaca.broker import Account, CreateAccountRequest
 from alpaca.common.enums import BaseURL
+from bson import ObjectId
 from fastapi.testclient import TestClient
 from requests_mock import Mocker
 
+from alpaca_partner_backend.api import parsers
+from alpaca_partner_backend.api.common import get_broker_client
+from alpaca_partner_backend.api.responses import NDJSON_MEDIA_TYPE, NEXT_PAGE_TOKEN_HEADER
+from alpaca_partner_backend.api.routes.accounts import _get_account_id, get_current_account
+from alpaca_partner_backend.database import MongoDatabase
 from alpaca_partner_backend.enums import Routers
-from alpaca_partner_backend.models import AccountJson
-from tests.conftest import TEST_EMAIL
+from alpaca_partner_backend.models import AccountContext, AccountJson, Activity, User
+from alpaca_partner_backend.settings import SETTINGS
+from alpaca_partner_backend.utils.security import create_access_token
+from tests.api.conftest import create_dummy_non_trade_activities, create_dummy_trade_activities
+from tests.conftest import TEST_EMAIL, TEST_PASSWORD
 
 ROUTER = Routers.ACCOUNTS.value
 
@@ -15,6 +30,7 @@ ROUTER = Routers.ACCOUNTS.value
 def test_mock_post_accounts(
     reqmock: Mocker,
     mock_api_client: TestClient,
+    mock_database: MongoDatabase,
     mock_alpaca_account: str,
     mock_alpaca_account_request: CreateAccountRequest,
 ) -> None:
@@ -32,6 +48,9 @@ def test_mock_post_accounts(
     assert isinstance(account, AccountJson)
     assert account.contact
     assert account.contact.email_address == mock_alpaca_account_request.contact.email_address
+    user = mock_database.get_user_by_email(email=TEST_EMAIL)
+    assert user.alpaca_account_id == account.id
+    assert user.alpaca_account_number == account.account_number
 
 
 def test_post_account(
@@ -61,6 +80,7 @@ def test_get_account_by_email(
     mock_get_alpaca_account_by_email: str,
     alpaca_account: Account,
     mock_api_client_with_user: TestClient,
+    mock_database_with_user: MongoDatabase,
 ) -> None:
     """Test GET method on the accounts router with email in the path."""
     reqmock.get(
@@ -79,6 +99,247 @@ def test_get_account_by_email(
     assert isinstance(account, AccountJson)
     assert account.contact
     assert account.contact.email_address == TEST_EMAIL
+    # the account found on the Broker API is stored for the next requests
+    user = mock_database_with_user.get_user_by_email(email=TEST_EMAIL)
+    assert user.alpaca_account_id == str(alpaca_account.id)
+
+
+def test_get_account_id_without_broker_search(
+    reqmock: Mocker,
+    mock_database: MongoDatabase,
+) -> None:
+    """Test that the account ID stored on the user skips the Broker API search."""
+    account_id = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    user = User(
+        _id=ObjectId(),
+        email=TEST_EMAIL,
+        password=TEST_PASSWORD,
+        alpaca_account_id=account_id,
+    )
+    assert (
+        _get_account_id(user, database=mock_database, broker_client=get_broker_client())
+        == account_id
+    )
+    assert not reqmock.called
+
+
+def test_get_current_account_from_claims(
+    reqmock: Mocker,
+    mock_database: MongoDatabase,
+) -> None:
+    """Test that the account context is read from the token claims without lookups."""
+    token = create_access_token(
+        data={"sub": TEST_EMAIL},
+        user_id=str(ObjectId()),
+        account_id="7ccfd029-9b91-40d0-9b4c-f928385af666",
+    )
+    # the mocked database is empty, so any lookup would fail
+    account = anyio.run(
+        functools.partial(
+            get_current_account,
+            token=token,
+            database=mock_database,
+            broker_client=get_broker_client(),
+        )
+    )
+    assert isinstance(account, AccountContext)
+    assert account.email == TEST_EMAIL
+    assert account.account_id == "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    assert not reqmock.called
+
+
+def test_get_current_account_from_database(
+    reqmock: Mocker,
+    mock_database_with_user: MongoDatabase,
+) -> None:
+    """Test that tokens without account claims fall back to the user document."""
+    mock_database_with_user.set_user_alpaca_account(
+        email=TEST_EMAIL,
+        account_id="7ccfd029-9b91-40d0-9b4c-f928385af666",
+    )
+    account = anyio.run(
+        functools.partial(
+            get_current_account,
+            token=create_access_token(data={"sub": TEST_EMAIL}),
+            database=mock_database_with_user,
+            broker_client=get_broker_client(),
+        )
+    )
+    assert account.account_id == "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    assert not reqmock.called
+
+
+def test_mock_get_ptf_history(
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the stored days are not downloaded again and today's equity is the current one."""
+    mock_database_with_user.set_user_alpaca_account(
+        email=TEST_EMAIL,
+        account_id=str(alpaca_account.id),
+    )
+    today = datetime.now(tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = [today - timedelta(days=2), today - timedelta(days=1), today]
+    current_equity = 1100.5
+    history_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/account/portfolio/history"
+
+    def mock_history(days: list[datetime]) -> None:
+        reqmock.get(
+            url=history_url,
+            json={
+                "timestamp": [int(day.timestamp()) for day in days],
+                "equity": [1000.0 + 10 * day.day for day in days],
+                "profit_loss": [0.0 for _ in days],
+                "profit_loss_pct": [0.0 for _ in days],
+                "base_value": 1000.0,
+                "timeframe": "1D",
+            },
+        )
+
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/account",
+        json={
+            "id": str(alpaca_account.id),
+            "account_number": alpaca_account.account_number,
+            "status": "ACTIVE",
+            "equity": str(current_equity),
+        },
+    )
+    expected = [
+        ["day", "equity"],
+        *([day.strftime("%Y-%m-%d"), 1000.0 + 10 * day.day] for day in days[:-1]),
+        [today.strftime("%Y-%m-%d"), current_equity],
+    ]
+    mock_history(days)
+    response = mock_api_client_with_user.get(url=f"{ROUTER}/portfolio/history")
+    assert httpx.codes.is_success(response.status_code)
+    assert response.json() == expected
+    assert len(mock_database_with_user.get_equity_eod(str(alpaca_account.id))) == len(days) - 1
+    # only the days since the last stored one are downloaded
+    mock_history(days[1:])
+    response = mock_api_client_with_user.get(url=f"{ROUTER}/portfolio/history")
+    assert httpx.codes.is_success(response.status_code)
+    assert response.json() == expected
+    history_requests = [r for r in reqmock.request_history if r.url.startswith(history_url)]
+    assert [r.qs["period"] for r in history_requests] == [["1m"], ["2d"]]
+
+
+def test_mock_get_activities_page(
+    monkeypatch: pytest.MonkeyPatch,
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that a page of activities of the Broker API is returned with the token of the next one."""
+    monkeypatch.setattr(SETTINGS, "ACTIVITIES_LEDGER", False)
+    mock_database_with_user.set_user_alpaca_account(
+        email=TEST_EMAIL,
+        account_id=str(alpaca_account.id),
+    )
+    raw_activities = [
+        json.loads(a.json())
+        for a in [*create_dummy_trade_activities(), *create_dummy_non_trade_activities()]
+    ]
+    page_size = 2
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts/activities",
+        json=raw_activities[:page_size],
+    )
+    response = mock_api_client_with_user.get(
+        url=f"{ROUTER}/activities",
+        params={"page_size": page_size, "activity_types": ["FILL", "FEE"]},
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert len(response.json()) == page_size
+    assert response.headers[NEXT_PAGE_TOKEN_HEADER] == raw_activities[page_size - 1]["id"]
+    assert reqmock.last_request is not None
+    assert reqmock.last_request.qs["page_size"] == [str(page_size)]
+    assert reqmock.last_request.qs["activity_types"] == ["fill,fee"]
+
+
+def test_mock_stream_activities(
+    monkeypatch: pytest.MonkeyPatch,
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that all the pages of activities of the Broker API are streamed as newline-delimited JSON."""
+    monkeypatch.setattr(SETTINGS, "ACTIVITIES_LEDGER", False)
+    mock_database_with_user.set_user_alpaca_account(
+        email=TEST_EMAIL,
+        account_id=str(alpaca_account.id),
+    )
+    raw_activities = [
+        json.loads(a.json())
+        for a in [*create_dummy_trade_activities(), *create_dummy_non_trade_activities()]
+    ]
+    page_size = 2
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts/activities",
+        response_list=[
+            {"json": raw_activities[i : i + page_size]}
+            for i in range(0, len(raw_activities), page_size)
+        ],
+    )
+    response = mock_api_client_with_user.get(
+        url=f"{ROUTER}/activities",
+        params={"page_size": page_size},
+        headers={"Accept": NDJSON_MEDIA_TYPE},
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+    activities = [Activity(**json.loads(line)) for line in response.text.splitlines()]
+    assert len(activities) == len(raw_activities)
+    page_tokens = [r.qs.get("page_token") for r in reqmock.request_history]
+    assert page_tokens == [None, [raw_activities[1]["id"]], [raw_activities[3]["id"]]]
+
+
+def test_mock_get_activities_from_ledger(
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the activities are synced after the last stored one and served from MongoDB."""
+    mock_database_with_user.set_user_alpaca_account(
+        email=TEST_EMAIL,
+        account_id=str(alpaca_account.id),
+    )
+    activities = [*create_dummy_trade_activities(), *create_dummy_non_trade_activities()]
+    raw_activities = [json.loads(a.json()) for a in activities]
+    # the Alpaca activity IDs start with the time of the activity
+    for i, raw_activity in enumerate(raw_activities):
+        raw_activity["id"] = f"20220121000000{i:03}::{raw_activity['id']}"
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts/activities",
+        response_list=[{"json": raw_activities}, {"json": []}],
+    )
+    page_size = 2
+    response = mock_api_client_with_user.get(
+        url=f"{ROUTER}/activities", params={"page_size": page_size}
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert response.json() == [
+        json.loads(a.json()) for a in parsers.parse_activities(activities[:-3:-1])
+    ]
+    assert response.headers[NEXT_PAGE_TOKEN_HEADER] == raw_activities[-2]["id"]
+    assert reqmock.last_request is not None
+    assert reqmock.last_request.qs["direction"] == ["asc"]
+    assert "page_token" not in reqmock.last_request.qs
+
+    response = mock_api_client_with_user.get(
+        url=f"{ROUTER}/activities",
+        params={"page_token": response.headers[NEXT_PAGE_TOKEN_HEADER], "symbol": "TEST"},
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert [a["activity_type"] for a in response.json()] == ["FILL", "FILL"]
+    assert reqmock.call_count == 2  # noqa: PLR2004
+    assert reqmock.last_request is not None
+    assert reqmock.last_request.qs["page_token"] == [raw_activities[-1]["id"].lower()]
 
 
 def test_integration_get_post_accounts(
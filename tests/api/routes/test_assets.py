@@ -1,4 +1,7 @@
 """Test assets router."""
+import json
+from uuid import uuid4
+
 import httpx
 from alpaca.common.enums import BaseURL
 from alpaca.trading import Asset, AssetClass, AssetStatus
@@ -108,13 +111,14 @@ def test_mock_get_active_assets(
     """Test the GET assets endpoint with underlying API call cached."""
     status = AssetStatus.ACTIVE.value
     reqmock.get(
-        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets?status={status}",
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets",
         text=mock_assets_json,
     )
     response = mock_api_client.get(url=ROUTER, params={"status": status})
     assert httpx.codes.is_success(response.status_code)
     assets = [Asset(**a) for a in response.json()]
     assert assets
+    assert all(a.status == status for a in assets)
 
 
 def test_mock_get_equity_assets(
@@ -125,10 +129,107 @@ def test_mock_get_equity_assets(
     """Test the GET assets endpoint with underlying API call cached."""
     asset_class = AssetClass.US_EQUITY.value
     reqmock.get(
-        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets?asset_class={asset_class}",
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets",
         text=mock_assets_json,
     )
     response = mock_api_client.get(url=ROUTER, params={"asset_class": asset_class})
     assert httpx.codes.is_success(response.status_code)
     assets = [Asset(**a) for a in response.json()]
     assert assets
+    assert all(a.asset_class == asset_class for a in assets)
+
+
+def test_mock_get_catalogue_info(
+    reqmock: Mocker,
+    mock_api_client: TestClient,
+    mock_assets_json: str,
+) -> None:
+    """Test that the assets are downloaded once for all the filters, with the refresh time."""
+    get_assets = reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets",
+        text=mock_assets_json,
+    )
+    response = mock_api_client.get(url=f"{ROUTER}/catalogue")
+    assert response.json() == {"refreshed_at": None, "assets": 0, "stale": False}
+    mock_api_client.get(url=ROUTER)
+    mock_api_client.get(url=f"{ROUTER}/symbols", params={"asset_class": "crypto"})
+    mock_api_client.get(url=f"{ROUTER}/names")
+    assert get_assets.call_count == 1
+    info = mock_api_client.get(url=f"{ROUTER}/catalogue").json()
+    assert info["refreshed_at"] is not None
+    assert info["assets"] == 1
+    assert info["stale"] is False
+
+
+def test_mock_get_stored_asset_by_symbol(
+    reqmock: Mocker,
+    mock_api_client: TestClient,
+    mock_assets_json: str,
+) -> None:
+    """Test that the assets stored by the catalogue are not requested to the Broker API."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets",
+        text=mock_assets_json,
+    )
+    mock_api_client.get(url=ROUTER)
+    get_asset = reqmock.get(url=f"{BaseURL.BROKER_SANDBOX}/v1/assets/AAPL", text="{}")
+    response = mock_api_client.get(url=f"{ROUTER}/symbols/AAPL")
+    assert httpx.codes.is_success(response.status_code)
+    assert response.json()["name"] == "Apple Inc. Common Stock"
+    assert get_asset.call_count == 0
+
+
+def test_mock_get_asset_by_name(
+    reqmock: Mocker,
+    mock_api_client: TestClient,
+    mock_assets_json: str,
+) -> None:
+    """Test that the assets are found by name in the catalogue."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets",
+        text=mock_assets_json,
+    )
+    response = mock_api_client.get(url=f"{ROUTER}/names/Apple Inc. Common Stock")
+    assert httpx.codes.is_success(response.status_code)
+    assert response.json()["symbol"] == "AAPL"
+    response = mock_api_client.get(url=f"{ROUTER}/names/Microsoft")
+    assert response.status_code == httpx.codes.NOT_FOUND
+
+
+def test_mock_get_asset_by_shared_name(
+    reqmock: Mocker,
+    mock_api_client: TestClient,
+    mock_assets_json: str,
+) -> None:
+    """Test that an asset is found by name when an earlier asset with it is not listed."""
+    raw_apple = json.loads(mock_assets_json)[0]
+    raw_assets = [
+        {**raw_apple, "id": str(uuid4()), "symbol": "AAPL.W", "fractionable": False},
+        {**raw_apple, "id": str(uuid4()), "symbol": "AAPL.X", "tradable": False},
+        raw_apple,
+    ]
+    reqmock.get(url=f"{BaseURL.BROKER_SANDBOX}/v1/assets", json=raw_assets)
+    response = mock_api_client.get(url=f"{ROUTER}/names/{raw_apple['name']}")
+    assert httpx.codes.is_success(response.status_code)
+    assert response.json()["symbol"] == raw_apple["symbol"]
+
+
+def test_mock_get_unknown_asset_by_symbol(
+    reqmock: Mocker,
+    mock_api_client: TestClient,
+    mock_assets_json: str,
+) -> None:
+    """Test that the assets missing from the catalogue are requested to the Broker API."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets",
+        text=mock_assets_json,
+    )
+    get_asset = reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets/MSFT",
+        status_code=httpx.codes.NOT_FOUND,
+        json={"code": 40410000, "message": "asset not found for MSFT"},
+    )
+    response = mock_api_client.get(url=f"{ROUTER}/symbols/MSFT")
+    assert response.status_code == httpx.codes.NOT_FOUND
+    assert response.json()["detail"] == "No asset with symbol MSFT was found."
+    assert get_asset.call_count == 1
@@ -0,0 +1,49 @@
+"""Test the events router."""
+from fastapi.testclient import TestClient
+
+from alpaca_partner_backend.api.common import get_event_hub
+from alpaca_partner_backend.api.events import Event, EventHub, LocalEventSource, journal_accounts
+from alpaca_partner_backend.api.main import app
+from alpaca_partner_backend.api.responses import SSE_MEDIA_TYPE
+from alpaca_partner_backend.database import MongoDatabase
+from alpaca_partner_backend.enums import EventStream, Routers
+from tests.conftest import TEST_EMAIL
+
+ROUTER = Routers.EVENTS.value
+ACCOUNT_ID = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+JOURNAL_ID = "1c0563fb-40b9-3d89-89d5-a976d1b45e4f"
+
+
+def test_stream_events(
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the events of the account are streamed until the source is closed."""
+    mock_database_with_user.set_user_alpaca_account(email=TEST_EMAIL, account_id=ACCOUNT_ID)
+    journal_accounts.set(JOURNAL_ID, ("sweep", ACCOUNT_ID))
+    source = LocalEventSource(
+        [
+            Event.from_data(
+                EventStream.TRADES,
+                {"event_id": 1, "account_id": ACCOUNT_ID, "event": "fill"},
+            ),
+            Event.from_data(
+                EventStream.ACCOUNTS,
+                {"event_id": 2, "account_id": "2d7d4ba2-7c68-4c2b-b2c3-0a3a1c7d1b9e"},
+            ),
+            Event.from_data(
+                EventStream.JOURNALS,
+                {"event_id": 3, "journal_id": JOURNAL_ID, "status_to": "executed"},
+            ),
+        ]
+    )
+    source.close()
+    app.dependency_overrides[get_event_hub] = lambda: EventHub(source)
+    response = mock_api_client_with_user.get(url=ROUTER)
+    assert response.headers["content-type"].startswith(SSE_MEDIA_TYPE)
+    assert response.text == (
+        "event: trades\nid: 1\n"
+        f'data: {{"event_id":1,"account_id":"{ACCOUNT_ID}","event":"fill"}}\n\n'
+        "event: journals\nid: 3\n"
+        f'data: {{"event_id":3,"journal_id":"{JOURNAL_ID}","status_to":"executed"}}\n\n'
+    )
@@ -5,6 +5,7 @@ from alpaca.common.enums import BaseURL
 from fastapi.testclient import TestClient
 from requests_mock import Mocker
 
+from alpaca_partner_backend.api.events import journal_accounts
 from alpaca_partner_backend.enums import Routers
 from tests.conftest import TEST_EMAIL
 
@@ -49,3 +50,8 @@ def test_mock_post_funding_journal(
     assert httpx.codes.is_success(response.status_code)
     journal = Journal(**response.json())
     assert journal.net_amount == amt
+    # the accounts of the journal are recorded for its status events
+    assert journal_accounts.get(str(journal.id)) == (
+        "3c0563fb-40b9-3d89-89d5-a976d1b45e4f",
+        "2c0563fb-40b9-3d89-89d5-a976d1b45e4f",
+    )
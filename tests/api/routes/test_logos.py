@@ -1,7 +1,9 @@
 """Test assets router."""
 import httpx
 from fastapi.testclient import TestClient
+from requests_mock import Mocker
 
+from alpaca_partner_backend.api.routes.logos import get_cached_logo_etag, logos_cache
 from alpaca_partner_backend.enums import Routers
 
 ROUTER = Routers.LOGOS.value
@@ -18,3 +20,25 @@ def test_get_logos(
     assert httpx.codes.is_success(response.status_code)
     logo_bytes = response.content
     assert isinstance(logo_bytes, bytes)
+
+
+def test_mock_get_logo_not_modified(
+    mock_api_client: TestClient,
+    reqmock: Mocker,
+) -> None:
+    """Test that the logo is not sent again to the clients with its ETag."""
+    logos_cache.clear()
+    get_logo = reqmock.get(
+        url="https://data.sandbox.alpaca.markets/v1beta1/logos/MOCK", content=b"\x89PNG"
+    )
+    assert get_cached_logo_etag("MOCK") is None
+    response = mock_api_client.get(url=f"{ROUTER}/MOCK")
+    assert response.content == b"\x89PNG"
+    etag = response.headers["ETag"]
+    assert etag == get_cached_logo_etag("MOCK")
+
+    response = mock_api_client.get(url=f"{ROUTER}/MOCK", headers={"If-None-Match": etag})
+    assert response.status_code == httpx.codes.NOT_MODIFIED
+    assert not response.content
+    assert get_logo.call_count == 1
+    logos_cache.clear()
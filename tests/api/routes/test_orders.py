@@ -1,12 +1,28 @@
 """Test assets router."""
+import json
+from typing import Any
+from uuid import uuid4
+
 import httpx
+import pytest
 from alpaca.broker import Account
 from alpaca.common import BaseURL
 from alpaca.trading import Order, OrderRequest
 from fastapi.testclient import TestClient
 from requests_mock import Mocker
 
+from alpaca_partner_backend.api.responses import (
+    IDEMPOTENCY_KEY_HEADER,
+    IDEMPOTENT_REPLAYED_HEADER,
+    NEXT_PAGE_TOKEN_HEADER,
+    WATERMARK_HEADER,
+)
+from alpaca_partner_backend.api.routes import orders
+from alpaca_partner_backend.api.routes.accounts import trade_accounts_cache
+from alpaca_partner_backend.api.routes.orders import idempotent_orders_cache
+from alpaca_partner_backend.database import MongoDatabase
 from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.settings import SETTINGS
 from tests.conftest import TEST_EMAIL
 
 ROUTER = Routers.ORDERS.value
@@ -63,6 +79,126 @@ def test_mock_get_orders(
     assert isinstance(orders, list)
 
 
+def test_mock_get_orders_page(
+    reqmock: Mocker,
+    mock_order_json: str,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that a full page of orders returns the cursor of the next page."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    raw_orders = [
+        {**json.loads(mock_order_json), "submitted_at": submitted_at}
+        for submitted_at in ("2023-01-05T15:00:00Z", "2023-01-04T15:00:00Z")
+    ]
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders",
+        json=raw_orders,
+    )
+    response = mock_api_client_with_user.get(
+        url=ROUTER,
+        params={"limit": len(raw_orders), "until": "2023-01-06T00:00:00Z", "direction": "desc"},
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert len(response.json()) == len(raw_orders)
+    assert (
+        response.headers[NEXT_PAGE_TOKEN_HEADER] == f"2023-01-04T15:00:00Z,{raw_orders[-1]['id']}"
+    )
+    assert reqmock.last_request is not None
+    assert reqmock.last_request.qs["until"] == ["2023-01-06t00:00:00z"]
+    assert reqmock.last_request.qs["direction"] == ["desc"]
+    assert reqmock.last_request.qs["status"] == ["all"]
+
+
+def test_mock_get_orders_next_page(
+    reqmock: Mocker,
+    mock_order_json: str,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the next page includes the orders submitted at the cursor, not returned yet."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    raw_orders = [
+        {**json.loads(mock_order_json), "id": str(uuid4()), "submitted_at": submitted_at}
+        for submitted_at in ("2023-01-04T15:00:00Z", "2023-01-04T15:00:00Z", "2023-01-03T15:00:00Z")
+    ]
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders",
+        json=raw_orders,
+    )
+    response = mock_api_client_with_user.get(
+        url=ROUTER,
+        params={"limit": 2, "page_token": f"2023-01-04T15:00:00Z,{raw_orders[0]['id']}"},
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert [order["id"] for order in response.json()] == [o["id"] for o in raw_orders[1:]]
+    assert (
+        response.headers[NEXT_PAGE_TOKEN_HEADER] == f"2023-01-03T15:00:00Z,{raw_orders[-1]['id']}"
+    )
+    assert reqmock.last_request is not None
+    assert reqmock.last_request.qs["until"] == ["2023-01-04t15:00:00.000001z"]
+    assert reqmock.last_request.qs["limit"] == ["3"]
+
+
+def test_mock_get_orders_invalid_page_token(
+    reqmock: Mocker,
+    mock_get_alpaca_account_by_email: str,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that a page token of another route is rejected."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    response = mock_api_client_with_user.get(url=ROUTER, params={"page_token": "next"})
+    assert response.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+
+
+def test_mock_get_orders_updated_since(
+    reqmock: Mocker,
+    mock_order_json: str,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that only the orders updated after the watermark are returned."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    raw_order = json.loads(mock_order_json)
+    old_open, new_open, closed = (
+        {**raw_order, "id": str(uuid4()), "updated_at": updated_at}
+        for updated_at in ("2023-01-02T15:00:00Z", "2023-01-04T15:00:00Z", "2023-01-05T15:00:00Z")
+    )
+    closed["status"] = "filled"
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders?status=open",
+        json=[old_open, new_open, {**closed, "status": "new"}],
+    )
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders?status=closed",
+        json=[closed],
+    )
+    response = mock_api_client_with_user.get(
+        url=ROUTER, params={"updated_since": "2023-01-03T00:00:00Z"}
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert [o["id"] for o in response.json()] == [closed["id"], new_open["id"]]
+    assert response.json()[0]["status"] == "filled"
+    assert response.headers[WATERMARK_HEADER] == closed["updated_at"]
+    closed_request = next(r for r in reqmock.request_history if r.qs.get("status") == ["closed"])
+    assert closed_request.qs["after"] == ["2022-10-05t00:00:00z"]
+
+
 def test_mock_cancel_order(
     reqmock: Mocker,
     mock_get_alpaca_account_by_email: str,
@@ -83,3 +219,319 @@ def test_mock_cancel_order(
         url=f"{ROUTER}/{ord_id}",
     )
     assert httpx.codes.is_success(response.status_code)
+
+
+def test_mock_get_orders_history(  # noqa: PLR0913
+    reqmock: Mocker,
+    mock_order_json: str,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the orders history is reconciled with the Broker API and searched in MongoDB."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    raw_order = json.loads(mock_order_json)
+    raw_orders = [
+        {**raw_order, "id": str(uuid4()), "symbol": symbol, "submitted_at": submitted_at}
+        for symbol, submitted_at in [
+            ("AAPL", "2023-01-05T15:00:00Z"),
+            ("TSLA", "2023-01-04T15:00:00Z"),
+            ("AAPL", "2023-01-03T15:00:00Z"),
+        ]
+    ]
+    orders_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders"
+    reqmock.get(url=f"{orders_url}?status=all", json=raw_orders)
+    response = mock_api_client_with_user.get(
+        url=f"{ROUTER}/history", params={"symbols": "AAPL", "limit": 1}
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert [o["id"] for o in response.json()] == [raw_orders[0]["id"]]
+    assert response.headers[NEXT_PAGE_TOKEN_HEADER] == (
+        f"{raw_orders[0]['submitted_at']},{raw_orders[0]['id']}"
+    )
+
+    # the next search is served from MongoDB, within the reconciliation interval
+    upstream_calls = reqmock.call_count
+    response = mock_api_client_with_user.get(
+        url=f"{ROUTER}/history",
+        params={"symbols": "AAPL", "page_token": response.headers[NEXT_PAGE_TOKEN_HEADER]},
+    )
+    assert [o["id"] for o in response.json()] == [raw_orders[2]["id"]]
+    assert reqmock.call_count == upstream_calls
+
+    # the canceled orders are stored with their new status
+    canceled = {**raw_orders[1], "status": "canceled"}
+    reqmock.delete(url=f"{orders_url}/{canceled['id']}")
+    reqmock.get(url=f"{orders_url}/{canceled['id']}", json=canceled)
+    mock_api_client_with_user.delete(url=f"{ROUTER}/{canceled['id']}")
+    response = mock_api_client_with_user.get(url=f"{ROUTER}/history", params={"status": "canceled"})
+    assert [o["id"] for o in response.json()] == [canceled["id"]]
+
+
+def test_mock_get_orders_history_same_time(  # noqa: PLR0913
+    reqmock: Mocker,
+    mock_order_json: str,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the orders submitted at the time of the end of a page are not skipped."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    raw_orders = [
+        {**json.loads(mock_order_json), "id": str(uuid4()), "submitted_at": submitted_at}
+        for submitted_at in ["2023-01-05T15:00:00.123456Z"] * 3 + ["2023-01-04T15:00:00Z"]
+    ]
+    orders_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders"
+    reqmock.get(url=f"{orders_url}?status=all", json=raw_orders)
+    order_ids = []
+    params: dict[str, Any] = {"limit": 2}
+    while True:
+        response = mock_api_client_with_user.get(url=f"{ROUTER}/history", params=params)
+        assert httpx.codes.is_success(response.status_code)
+        order_ids += [o["id"] for o in response.json()]
+        if NEXT_PAGE_TOKEN_HEADER not in response.headers:
+            break
+        params["page_token"] = response.headers[NEXT_PAGE_TOKEN_HEADER]
+    assert sorted(order_ids) == sorted(o["id"] for o in raw_orders)
+    assert order_ids[-1] == raw_orders[-1]["id"]
+
+    # the tokens of GET /orders/ with several orders at the cursor are rejected
+    response = mock_api_client_with_user.get(
+        url=f"{ROUTER}/history", params={"page_token": ",".join(order_ids[:3])}
+    )
+    assert response.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+
+
+def test_mock_create_orders_batch(  # noqa: PLR0913
+    reqmock: Mocker,
+    mock_order: Order,
+    mock_order_request: OrderRequest,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the orders of a batch are submitted and their results returned in order."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+
+    def submit(request: Any, context: Any) -> dict[str, Any]:
+        symbol = request.json()["symbol"]
+        if symbol == "FAIL":
+            context.status_code = httpx.codes.FORBIDDEN
+            return {"code": 40310000, "message": "insufficient buying power"}
+        return {**json.loads(mock_order.json()), "id": str(uuid4()), "symbol": symbol}
+
+    reqmock.post(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders",
+        json=submit,
+    )
+    symbols = ["AAPL", "FAIL", "TSLA"]
+    response = mock_api_client_with_user.post(
+        url=f"{ROUTER}/batch",
+        json=[json.loads(mock_order_request.copy(update={"symbol": s}).json()) for s in symbols],
+    )
+    assert httpx.codes.is_success(response.status_code)
+    results = response.json()
+    assert [r["status_code"] for r in results] == [200, 403, 200]
+    assert [r["order"]["symbol"] for r in results if r["order"]] == ["AAPL", "TSLA"]
+    assert results[1]["error"] == "insufficient buying power"
+    stored = mock_database_with_user.get_orders(str(alpaca_account.id))
+    assert sorted(o["symbol"] for o in stored) == ["AAPL", "TSLA"]
+
+    empty_batch = mock_api_client_with_user.post(url=f"{ROUTER}/batch", json=[])
+    assert empty_batch.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+
+
+def test_mock_create_order_idempotent(  # noqa: PLR0913
+    reqmock: Mocker,
+    mock_order: Order,
+    mock_order_request: OrderRequest,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the order with an idempotency key is submitted once and then replayed."""
+    idempotent_orders_cache.clear()
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    orders_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders"
+    submit = reqmock.post(url=orders_url, text=mock_order.json())
+    headers = {IDEMPOTENCY_KEY_HEADER: str(uuid4())}
+    order_json = json.loads(mock_order_request.json())
+
+    first = mock_api_client_with_user.post(url=ROUTER, json=order_json, headers=headers)
+    assert httpx.codes.is_success(first.status_code)
+    assert IDEMPOTENT_REPLAYED_HEADER not in first.headers
+    assert submit.last_request is not None
+    client_order_id = submit.last_request.json()["client_order_id"]
+    assert client_order_id
+
+    retry = mock_api_client_with_user.post(url=ROUTER, json=order_json, headers=headers)
+    assert retry.json() == first.json()
+    assert retry.headers[IDEMPOTENT_REPLAYED_HEADER] == "true"
+    # the responses are stored in MongoDB too
+    idempotent_orders_cache.clear()
+    retry = mock_api_client_with_user.post(url=ROUTER, json=order_json, headers=headers)
+    assert retry.json() == first.json()
+    assert submit.call_count == 1
+
+    other = mock_api_client_with_user.post(
+        url=ROUTER, json={**order_json, "qty": 2}, headers=headers
+    )
+    assert other.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+    assert submit.call_count == 1
+
+
+def test_mock_create_order_idempotent_duplicate(  # noqa: PLR0913
+    reqmock: Mocker,
+    mock_order: Order,
+    mock_order_request: OrderRequest,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the order already submitted with the client order ID of the key is returned."""
+    idempotent_orders_cache.clear()
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    orders_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/orders"
+    reqmock.post(
+        url=orders_url,
+        status_code=httpx.codes.UNPROCESSABLE_ENTITY,
+        json={"code": 40010001, "message": "client_order_id must be unique"},
+    )
+    by_client_id = reqmock.get(url=f"{orders_url}:by_client_order_id", text=mock_order.json())
+    response = mock_api_client_with_user.post(
+        url=ROUTER,
+        json=json.loads(mock_order_request.json()),
+        headers={IDEMPOTENCY_KEY_HEADER: str(uuid4())},
+    )
+    assert httpx.codes.is_success(response.status_code)
+    assert response.json()["id"] == str(mock_order.id)
+    assert by_client_id.last_request is not None
+    assert by_client_id.last_request.qs["client_order_id"]
+
+    # the order submitted with the key by the other process is not the one of the request
+    other = mock_api_client_with_user.post(
+        url=ROUTER,
+        json={**json.loads(mock_order_request.json()), "qty": 2},
+        headers={IDEMPOTENCY_KEY_HEADER: str(uuid4())},
+    )
+    assert other.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+
+
+def test_mock_create_order_idempotent_in_flight(  # noqa: PLR0913
+    monkeypatch: pytest.MonkeyPatch,
+    mock_order: Order,
+    mock_order_request: OrderRequest,
+    mock_get_alpaca_account_by_email: str,
+    reqmock: Mocker,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that a retry awaiting the submission of another order with the key is rejected."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    raw_order = json.loads(mock_order.json())
+
+    async def run_in_flight(*_: Any) -> tuple[tuple[str, dict[str, Any], bool], bool]:
+        # the result of the submission in flight of the request without the changes
+        return (orders._fingerprint(mock_order_request), raw_order, False), True
+
+    monkeypatch.setattr(orders.idempotent_submissions, "run", run_in_flight)
+    headers = {IDEMPOTENCY_KEY_HEADER: str(uuid4())}
+    order_json = json.loads(mock_order_request.json())
+    retry = mock_api_client_with_user.post(url=ROUTER, json=order_json, headers=headers)
+    assert retry.json()["id"] == str(mock_order.id)
+    assert retry.headers[IDEMPOTENT_REPLAYED_HEADER] == "true"
+    other = mock_api_client_with_user.post(
+        url=ROUTER, json={**order_json, "qty": 2}, headers=headers
+    )
+    assert other.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+
+
+def test_mock_create_order_pre_trade_checks(  # noqa: PLR0913
+    reqmock: Mocker,
+    monkeypatch: pytest.MonkeyPatch,
+    mock_order_json: str,
+    mock_order_request: OrderRequest,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_api_client_with_user: TestClient,
+) -> None:
+    """Test that the orders the Broker API would reject are rejected without submitting them."""
+    monkeypatch.setattr(SETTINGS, "PRE_TRADE_CHECKS", True)
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    raw_asset = {
+        "id": str(uuid4()),
+        "class": "us_equity",
+        "exchange": "NYSE",
+        "status": "active",
+        "tradable": True,
+        "marginable": True,
+        "shortable": True,
+        "easy_to_borrow": True,
+    }
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/assets",
+        json=[
+            {**raw_asset, "symbol": "AAPL", "fractionable": True},
+            {**raw_asset, "symbol": "BRK.A", "fractionable": False},
+        ],
+    )
+    account_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}"
+    trade_account = {
+        "id": str(alpaca_account.id),
+        "account_number": alpaca_account.account_number,
+        "status": "ACTIVE",
+        "buying_power": "50",
+    }
+    get_trade_account = reqmock.get(url=f"{account_url}/account", json=trade_account)
+    submit = reqmock.post(url=f"{account_url}/orders", text=mock_order_json)
+    trade_accounts_cache.clear()
+    order_json = json.loads(mock_order_request.json())
+    try:
+        response = mock_api_client_with_user.post(
+            url=ROUTER, json={**order_json, "symbol": "BRK.A", "qty": 0.5}
+        )
+        assert response.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+        assert response.json() == 'asset "BRK.A" is not fractionable'
+        assert submit.call_count == 0
+
+        # without a snapshot of the account the order is submitted, and the snapshot taken
+        response = mock_api_client_with_user.post(url=ROUTER, json=order_json)
+        assert httpx.codes.is_success(response.status_code)
+        assert submit.call_count == 1
+        assert get_trade_account.call_count == 1
+
+        # the snapshot is refreshed before rejecting the order
+        order_json = {**order_json, "qty": None, "notional": 100}
+        response = mock_api_client_with_user.post(url=ROUTER, json=order_json)
+        assert response.status_code == httpx.codes.FORBIDDEN
+        assert response.json() == "insufficient buying power"
+        assert get_trade_account.call_count == 2  # noqa: PLR2004
+        reqmock.get(url=f"{account_url}/account", json={**trade_account, "buying_power": "500"})
+        response = mock_api_client_with_user.post(url=ROUTER, json=order_json)
+        assert httpx.codes.is_success(response.status_code)
+        assert submit.call_count == 2  # noqa: PLR2004
+    finally:
+        trade_accounts_cache.clear()
@@ -1,12 +1,28 @@
 """Test positions router."""
+import json
+import re
+from typing import Any, cast
+from uuid import uuid4
+
+import anyio
 import httpx
+import pytest
 from alpaca.broker import Account
 from alpaca.common import BaseURL
-from alpaca.trading import Order
+from alpaca.trading import Order, Position
 from fastapi.testclient import TestClient
 from requests_mock import Mocker
 
-from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.api.async_clients import AsyncBrokerClient
+from alpaca_partner_backend.api.events import Event, EventHub, LocalEventSource
+from alpaca_partner_backend.api.routes.positions import (
+    _fetch_positions,
+    invalidate_positions,
+    positions_cache,
+)
+from alpaca_partner_backend.enums import EventStream, Routers
+from alpaca_partner_backend.settings import SETTINGS
+from tests.api.test_async_clients import MOCK_POSITION
 from tests.conftest import TEST_EMAIL
 
 ROUTER = Routers.POSITIONS.value
@@ -81,3 +97,198 @@ def test_mock_close_position(
     assert httpx.codes.is_success(response.status_code)
     order = Order(**response.json())
     assert order.symbol == symbol
+
+
+def test_mock_get_positions_cached(
+    mock_api_client_with_user: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_get_alpaca_account_by_email: str,
+) -> None:
+    """Test that the positions are cached until they expire or are invalidated by an event."""
+    now = [0.0]
+    monkeypatch.setattr(positions_cache, "timer", lambda: now[0])
+    positions_cache.clear()
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    get_positions = reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/positions",
+        json=[MOCK_POSITION],
+    )
+    for _ in range(2):
+        response = mock_api_client_with_user.get(url=ROUTER)
+        assert response.json()[0]["symbol"] == "AAPL"
+    assert get_positions.call_count == 1
+
+    now[0] += SETTINGS.POSITIONS_CACHE_TTL_SECONDS
+    mock_api_client_with_user.get(url=ROUTER)
+    assert get_positions.call_count == 2  # noqa: PLR2004
+
+    EventHub(LocalEventSource()).publish(
+        Event.from_data(EventStream.TRADES, {"account_id": str(alpaca_account.id)})
+    )
+    mock_api_client_with_user.get(url=ROUTER)
+    assert get_positions.call_count == 3  # noqa: PLR2004
+    positions_cache.clear()
+
+
+def test_positions_invalidated_during_fetch() -> None:
+    """Test that the positions fetched before an invalidation are not cached nor shared."""
+    positions_cache.clear()
+    account_id = str(uuid4())
+    fetched = [anyio.Event(), anyio.Event()]
+
+    calls = []
+
+    class BrokerClient:
+        async def get_all_positions_for_account(self, account_id: str) -> list[Position]:
+            calls.append(account_id)
+            await fetched[len(calls) - 1].wait()
+            return [Position(**MOCK_POSITION)]
+
+    broker_client = cast(AsyncBrokerClient, BrokerClient())
+
+    async def main() -> None:
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(_fetch_positions, account_id, broker_client)
+            await anyio.wait_all_tasks_blocked()
+            # an order is submitted while the positions are being fetched
+            invalidate_positions(account_id)
+            task_group.start_soon(_fetch_positions, account_id, broker_client)
+            await anyio.wait_all_tasks_blocked()
+            fetched[0].set()
+            await anyio.wait_all_tasks_blocked()
+            assert positions_cache.get(account_id) is None
+            fetched[1].set()
+
+    anyio.run(main)
+    # the request sent after the order does not await the fetch started before
+    assert len(calls) == 2  # noqa: PLR2004
+    assert positions_cache.get(account_id) is not None
+    positions_cache.clear()
+
+
+def test_mock_get_positions_stale_while_revalidate(
+    mock_api_client_with_user: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_get_alpaca_account_by_email: str,
+) -> None:
+    """Test that the expired positions are returned while they are refreshed in the background."""
+    now = [0.0]
+    monkeypatch.setattr(positions_cache, "timer", lambda: now[0])
+    monkeypatch.setattr(positions_cache, "ttl", SETTINGS.POSITIONS_CACHE_TTL_SECONDS * 2)
+    positions_cache.clear()
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    positions_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/positions"
+    reqmock.get(url=positions_url, json=[MOCK_POSITION])
+    mock_api_client_with_user.get(url=ROUTER)
+
+    now[0] += SETTINGS.POSITIONS_CACHE_TTL_SECONDS
+    refresh = reqmock.get(url=positions_url, json=[{**MOCK_POSITION, "qty": "10"}])
+    response = mock_api_client_with_user.get(url=ROUTER)
+    assert response.json()[0]["qty"] == "5"
+    # the positions have been refreshed after the response
+    assert refresh.call_count == 1
+    response = mock_api_client_with_user.get(url=ROUTER)
+    assert response.json()[0]["qty"] == "10"
+    assert refresh.call_count == 1
+    positions_cache.clear()
+
+
+def test_mock_close_positions(
+    mock_api_client_with_user: TestClient,
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_get_alpaca_account_by_email: str,
+    mock_order: Order,
+) -> None:
+    """Test that the positions are closed concurrently, with the result of each one."""
+    positions_cache.clear()
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    positions_url = f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/positions"
+    reqmock.get(
+        url=positions_url,
+        json=[{**MOCK_POSITION, "symbol": symbol} for symbol in ("AAPL", "FAIL", "TSLA")],
+    )
+
+    def close(request: Any, context: Any) -> dict[str, Any]:
+        symbol = request.path.rsplit("/", 1)[-1].upper()
+        if symbol == "FAIL":
+            context.status_code = httpx.codes.FORBIDDEN
+            return {"code": 40310000, "message": "insufficient qty available for order"}
+        return {**json.loads(mock_order.json()), "id": str(uuid4()), "symbol": symbol}
+
+    close_position = reqmock.delete(url=re.compile(f"{positions_url}/.+"), json=close)
+    response = mock_api_client_with_user.delete(url=ROUTER)
+    assert httpx.codes.is_success(response.status_code)
+    results = response.json()
+    assert [r["symbol"] for r in results] == ["AAPL", "FAIL", "TSLA"]
+    assert [r["status_code"] for r in results] == [200, 403, 200]
+    assert results[1]["error"] == "insufficient qty available for order"
+    assert [r["order"]["symbol"] for r in results if r["order"]] == ["AAPL", "TSLA"]
+    assert close_position.call_count == 3  # noqa: PLR2004
+
+    response = mock_api_client_with_user.delete(
+        url=ROUTER, params={"symbols": ["TSLA"], "percentage": 50}
+    )
+    assert [r["symbol"] for r in response.json()] == ["TSLA"]
+    assert close_position.last_request is not None
+    assert close_position.last_request.qs == {"percentage": ["50.0"]}
+    positions_cache.clear()
+
+
+def test_mock_get_holdings(
+    mock_api_client_with_user: TestClient,
+    reqmock: Mocker,
+    alpaca_account: Account,
+    mock_get_alpaca_account_by_email: str,
+) -> None:
+    """Test that the quotes of all the holdings are requested at once, with their logos."""
+    positions_cache.clear()
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/trading/accounts/{alpaca_account.id}/positions",
+        json=[
+            {**MOCK_POSITION, "symbol": "AAPL"},
+            {**MOCK_POSITION, "symbol": "TSLA"},
+            {**MOCK_POSITION, "symbol": "BTC/USD", "asset_class": "crypto"},
+        ],
+    )
+    quote = {
+        "t": "2022-08-16T20:00:00Z",
+        "ax": "V",
+        "ap": 173.1,
+        "as": 1,
+        "bx": "V",
+        "bp": 173.0,
+        "bs": 2,
+        "c": ["R"],
+    }
+    get_quotes = reqmock.get(
+        url="https://data.sandbox.alpaca.markets/v2/stocks/quotes/latest",
+        json={"quotes": {"AAPL": quote, "TSLA": {**quote, "ap": 900.5}}},
+    )
+    response = mock_api_client_with_user.get(url=f"{ROUTER}/holdings")
+    assert httpx.codes.is_success(response.status_code)
+    holdings = response.json()
+    assert [h["position"]["symbol"] for h in holdings] == ["AAPL", "TSLA", "BTC/USD"]
+    assert [h["quote"] and h["quote"]["ask_price"] for h in holdings] == [173.1, 900.5, None]
+    assert holdings[0]["logo_url"] == f"{Routers.LOGOS.value}/AAPL"
+    assert get_quotes.call_count == 1
+    assert get_quotes.last_request is not None
+    assert get_quotes.last_request.qs["symbols"] == ["aapl,tsla"]
+    positions_cache.clear()
@@ -1,8 +1,11 @@
 """Test assets router."""
 import httpx
+import msgpack
 from fastapi.testclient import TestClient
+from requests_mock import Mocker
 
-from alpaca_partner_backend.enums import Routers
+from alpaca_partner_backend.api.routes.prices import bars_cache
+from alpaca_partner_backend.enums import MediaType, Routers
 from alpaca_partner_backend.models.api import QuoteJson
 
 ROUTER = Routers.PRICES.value
@@ -36,3 +39,41 @@ def test_get_latest_quote(
     assert httpx.codes.is_success(response.status_code)
     quote = QuoteJson(**response.json())
     assert isinstance(quote, QuoteJson)
+
+
+def test_mock_get_bars_media_types(
+    reqmock: Mocker,
+    mock_api_client: TestClient,
+) -> None:
+    """Test the GET bars endpoint as rows, columnar JSON and MessagePack."""
+    bars_cache.clear()
+    reqmock.get(
+        url="https://data.sandbox.alpaca.markets/v2/stocks/AAPL/bars",
+        json={
+            "bars": [
+                {"t": "2023-01-03T05:00:00Z", "o": 130.28, "h": 130.9, "l": 124.17,
+                 "c": 125.07, "v": 112117471, "n": 1021065, "vw": 125.725},
+            ],
+            "symbol": "AAPL",
+            "next_page_token": None,
+        },
+    )  # fmt: skip
+    params = {"symbol": "AAPL", "bars_field": "close"}
+    response = mock_api_client.get(url=f"{ROUTER}/bars", params=params)
+    assert response.json() == [["timestamp", "close"], ["2023-01-03", 125.07]]
+    response = mock_api_client.get(
+        url=f"{ROUTER}/bars",
+        params=params,
+        headers={"Accept": MediaType.COLUMNAR_JSON.value},
+    )
+    assert response.headers["content-type"] == MediaType.COLUMNAR_JSON.value
+    assert response.json() == {"timestamp": ["2023-01-03"], "close": [125.07]}
+    response = mock_api_client.get(
+        url=f"{ROUTER}/bars",
+        params=params,
+        headers={"Accept": MediaType.MSGPACK.value},
+    )
+    assert response.headers["content-type"] == MediaType.MSGPACK.value
+    assert msgpack.unpackb(response.content) == {"timestamp": ["2023-01-03"], "close": [125.07]}
+    # the bars are downloaded once
+    assert reqmock.call_count == 1
@@ -6,7 +6,8 @@ from fastapi.testclient import TestClient
 from alpaca_partner_backend.api.routes.users import get_current_user
 from alpaca_partner_backend.database.mongo import MongoDatabase
 from alpaca_partner_backend.enums import Routers
-from alpaca_partner_backend.models import AuthCredentials, User, UserOut
+from alpaca_partner_backend.models import AuthCredentials, Token, User, UserOut
+from alpaca_partner_backend.utils.security import decode_access_token
 from tests.conftest import TEST_EMAIL
 
 ROUTER = Routers.USERS.value
@@ -43,6 +44,24 @@ def test_login(mock_api_client_with_user: TestClient, mock_credentials: AuthCred
     assert httpx.codes.is_success(response.status_code)
 
 
+def test_login_token_claims(
+    mock_api_client_with_user: TestClient,
+    mock_database_with_user: MongoDatabase,
+    mock_credentials: AuthCredentials,
+) -> None:
+    """Test that the login token carries the account ID of a linked user."""
+    account_id = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    mock_database_with_user.set_user_alpaca_account(email=TEST_EMAIL, account_id=account_id)
+    response = mock_api_client_with_user.post(
+        url=ROUTER + "/login",
+        json=mock_credentials.dict(),
+    )
+    assert httpx.codes.is_success(response.status_code)
+    claims = decode_access_token(Token(**response.json()).access_token)
+    assert claims["account_id"] == account_id
+    assert claims["uid"] == str(mock_database_with_user.get_user_by_email(email=TEST_EMAIL).id)
+
+
 def test_register_error(
     mock_api_client_with_user: TestClient, mock_credentials: AuthCredentials
 ) -> None:
@@ -0,0 +1,73 @@
+"""Test the in-memory store of the assets."""
+from uuid import uuid4
+
+from alpaca.trading import Asset, AssetClass, AssetExchange, AssetStatus
+
+from alpaca_partner_backend.api.asset_store import AssetStore
+
+
+def _asset(symbol: str, **fields: object) -> Asset:
+    """Create an active asset, tradable and fractionable unless overridden."""
+    return Asset(
+        **{
+            "id": uuid4(),
+            "class": AssetClass.US_EQUITY,
+            "exchange": AssetExchange.NASDAQ,
+            "symbol": symbol,
+            "name": f"{symbol} Inc.",
+            "status": AssetStatus.ACTIVE,
+            "tradable": True,
+            "marginable": True,
+            "shortable": True,
+            "easy_to_borrow": True,
+            "fractionable": True,
+            **fields,
+        }
+    )
+
+
+def test_asset_store_indexes() -> None:
+    """Test that the assets are found by symbol, name and ID, the active ones first."""
+    delisted = _asset("AAPL", status=AssetStatus.INACTIVE, name="Apple Inc.")
+    apple = _asset("AAPL", name="Apple Inc.", min_order_size=0.0001)
+    halted = _asset("BRK.A", tradable=False)
+    store = AssetStore([delisted, apple, halted])
+    assert len(store) == 2  # noqa: PLR2004
+    assert list(store) == ["AAPL", "BRK.A"]
+    assert store["AAPL"].to_asset() == apple
+    assert store.get("MSFT") is None
+    assert store["AAPL"] is store.get_by_name("Apple Inc.")
+    assert store.get_by_name("Microsoft") is None
+    assert store.get_all_by_name("Apple Inc.") == list(store.records[:2])
+    assert store.get_all_by_name("Microsoft") == []
+    assert store.get_by_id(delisted.id) is store.records[0]
+    assert store.get_by_id(str(halted.id)) is store["BRK.A"]
+    assert [r.to_dict() for r in store.records] == [
+        a.dict(by_alias=True) for a in (delisted, apple, halted)
+    ]
+
+
+def test_asset_store_select() -> None:
+    """Test that the listed assets are selected from the partitions, in the store order."""
+    assets = [
+        _asset("AAPL"),
+        _asset("BTC/USD", **{"class": AssetClass.CRYPTO, "exchange": AssetExchange.FTXU}),
+        _asset("IBM", exchange=AssetExchange.NYSE),
+        _asset("BRK.A", exchange=AssetExchange.NYSE, fractionable=False),
+        _asset("OLD", status=AssetStatus.INACTIVE),
+        _asset("TSLA"),
+    ]
+    store = AssetStore(assets)
+    records = store.select()
+    assert [r.symbol for r in records] == ["AAPL", "BTC/USD", "IBM", "TSLA"]
+    assert store.select() is records
+    assert [r.symbol for r in store.select(exchange=AssetExchange.NASDAQ)] == ["AAPL", "TSLA"]
+    assert [r.symbol for r in store.select(asset_class=AssetClass.CRYPTO)] == ["BTC/USD"]
+    assert [r.symbol for r in store.select(status=None)] == [
+        "AAPL",
+        "BTC/USD",
+        "IBM",
+        "OLD",
+        "TSLA",
+    ]
+    assert not store.select(status=AssetStatus.INACTIVE, exchange=AssetExchange.NYSE)
@@ -0,0 +1,155 @@
+"""Test the async clients."""
+import json
+from collections.abc import Callable
+
+import anyio
+import httpx
+import pytest
+from alpaca.common.exceptions import APIError
+from alpaca.data import StockBarsRequest, TimeFrame
+from alpaca.trading import GetOrdersRequest, Position
+from pydantic.datetime_parse import parse_datetime
+
+from alpaca_partner_backend.api.async_clients import (
+    AsyncBrokerClient,
+    AsyncDataClient,
+    HTTPXTransport,
+)
+from alpaca_partner_backend.api.common import get_broker_client, get_data_client
+
+ACCOUNT_ID = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+
+MOCK_POSITION = {
+    "asset_id": "904837e3-3b76-47ec-b432-046db621571b",
+    "symbol": "AAPL",
+    "exchange": "NASDAQ",
+    "asset_class": "us_equity",
+    "avg_entry_price": "100.0",
+    "qty": "5",
+    "side": "long",
+    "market_value": "600.0",
+    "cost_basis": "500.0",
+    "unrealized_pl": "100.0",
+    "unrealized_plpc": "0.2",
+    "unrealized_intraday_pl": "10.0",
+    "unrealized_intraday_plpc": "0.0169",
+    "current_price": "120.0",
+    "lastday_price": "118.0",
+    "change_today": "0.0169",
+}
+
+
+def _broker_transport(handler: httpx.MockTransport) -> HTTPXTransport:
+    """Create a transport for the broker API answering with the handler."""
+    return HTTPXTransport.from_rest_client(get_broker_client(), transport=handler)
+
+
+def test_get_all_positions_for_account() -> None:
+    """Test that the positions are parsed from the pooled client response."""
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[MOCK_POSITION])
+
+    client = AsyncBrokerClient(_broker_transport(httpx.MockTransport(handler)))
+    positions = anyio.run(client.get_all_positions_for_account, ACCOUNT_ID)
+    assert len(requests) == 1
+    assert requests[0].url.path == f"/v1/trading/accounts/{ACCOUNT_ID}/positions"
+    assert "authorization" in requests[0].headers
+    assert isinstance(positions[0], Position)
+    assert positions[0].symbol == "AAPL"
+
+
+def test_api_error() -> None:
+    """Test that the error responses are raised as alpaca-py API errors."""
+    status_code = httpx.codes.NOT_FOUND
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status_code, json={"code": 40410000, "message": "not found"})
+
+    client = AsyncBrokerClient(_broker_transport(httpx.MockTransport(handler)))
+    with pytest.raises(APIError) as exc_info:
+        anyio.run(client.get_account_by_id, ACCOUNT_ID)
+    assert exc_info.value.status_code == status_code
+    assert json.loads(exc_info.value.response.content)["message"] == "not found"
+
+
+def test_get_stock_bars_params() -> None:
+    """Test that the query params are encoded and the pages are followed."""
+    requests: list[httpx.Request] = []
+    bar = {"t": "2023-01-03T05:00:00Z", "o": 1, "h": 2, "l": 0.5, "c": 1.5, "v": 100}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        page_token = "next" if len(requests) == 1 else None
+        return httpx.Response(
+            200, json={"bars": [bar], "symbol": "AAPL", "next_page_token": page_token}
+        )
+
+    transport = HTTPXTransport.from_rest_client(
+        get_data_client(), transport=httpx.MockTransport(handler)
+    )
+    bars = anyio.run(
+        AsyncDataClient(transport).get_stock_bars,
+        StockBarsRequest(symbol_or_symbols="AAPL", timeframe=TimeFrame.Day),
+    )
+    assert [r.url.path for r in requests] == ["/v2/stocks/AAPL/bars"] * 2
+    assert requests[0].url.params["timeframe"] == "1Day"
+    assert "page_token" not in requests[0].url.params
+    assert requests[1].url.params["page_token"] == "next"
+    assert len(bars["AAPL"]) == len(requests)
+
+
+def _orders_handler(
+    orders: list[dict[str, str]], requests: list[httpx.Request]
+) -> Callable[[httpx.Request], httpx.Response]:
+    """Get a handler of the orders submitted strictly until the time, like the Broker API."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        until = request.url.params.get("until")
+        page = [
+            order
+            for order in orders
+            if until is None or parse_datetime(order["submitted_at"]) < parse_datetime(until)
+        ]
+        return httpx.Response(200, json=page[: int(request.url.params["limit"])])
+
+    return handler
+
+
+def test_iter_orders_for_account() -> None:
+    """Test that the pages of orders start from the submission time of the last order."""
+    requests: list[httpx.Request] = []
+    submitted = ["2023-01-05T15:00:00Z", "2023-01-04T15:00:00Z", "2023-01-03T15:00:00Z"]
+    orders = [{"id": str(i), "submitted_at": t} for i, t in enumerate(submitted)]
+    limit = 2
+
+    client = AsyncBrokerClient(
+        _broker_transport(httpx.MockTransport(_orders_handler(orders, requests)))
+    )
+    raw_orders = anyio.run(
+        client.get_all_orders_for_account, ACCOUNT_ID, GetOrdersRequest(limit=limit)
+    )
+    assert [o["submitted_at"] for o in raw_orders] == submitted
+    assert len(requests) == limit
+    assert "until" not in requests[0].url.params
+    assert requests[1].url.params["until"] == "2023-01-04T15:00:00.000001Z"
+    # the order at the cursor is requested again, and skipped
+    assert requests[1].url.params["limit"] == str(limit + 1)
+
+
+def test_iter_orders_for_account_same_time() -> None:
+    """Test that the orders submitted at the time of the end of a page are not skipped."""
+    requests: list[httpx.Request] = []
+    submitted = ["2023-01-05T15:00:00Z"] + ["2023-01-04T15:00:00Z"] * 3 + ["2023-01-03T15:00:00Z"]
+    orders = [{"id": str(i), "submitted_at": t} for i, t in enumerate(submitted)]
+
+    client = AsyncBrokerClient(
+        _broker_transport(httpx.MockTransport(_orders_handler(orders, requests)))
+    )
+    raw_orders = anyio.run(client.get_all_orders_for_account, ACCOUNT_ID, GetOrdersRequest(limit=2))
+    assert raw_orders == orders
+    # the orders returned already at the cursor count in the limit of the next requests
+    assert [r.url.params["limit"] for r in requests] == ["2", "3", "5"]
@@ -0,0 +1,149 @@
+"""Test the catalogue of the assets."""
+from typing import Any
+
+import anyio
+import httpx
+import pytest
+from alpaca.common.exceptions import APIError
+from alpaca.trading import AssetClass, AssetStatus
+
+from alpaca_partner_backend.api.async_clients import AsyncBrokerClient, HTTPXTransport
+from alpaca_partner_backend.api.catalogue import AssetCatalogue
+from alpaca_partner_backend.api.common import get_broker_client
+from alpaca_partner_backend.database import MongoDatabase
+
+RAW_ASSET = {
+    "id": "904837e3-3b76-47ec-b432-046db621571b",
+    "class": "us_equity",
+    "exchange": "NASDAQ",
+    "symbol": "AAPL",
+    "name": "Apple Inc. Common Stock",
+    "status": "active",
+    "tradable": True,
+    "marginable": True,
+    "shortable": True,
+    "easy_to_borrow": True,
+    "fractionable": True,
+}
+
+
+def _catalogue(
+    responses: list[httpx.Response],
+    database: MongoDatabase | None = None,
+    **kwargs: Any,
+) -> AssetCatalogue:
+    """Create a catalogue downloading the assets of each response in turn."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/v1/assets"
+        return responses.pop(0)
+
+    transport = HTTPXTransport.from_rest_client(
+        get_broker_client(), transport=httpx.MockTransport(handler)
+    )
+    return AssetCatalogue(AsyncBrokerClient(transport), database, **kwargs)
+
+
+def test_catalogue_filters() -> None:
+    """Test that the assets are filtered locally, and indexed by symbol if active."""
+    catalogue = _catalogue(
+        [
+            httpx.Response(
+                200,
+                json=[
+                    RAW_ASSET,
+                    {**RAW_ASSET, "symbol": "BRK.A", "fractionable": False},
+                    {**RAW_ASSET, "symbol": "BTC/USD", "class": "crypto"},
+                    {**RAW_ASSET, "symbol": "AAPL", "status": "inactive", "name": "Delisted"},
+                ],
+            )
+        ]
+    )
+
+    async def main() -> None:
+        assets = await catalogue.get_assets()
+        assert [a.symbol for a in assets] == ["AAPL", "BTC/USD"]
+        # the filtered assets are memoized until the next refresh
+        assert await catalogue.get_assets() is assets
+        crypto = await catalogue.get_assets(asset_class=AssetClass.CRYPTO)
+        assert [a.symbol for a in crypto] == ["BTC/USD"]
+        inactive = await catalogue.get_assets(status=AssetStatus.INACTIVE)
+        assert [a.name for a in inactive] == ["Delisted"]
+        by_symbol = await catalogue.get_store()
+        assert sorted(by_symbol) == ["AAPL", "BRK.A", "BTC/USD"]
+        assert by_symbol["AAPL"].name == "Apple Inc. Common Stock"
+
+    anyio.run(main)
+    assert catalogue.info().assets == 4  # noqa: PLR2004
+
+
+def test_catalogue_refresh() -> None:
+    """Test that a refresh replaces the assets, and that they are kept if it fails."""
+    catalogue = _catalogue(
+        [
+            httpx.Response(200, json=[RAW_ASSET, {**RAW_ASSET, "symbol": "TSLA"}]),
+            httpx.Response(500, json={"code": 50010000, "message": "internal server error"}),
+            httpx.Response(200, json=[{**RAW_ASSET, "symbol": "TSLA"}]),
+        ]
+    )
+
+    async def main() -> None:
+        await catalogue.refresh()
+        refreshed_at = catalogue.info().refreshed_at
+        with pytest.raises(APIError):
+            await catalogue.refresh()
+        assert [a.symbol for a in await catalogue.get_assets()] == ["AAPL", "TSLA"]
+        assert catalogue.info().stale is True
+        assert catalogue.info().refreshed_at == refreshed_at
+
+        # the delisted assets disappear with the next refresh
+        await catalogue.refresh()
+        assert [a.symbol for a in await catalogue.get_assets()] == ["TSLA"]
+        assert "AAPL" not in await catalogue.get_store()
+        assert catalogue.info().stale is False
+
+    anyio.run(main)
+
+
+def test_catalogue_background_refresh() -> None:
+    """Test that the catalogue is loaded at start, then refreshed in the background."""
+    catalogue = _catalogue(
+        [
+            httpx.Response(500, json={"code": 50010000, "message": "internal server error"}),
+            httpx.Response(200, json=[RAW_ASSET]),
+        ],
+        refresh_seconds=60,
+        retry_seconds=0.01,
+    )
+
+    async def main() -> None:
+        await catalogue.start()
+        # the failed load is retried in the background, without waiting for the refresh time
+        assert catalogue.info().stale is True
+        with anyio.fail_after(1):
+            while catalogue.info().refreshed_at is None:
+                await anyio.sleep(0.01)
+        assert [a.symbol for a in await catalogue.get_assets()] == ["AAPL"]
+        await catalogue.stop()
+
+    anyio.run(main)
+
+
+def test_catalogue_database(mock_database: MongoDatabase) -> None:
+    """Test that the workers load the assets stored by another one, unless they have expired."""
+    stored = _catalogue([httpx.Response(200, json=[RAW_ASSET])], mock_database)
+    anyio.run(stored.refresh)
+    # the handler fails if the assets are downloaded again
+    loaded = _catalogue([], mock_database)
+    anyio.run(loaded.start)
+    anyio.run(loaded.stop)
+    assert [a.symbol for a in anyio.run(loaded.get_assets)] == ["AAPL"]
+    assert loaded.info().refreshed_at == stored.info().refreshed_at
+
+    expired = _catalogue(
+        [httpx.Response(200, json=[{**RAW_ASSET, "symbol": "TSLA"}])],
+        mock_database,
+        refresh_seconds=0,
+    )
+    assert [a.symbol for a in anyio.run(expired.get_assets)] == ["TSLA"]
+    assert [a.symbol for a in mock_database.get_assets()] == ["TSLA"]
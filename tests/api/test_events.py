@@ -0,0 +1,208 @@
+"""Test the fan-out of the events."""
+import functools
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import uuid4
+
+import anyio
+import httpx
+import orjson
+from alpaca.broker import Journal, JournalEntryType, JournalStatus
+from alpaca.common.enums import SupportedCurrencies
+from anyio.streams.memory import MemoryObjectReceiveStream
+
+from alpaca_partner_backend.api.async_clients import HTTPXTransport
+from alpaca_partner_backend.api.common import get_broker_client
+from alpaca_partner_backend.api.events import (
+    BrokerEventSource,
+    Event,
+    EventHub,
+    EventSource,
+    LocalEventSource,
+    parse_sse,
+    record_journal,
+)
+from alpaca_partner_backend.enums import EventStream
+
+ACCOUNT_ID = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+OTHER_ACCOUNT_ID = "2d7d4ba2-7c68-4c2b-b2c3-0a3a1c7d1b9e"
+
+
+def _trade_event(event_id: int, account_id: str = ACCOUNT_ID) -> Event:
+    """Create a fill event of the account."""
+    return Event.from_data(
+        EventStream.TRADES,
+        {"event_id": event_id, "account_id": account_id, "event": "fill", "order": {}},
+    )
+
+
+async def _receive_all(events: MemoryObjectReceiveStream[Event]) -> list[Event]:
+    """Receive the events until the subscriber is disconnected."""
+    return [event async for event in events]
+
+
+async def _run_source(source: EventSource, published: list[Event], count: int) -> None:
+    """Run the source until it has published the number of events, or for a second."""
+    with anyio.move_on_after(1):
+        async with anyio.create_task_group() as task_group:
+
+            def publish(event: Event) -> None:
+                published.append(event)
+                if len(published) == count:
+                    task_group.cancel_scope.cancel()
+
+            task_group.start_soon(source.run, publish)
+
+
+def test_parse_sse() -> None:
+    """Test that the data of the events is parsed, skipping the comments."""
+
+    async def lines() -> AsyncIterator[str]:
+        for line in [": heartbeat", "", "id: 1", 'data: {"a":', "data: 1}", "", "data: 2"]:
+            yield line
+
+    async def main() -> list[str]:
+        return [data async for data in parse_sse(lines())]
+
+    assert anyio.run(main) == ['{"a":\n1}', "2"]
+
+
+def _journal_event(event_id: int, journal_id: str) -> dict[str, Any]:
+    """Create the data of the status event of a journal, which has no account."""
+    return {
+        "event_id": event_id,
+        "journal_id": journal_id,
+        "entry_type": "JNLC",
+        "status_from": "queued",
+        "status_to": "executed",
+    }
+
+
+def test_event_accounts() -> None:
+    """Test that the journal events concern both their recorded accounts."""
+    journal_id = str(uuid4())
+    assert Event.from_data(EventStream.JOURNALS, _journal_event(7, journal_id)).account_ids == ()
+    record_journal(
+        Journal(
+            id=journal_id,
+            entry_type=JournalEntryType.CASH,
+            from_account=OTHER_ACCOUNT_ID,
+            to_account=ACCOUNT_ID,
+            status=JournalStatus.QUEUED,
+            net_amount=10,
+            currency=SupportedCurrencies.USD,
+        )
+    )
+    journal = Event.from_data(EventStream.JOURNALS, _journal_event(7, journal_id))
+    assert journal.account_ids == (OTHER_ACCOUNT_ID, ACCOUNT_ID)
+    assert journal.to_sse().startswith(b"event: journals\nid: 7\ndata: {")
+    assert _trade_event(1).account_ids == (ACCOUNT_ID,)
+
+
+def test_event_hub_fan_out() -> None:
+    """Test that the subscribers get only the events of their account, while subscribed."""
+    source = LocalEventSource()
+    hub = EventHub(source)
+
+    async def main() -> tuple[list[Event], list[Event]]:
+        async with hub.subscribe(ACCOUNT_ID) as events, hub.subscribe(
+            OTHER_ACCOUNT_ID
+        ) as other_events:
+            for event_id in range(3):
+                source.publish(_trade_event(event_id))
+            source.publish(_trade_event(3, OTHER_ACCOUNT_ID))
+            source.close()
+            return await _receive_all(events), await _receive_all(other_events)
+
+    events, other_events = anyio.run(main)
+    assert [event.event_id for event in events] == ["0", "1", "2"]
+    assert [event.event_id for event in other_events] == ["3"]
+
+
+def test_event_hub_slow_subscriber() -> None:
+    """Test that a subscriber that falls behind is disconnected without blocking the others."""
+    hub = EventHub(LocalEventSource(), buffer_size=2)
+
+    async def main() -> list[Event]:
+        async with hub.subscribe(ACCOUNT_ID) as events:
+            # the events published before the subscriber receives any of them
+            for event_id in range(5):
+                hub.publish(_trade_event(event_id))
+            return await _receive_all(events)
+
+    assert [event.event_id for event in anyio.run(main)] == ["0", "1"]
+
+
+def test_broker_event_source() -> None:
+    """Test that the events stream is resumed after the last event received."""
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        since_id = int(request.url.params.get("since_id", 0))
+        return httpx.Response(
+            200,
+            text=": heartbeat\n\n"
+            + "".join(
+                f'data: {{"event_id": {i}, "account_id": "{ACCOUNT_ID}"}}\n\n'
+                for i in range(since_id + 1, since_id + 3)
+            ),
+        )
+
+    source = BrokerEventSource(
+        HTTPXTransport.from_rest_client(
+            get_broker_client(), transport=httpx.MockTransport(handler)
+        ),
+        streams=[EventStream.TRADES],
+        reconnect_seconds=0,
+    )
+    published: list[Event] = []
+    anyio.run(functools.partial(_run_source, source, published, 4))
+    assert [event.event_id for event in published] == ["1", "2", "3", "4"]
+    assert requests[0].url.path == "/v1/events/trades"
+    assert "since_id" not in requests[0].url.params
+    assert requests[1].url.params["since_id"] == "2"
+
+
+def test_broker_event_source_journals() -> None:
+    """Test that the accounts of the journals are requested, and the malformed events skipped."""
+    journal_id = str(uuid4())
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == f"/v1/journals/{journal_id}":
+            return httpx.Response(
+                200,
+                json={
+                    "id": journal_id,
+                    "entry_type": "JNLC",
+                    "from_account": OTHER_ACCOUNT_ID,
+                    "to_account": ACCOUNT_ID,
+                    "status": "executed",
+                    "net_amount": "10",
+                    "currency": "USD",
+                },
+            )
+        events = [{"event_id": 1}, _journal_event(2, journal_id), _journal_event(3, journal_id)]
+        return httpx.Response(
+            200,
+            text="data: not json\n\n"
+            + "".join(f"data: {orjson.dumps(e).decode()}\n\n" for e in events),
+        )
+
+    source = BrokerEventSource(
+        HTTPXTransport.from_rest_client(
+            get_broker_client(), transport=httpx.MockTransport(handler)
+        ),
+        streams=[EventStream.JOURNALS],
+        reconnect_seconds=60,
+    )
+    published: list[Event] = []
+    anyio.run(functools.partial(_run_source, source, published, 2))
+    assert [event.account_ids for event in published] == [(OTHER_ACCOUNT_ID, ACCOUNT_ID)] * 2
+    # the journal is requested once, and the stream is not reconnected for the malformed events
+    assert [request.url.path for request in requests] == [
+        "/v1/events/journals/status",
+        f"/v1/journals/{journal_id}",
+    ]
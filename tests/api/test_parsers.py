@@ -1,8 +1,27 @@
 """Test the parsers module."""
-from alpaca.broker import Account
+import json
+from typing import Any
 
-from alpaca_partner_backend.api.parsers import parse_account_to_jsonable, parse_activities
-from alpaca_partner_backend.models.api import AccountJson
+import pandas as pd
+import pytest
+from alpaca.broker import Account, Order
+from alpaca.data import BarSet
+from alpaca.trading import ActivityType, NonTradeActivity
+from alpaca.trading import Order as TradingOrder
+
+from alpaca_partner_backend.api.parsers import (
+    parse_account_to_jsonable,
+    parse_activities,
+    parse_columns_to_list,
+    parse_df_to_list,
+    parse_equity_eod_to_list,
+    parse_raw_bars_to_columns,
+    parse_raw_order,
+)
+from alpaca_partner_backend.api.responses import FastJSONResponse
+from alpaca_partner_backend.enums import ActivityName
+from alpaca_partner_backend.models.api import AccountJson, Activity
+from alpaca_partner_backend.settings import SETTINGS
 from tests.api.conftest import create_dummy_non_trade_activities, create_dummy_trade_activities
 
 
@@ -12,6 +31,77 @@ def test_parse_account_to_jsonable(alpaca_account: Account) -> None:
     assert isinstance(_json_acc, AccountJson)
 
 
+RAW_CLOSING_ORDER: dict[str, Any] = {
+    "id": "61e69015-8549-4bfd-b9c3-01e75843f47d",
+    "client_order_id": "eb9e2aaa-f71a-4f51-b5b4-52a6c565dad4",
+    "created_at": "2021-03-16T18:38:01.942282Z",
+    "updated_at": "2021-03-16T18:38:01.942282Z",
+    "submitted_at": "2021-03-16T18:38:01.937734Z",
+    "filled_at": None,
+    "replaced_by": None,
+    "asset_id": "b0b6dd9d-8b9b-48a9-ba46-b9d54906e415",
+    "symbol": "AAPL",
+    "asset_class": "us_equity",
+    "notional": "500",
+    "qty": None,
+    "filled_qty": "0",
+    "order_class": "",
+    "order_type": "market",
+    "type": "market",
+    "side": "buy",
+    "time_in_force": "day",
+    "status": "accepted",
+    "extended_hours": False,
+    "legs": None,
+    "source": "access_key",
+}
+
+
+def _to_json(content: Any) -> Any:
+    """Serialize the content like the API does, with both JSON encoders."""
+    fast_json = json.loads(FastJSONResponse(content).body)
+    assert fast_json == json.loads(content.json())
+    return fast_json
+
+
+def test_parse_account_to_jsonable_trusted(
+    monkeypatch: pytest.MonkeyPatch, alpaca_account: Account
+) -> None:
+    """Test that the account built without validation has the same JSON of the validated one."""
+    validated = parse_account_to_jsonable(alpaca_account)
+    monkeypatch.setattr(SETTINGS, "TRUSTED_UPSTREAM_MODELS", True)
+    trusted = parse_account_to_jsonable(alpaca_account)
+    assert isinstance(trusted, AccountJson)
+    assert _to_json(trusted) == _to_json(validated)
+
+
+@pytest.mark.parametrize(
+    ("raw_order", "model"),
+    [
+        (RAW_CLOSING_ORDER, Order),
+        (RAW_CLOSING_ORDER, TradingOrder),
+        ({**RAW_CLOSING_ORDER, "commission": "1.5", "filled_at": "2021-03-16T18:38:02Z"}, Order),
+        (
+            {
+                **RAW_CLOSING_ORDER,
+                "order_class": "bracket",
+                "legs": [{**RAW_CLOSING_ORDER, "side": "sell", "legs": None}],
+            },
+            Order,
+        ),
+    ],
+)
+def test_parse_raw_order_trusted(
+    monkeypatch: pytest.MonkeyPatch, raw_order: dict[str, Any], model: type[TradingOrder]
+) -> None:
+    """Test that the orders built without validation have the same JSON of the validated ones."""
+    validated = parse_raw_order(raw_order, model=model)
+    monkeypatch.setattr(SETTINGS, "TRUSTED_UPSTREAM_MODELS", True)
+    trusted = parse_raw_order(raw_order, model=model)
+    assert isinstance(trusted, model)
+    assert _to_json(trusted) == _to_json(validated)
+
+
 def test_parse_trade_activities() -> None:
     """Test parse_activities."""
     trades = create_dummy_trade_activities()
@@ -24,3 +114,70 @@ def test_parse_non_trade_activities() -> None:
     ntas = create_dummy_non_trade_activities()
     parsed_activities = parse_activities(ntas)
     assert isinstance(parsed_activities, list)
+
+
+def test_parse_activities_like_validated_models() -> None:
+    """Test that the activities built without validation are equal to the validated ones."""
+    for activity in parse_activities(
+        [*create_dummy_trade_activities(), *create_dummy_non_trade_activities()]
+    ):
+        assert activity == Activity(**activity.dict())
+        assert activity.json() == Activity(**activity.dict()).json()
+
+
+@pytest.mark.parametrize(
+    ("activity_type", "net_amount", "description", "activity_name"),
+    [
+        (ActivityType.JNLC, 100.0, "", ActivityName.JNLC_DEPOSIT),
+        (ActivityType.JNLC, -100.0, "", ActivityName.JNLC_WITHDRAWAL),
+        (ActivityType.CSD, 100.0, "", ActivityName.ACH_DEPOSIT),
+        (ActivityType.CSW, -100.0, "", ActivityName.ACH_WITHDRAWAL),
+        (ActivityType.FEE, -0.1, "REG fee", ActivityName.REG_FEE),
+        (ActivityType.FEE, -0.1, "TAF fee", ActivityName.TAF_FEE),
+        (ActivityType.FEE, -0.1, "", ActivityName.FEE),
+        (ActivityType.SPLIT, 0.0, "", ActivityName.SPLIT),
+        (ActivityType.INT, 0.5, "", ActivityName.INT),
+    ],
+)
+def test_parse_non_trade_activity_names(
+    activity_type: ActivityType,
+    net_amount: float,
+    description: str,
+    activity_name: ActivityName,
+) -> None:
+    """Test the names of the non trade activities by type."""
+    activity = NonTradeActivity(
+        id="20220121000000000::8e6ad2e1-0a7c-4ab5-9ab1-c1ab83bc0dc2",
+        account_id="7ccfd029-9b91-40d0-9b4c-f928385af666",
+        activity_type=activity_type,
+        date="2022-01-21",
+        net_amount=net_amount,
+        description=description,
+    )
+    (parsed,) = parse_activities([activity])
+    assert parsed.activity_name is activity_name
+    assert parsed.amount == net_amount
+
+
+def test_parse_raw_bars_like_dataframe() -> None:
+    """Test that the bars columns are serialized like the dataframe of the BarSet."""
+    raw_bars = [
+        {"t": "2023-01-03T05:00:00Z", "o": 130.28, "h": 130.9, "l": 124.17, "c": 125.07,
+         "v": 112117471, "n": 1021065, "vw": 125.725},
+        {"t": "2023-01-04T05:00:00Z", "o": 126.89, "h": 128.66, "l": 125.08, "c": 126.36,
+         "v": 89100633, "n": 770042, "vw": 126.6464},
+    ]  # fmt: skip
+    bars_df = BarSet({"AAPL": raw_bars}).df.reset_index().drop("symbol", axis=1)
+    bars_df["timestamp"] = pd.to_datetime(bars_df["timestamp"], unit="s").dt.strftime("%Y-%m-%d")
+    assert parse_columns_to_list(parse_raw_bars_to_columns(raw_bars)) == parse_df_to_list(bars_df)
+    assert parse_columns_to_list(parse_raw_bars_to_columns([])) == [bars_df.columns.to_list()]
+
+
+def test_parse_equity_eod_to_list() -> None:
+    """Test that the end of day equity is serialized by UTC day."""
+    assert parse_equity_eod_to_list([(1672704000, 1000.0), (1672790400, 1050.5)]) == [
+        ["day", "equity"],
+        ["2023-01-03", 1000.0],
+        ["2023-01-04", 1050.5],
+    ]
+    assert parse_equity_eod_to_list([]) == [["day", "equity"]]
@@ -0,0 +1,123 @@
+"""Test the pre-trade checks."""
+from uuid import uuid4
+
+import pytest
+from alpaca.trading import (
+    Asset,
+    AssetClass,
+    AssetExchange,
+    AssetStatus,
+    LimitOrderRequest,
+    OrderRequest,
+    OrderSide,
+    OrderType,
+    TimeInForce,
+    TradeAccount,
+)
+from fastapi import status
+
+from alpaca_partner_backend.api import pre_trade
+
+
+def _asset(symbol: str, tradable: bool = True, fractionable: bool = True) -> Asset:
+    """Create an active US equity."""
+    return Asset(
+        **{
+            "id": uuid4(),
+            "class": AssetClass.US_EQUITY,
+            "exchange": AssetExchange.NASDAQ,
+            "symbol": symbol,
+            "status": AssetStatus.ACTIVE,
+            "tradable": tradable,
+            "marginable": True,
+            "shortable": True,
+            "easy_to_borrow": True,
+            "fractionable": fractionable,
+        }
+    )
+
+
+def _order(symbol: str = "AAPL", side: OrderSide = OrderSide.BUY, **kwargs: float) -> OrderRequest:
+    """Create a market order for the day."""
+    return OrderRequest(
+        symbol=symbol,
+        side=side,
+        type=OrderType.MARKET,
+        time_in_force=TimeInForce.DAY,
+        **kwargs,
+    )
+
+
+def _trade_account(buying_power: str, trading_blocked: bool = False) -> TradeAccount:
+    """Create a trading account with that buying power."""
+    return TradeAccount(
+        id=uuid4(),
+        account_number="123456789",
+        status="ACTIVE",
+        buying_power=buying_power,
+        non_marginable_buying_power=buying_power,
+        trading_blocked=trading_blocked,
+    )
+
+
+@pytest.mark.parametrize(
+    ("order_request", "asset", "message"),
+    [
+        (_order(qty=1), _asset("AAPL"), None),
+        (_order(qty=1), None, None),
+        (_order(qty=1), _asset("AAPL", tradable=False), 'asset "AAPL" is not tradable'),
+        (_order(qty=1), _asset("AAPL", fractionable=False), None),
+        (_order(qty=0.5), _asset("AAPL", fractionable=False), 'asset "AAPL" is not fractionable'),
+        (
+            _order(notional=10),
+            _asset("AAPL", fractionable=False),
+            'asset "AAPL" is not fractionable',
+        ),
+    ],
+)
+def test_check_asset(order_request: OrderRequest, asset: Asset | None, message: str | None) -> None:
+    """Test that only the orders for assets that cannot be traded like that are rejected."""
+    if message is None:
+        pre_trade.check_asset(order_request, asset)
+        return
+    with pytest.raises(pre_trade.PreTradeError) as exc_info:
+        pre_trade.check_asset(order_request, asset)
+    assert exc_info.value.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert exc_info.value.message == message
+
+
+@pytest.mark.parametrize(
+    ("order_request", "cost"),
+    [
+        (_order(notional=150), 150),
+        (_order(qty=1), None),
+        (_order(side=OrderSide.SELL, notional=150), None),
+        (
+            LimitOrderRequest(
+                symbol="AAPL",
+                qty=2,
+                side=OrderSide.BUY,
+                time_in_force=TimeInForce.DAY,
+                limit_price=100,
+            ),
+            200,
+        ),
+    ],
+)
+def test_get_order_cost(order_request: OrderRequest, cost: float | None) -> None:
+    """Test the cost of the buy orders whose price is known."""
+    assert pre_trade.get_order_cost(order_request) == cost
+
+
+def test_check_account() -> None:
+    """Test that the orders are rejected if the account cannot afford them or is blocked."""
+    pre_trade.check_account(_order(notional=100), None, _trade_account("100"))
+    pre_trade.check_account(_order(qty=1000), None, _trade_account("100"))
+    with pytest.raises(pre_trade.PreTradeError) as exc_info:
+        pre_trade.check_account(_order(notional=100.01), None, _trade_account("100"))
+    assert exc_info.value.status_code == status.HTTP_403_FORBIDDEN
+    assert exc_info.value.message == "insufficient buying power"
+    with pytest.raises(pre_trade.PreTradeError):
+        pre_trade.check_account(
+            _order(side=OrderSide.SELL, qty=1), None, _trade_account("100", trading_blocked=True)
+        )
@@ -0,0 +1,111 @@
+"""Test the responses module."""
+import functools
+import json
+from typing import Any
+
+import anyio
+import msgpack
+import numpy as np
+import pytest
+from alpaca.broker import Order
+from alpaca.trading import Asset
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import parse_raw_as
+
+from alpaca_partner_backend.api.responses import (
+    NDJSON_MEDIA_TYPE,
+    FastJSONResponse,
+    accepts_ndjson,
+    columns_response,
+    negotiate_media_type,
+)
+from alpaca_partner_backend.enums import MediaType
+
+COLUMNS = {"day": np.array(["2023-01-03", "2023-01-04"]), "equity": np.array([1000.0, 1050.5])}
+
+
+@pytest.mark.parametrize(
+    ("accept", "media_type"),
+    [
+        (None, MediaType.JSON),
+        ("*/*", MediaType.JSON),
+        ("text/html,application/xhtml+xml,*/*;q=0.8", MediaType.JSON),
+        ("application/msgpack", MediaType.MSGPACK),
+        ("application/json;q=0.5, application/vnd.columnar+json", MediaType.COLUMNAR_JSON),
+        ("application/msgpack;q=0, application/json", MediaType.JSON),
+    ],
+)
+def test_negotiate_media_type(accept: str | None, media_type: MediaType) -> None:
+    """Test that the best supported media type is chosen, JSON by default."""
+    assert negotiate_media_type(accept) is media_type
+
+
+def test_negotiate_media_type_not_acceptable() -> None:
+    """Test that a 406 is raised if no media type is supported."""
+    with pytest.raises(HTTPException) as exc_info:
+        negotiate_media_type("text/csv")
+    assert exc_info.value.status_code == 406  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        (None, False),
+        ("*/*", False),
+        (NDJSON_MEDIA_TYPE, True),
+        (f"application/json;q=0.5, {NDJSON_MEDIA_TYPE}", True),
+        (f"{NDJSON_MEDIA_TYPE};q=0.5, application/json", False),
+    ],
+)
+def test_accepts_ndjson(accept: str | None, expected: bool) -> None:
+    """Test that the stream is chosen only if newline-delimited JSON is the preferred type."""
+    assert accepts_ndjson(accept) is expected
+
+
+def test_columns_response() -> None:
+    """Test the encoding of the columns in each media type."""
+    by_column = {"day": ["2023-01-03", "2023-01-04"], "equity": [1000.0, 1050.5]}
+    rows = json.loads(columns_response(COLUMNS, MediaType.JSON).body)
+    assert rows == [["day", "equity"], ["2023-01-03", 1000.0], ["2023-01-04", 1050.5]]
+    columnar = columns_response(COLUMNS, MediaType.COLUMNAR_JSON)
+    assert columnar.media_type == MediaType.COLUMNAR_JSON.value
+    assert json.loads(columnar.body) == by_column
+    binary = columns_response(COLUMNS, MediaType.MSGPACK)
+    assert binary.media_type == MediaType.MSGPACK.value
+    assert binary.headers["vary"] == "Accept"
+    assert msgpack.unpackb(binary.body) == by_column
+
+
+def _fastapi_json(content: Any, type_: Any) -> Any:
+    """Serialize the content like FastAPI does with the response model and the stdlib."""
+    encoded = anyio.run(
+        functools.partial(
+            serialize_response,
+            field=create_response_field(name="response", type_=type_),
+            response_content=content,
+        )
+    )
+    return json.loads(JSONResponse(encoded).body)
+
+
+def test_fast_json_response_like_fastapi(mock_order: Order, mock_assets_json: str) -> None:
+    """Test that models with UUIDs, datetimes, enums and aliases are serialized like FastAPI."""
+    assets = parse_raw_as(list[Asset], mock_assets_json)
+    assert json.loads(FastJSONResponse(assets).body) == _fastapi_json(assets, list[Asset])
+    assert json.loads(FastJSONResponse([mock_order]).body) == _fastapi_json(
+        [mock_order], list[Order]
+    )
+
+
+def test_fast_json_response_object_id_and_numpy() -> None:
+    """Test the serialization of the ObjectIds and of the NumPy arrays."""
+    _id = ObjectId()
+    content = {"_id": _id, "equity": np.array([1000.0, 1050.5])}
+    assert json.loads(FastJSONResponse(content).body) == {
+        "_id": str(_id),
+        "equity": [1000.0, 1050.5],
+    }
@@ -20,12 +20,26 @@ from bson import ObjectId
 from fastapi.testclient import TestClient
 from requests_mock import Mocker
 
+from alpaca_partner_backend.api.async_clients import (
+    AsyncBrokerClient,
+    AsyncDataClient,
+    ThreadedTransport,
+)
+from alpaca_partner_backend.api.catalogue import AssetCatalogue
+from alpaca_partner_backend.api.common import (
+    get_asset_catalogue,
+    get_async_broker_client,
+    get_async_data_client,
+    get_broker_client,
+    get_data_client,
+)
 from alpaca_partner_backend.api.main import app
 from alpaca_partner_backend.api.routes.users import get_current_user
 from alpaca_partner_backend.database import get_db
 from alpaca_partner_backend.database.mongo import MongoDatabase
 from alpaca_partner_backend.models import AuthCredentials, CreateAccountRequest
 from alpaca_partner_backend.models.user import User
+from alpaca_partner_backend.utils.security import create_access_token
 from tests.api import conftest
 
 # Constants:
@@ -79,6 +93,21 @@ def mock_database_with_user(
     return mock_database
 
 
+def _override_async_clients(database: MongoDatabase) -> None:
+    """Send the upstream requests with the sync clients, intercepted by requests_mock."""
+    app.dependency_overrides[get_async_broker_client] = lambda: AsyncBrokerClient(
+        ThreadedTransport(get_broker_client())
+    )
+    app.dependency_overrides[get_async_data_client] = lambda: AsyncDataClient(
+        ThreadedTransport(get_data_client())
+    )
+    # a catalogue for each test, loaded by its first request
+    catalogue = AssetCatalogue(
+        AsyncBrokerClient(ThreadedTransport(get_broker_client())), database=database
+    )
+    app.dependency_overrides[get_asset_catalogue] = lambda: catalogue
+
+
 @pytest.fixture()
 def mock_api_client(mock_database: MongoDatabase) -> TestClient:
     """
@@ -88,6 +117,7 @@ def mock_api_client(mock_database: MongoDatabase) -> TestClient:
     """
     app.dependency_overrides = {}
     app.dependency_overrides[get_db] = lambda: mock_database
+    _override_async_clients(mock_database)
     return TestClient(app=app)
 
 
@@ -108,7 +138,11 @@ def mock_api_client_with_user(
     app.dependency_overrides = {}
     app.dependency_overrides[get_db] = lambda: mock_database_with_user
     app.dependency_overrides[get_current_user] = get_mock_current_user
-    return TestClient(app=app)
+    _override_async_clients(mock_database_with_user)
+    client = TestClient(app=app)
+    # token without account claims to resolve the account from the database
+    client.headers["Authorization"] = f"Bearer {create_access_token(data={'sub': TEST_EMAIL})}"
+    return client
 
 
 @pytest.fixture()
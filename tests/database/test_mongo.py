@@ -1,7 +1,16 @@
 """Test suite for the mongo module."""
+from datetime import date, datetime, timezone
+from typing import Any
+from uuid import uuid4
+
+from alpaca.trading import ActivityType, Asset
+from pydantic.datetime_parse import parse_datetime
 
 from alpaca_partner_backend.database import MongoDatabase, get_db
+from alpaca_partner_backend.enums import ActivityName
+from alpaca_partner_backend.models.api import Activity
 from alpaca_partner_backend.models.user import AuthCredentials
+from tests.conftest import TEST_EMAIL
 
 
 def test_get_db() -> None:
@@ -22,3 +31,225 @@ def test_mock_create_user(mock_database: MongoDatabase, mock_credentials: AuthCr
     insert_result = mock_database.create_user(auth_credentials=mock_credentials)
     assert insert_result.acknowledged
     assert insert_result.inserted_id
+
+
+def test_set_user_alpaca_account(mock_database_with_user: MongoDatabase) -> None:
+    """Test that the Alpaca account is stored on the user document."""
+    assert mock_database_with_user.get_users_without_alpaca_account()
+    update_result = mock_database_with_user.set_user_alpaca_account(
+        email=TEST_EMAIL,
+        account_id="7ccfd029-9b91-40d0-9b4c-f928385af666",
+        account_number="808971365",
+    )
+    assert update_result.modified_count == 1
+    user = mock_database_with_user.get_user_by_email(email=TEST_EMAIL)
+    assert user.alpaca_account_id == "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    assert user.alpaca_account_number == "808971365"
+    assert not mock_database_with_user.get_users_without_alpaca_account()
+
+
+def test_users_cache(mock_database_with_user: MongoDatabase) -> None:
+    """Test that the users are cached and invalidated when their document changes."""
+    mock_database_with_user.users_cache.clear()
+    user = mock_database_with_user.get_user_by_email(email=TEST_EMAIL)
+    assert mock_database_with_user.get_user_by_email(email=TEST_EMAIL) is user
+    assert mock_database_with_user.users_cache.cache_info().hits == 1
+    mock_database_with_user.set_user_alpaca_account(
+        email=TEST_EMAIL,
+        account_id="7ccfd029-9b91-40d0-9b4c-f928385af666",
+    )
+    assert (
+        mock_database_with_user.get_user_by_email(email=TEST_EMAIL).alpaca_account_id
+        == "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    )
+
+
+def test_equity_eod(mock_database: MongoDatabase) -> None:
+    """Test that the end of day equity is upserted by day and the covered range is tracked."""
+    account_id = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    day = 86400
+    assert mock_database.get_equity_eod_coverage(account_id) is None
+    mock_database.save_equity_eod(
+        account_id, timestamps=[day, 2 * day], equity=[100.0, 110.0], start=0
+    )
+    mock_database.save_equity_eod(
+        account_id, timestamps=[2 * day, 3 * day], equity=[120.0, 130.0], start=day
+    )
+    assert mock_database.get_equity_eod_coverage(account_id) == (0, 3 * day)
+    assert mock_database.get_equity_eod(account_id) == [
+        (day, 100.0),
+        (2 * day, 120.0),
+        (3 * day, 130.0),
+    ]
+    assert mock_database.get_equity_eod(account_id, start=2 * day) == [
+        (2 * day, 120.0),
+        (3 * day, 130.0),
+    ]
+
+
+def test_activities(mock_database: MongoDatabase) -> None:
+    """Test that the activities are upserted by ID and filtered and paginated by ID."""
+    account_id = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    fill = Activity(
+        activity_type=ActivityType.FILL,
+        activity_name=ActivityName.BUY_ORDER,
+        date=datetime(2023, 1, 3, 15, 30, 0, 123456, tzinfo=timezone.utc),
+        amount=100.0,
+        symbol="AAPL",
+    )
+    dividend = Activity(
+        activity_type=ActivityType.DIV,
+        activity_name=ActivityName.DIV,
+        date=date(2023, 1, 4),
+        amount=1.5,
+        symbol="AAPL",
+    )
+    fee = Activity(
+        activity_type=ActivityType.FEE,
+        activity_name=ActivityName.FEE,
+        date=date(2023, 1, 5),
+        amount=-0.1,
+        symbol=None,
+    )
+    assert mock_database.get_last_activity_id(account_id) is None
+    mock_database.save_activities(account_id, [("20230103", fill), ("20230104", dividend)])
+    mock_database.save_activities(account_id, [("20230104", dividend), ("20230105", fee)])
+    assert mock_database.get_last_activity_id(account_id) == "20230105"
+    assert mock_database.get_activities(account_id) == [
+        ("20230105", fee),
+        ("20230104", dividend),
+        ("20230103", fill),
+    ]
+    assert mock_database.get_activities(account_id, ascending=True, limit=1) == [("20230103", fill)]
+    assert mock_database.get_activities(account_id, page_token="20230105", symbol="AAPL") == [
+        ("20230104", dividend),
+        ("20230103", fill),
+    ]
+    assert mock_database.get_activities(account_id, activity_types=["DIV", "FEE"]) == [
+        ("20230105", fee),
+        ("20230104", dividend),
+    ]
+    assert mock_database.get_activities(
+        account_id,
+        after=datetime(2023, 1, 3, 23, tzinfo=timezone.utc),
+        until=datetime(2023, 1, 4, tzinfo=timezone.utc),
+    ) == [("20230104", dividend)]
+
+
+def test_orders(mock_database: MongoDatabase) -> None:
+    """Test that the raw orders are upserted by ID and searched by submission time."""
+    account_id = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    buy_aapl, sell_aapl, buy_tsla = (
+        {"id": str(i), "symbol": symbol, "side": side, "status": "filled", "submitted_at": t}
+        for i, (symbol, side, t) in enumerate(
+            [
+                ("AAPL", "buy", "2023-01-03T15:00:00Z"),
+                ("AAPL", "sell", "2023-01-04T15:00:00Z"),
+                ("TSLA", "buy", "2023-01-05T15:00:00.123456Z"),
+            ]
+        )
+    )
+    mock_database.save_orders(account_id, [buy_aapl, sell_aapl])
+    sell_aapl = {**sell_aapl, "status": "canceled"}
+    mock_database.save_orders(account_id, [sell_aapl, buy_tsla])
+    assert mock_database.get_orders(account_id) == [buy_tsla, sell_aapl, buy_aapl]
+    assert mock_database.get_orders(account_id, ascending=True, limit=1) == [buy_aapl]
+    assert mock_database.get_orders(account_id, symbols=["AAPL"], side="buy") == [buy_aapl]
+    assert mock_database.get_orders(account_id, statuses=["canceled"]) == [sell_aapl]
+    assert mock_database.get_orders(
+        account_id,
+        after=datetime(2023, 1, 3, 15, tzinfo=timezone.utc),
+        until=datetime(2023, 1, 5, 15, 0, 0, 123000, tzinfo=timezone.utc),
+    ) == [sell_aapl]
+
+
+def test_orders_cursor(mock_database: MongoDatabase) -> None:
+    """Test that the pages of orders submitted at the same time are split by ID."""
+    account_id = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    submitted_at = "2023-01-05T15:00:00.123456Z"
+    raw_orders = [
+        {"id": str(i), "symbol": "AAPL", "side": "buy", "status": "filled", "submitted_at": t}
+        for i, t in enumerate([submitted_at] * 3)
+    ]
+    mock_database.save_orders(account_id, raw_orders)
+    first_page = mock_database.get_orders(account_id, limit=2)
+    assert first_page == raw_orders[:0:-1]
+    # the cursor has the microseconds of the Broker API, both are stored in milliseconds
+    cursor = (parse_datetime(submitted_at), first_page[-1]["id"])
+    assert mock_database.get_orders(account_id, limit=2, cursor=cursor) == raw_orders[:1]
+    assert mock_database.get_orders(account_id, ascending=True, cursor=cursor) == raw_orders[2:]
+
+
+def test_orders_sync(mock_database: MongoDatabase) -> None:
+    """Test that the time of the last reconciliation of the orders is stored by account."""
+    account_id = "7ccfd029-9b91-40d0-9b4c-f928385af666"
+    reconciled_at = datetime(2023, 1, 5, 15, tzinfo=timezone.utc)
+    watermark = datetime(2023, 1, 5, 14, 59, tzinfo=timezone.utc)
+    assert mock_database.get_orders_sync(account_id) is None
+    mock_database.set_orders_sync(account_id, reconciled_at, None)
+    assert mock_database.get_orders_sync(account_id) == (reconciled_at, None)
+    mock_database.set_orders_sync(account_id, reconciled_at, watermark)
+    assert mock_database.get_orders_sync(account_id) == (reconciled_at, watermark)
+
+
+def test_assets(mock_database: MongoDatabase) -> None:
+    """Test that the assets are replaced by each refresh."""
+    raw_asset: dict[str, Any] = {
+        "class": "us_equity",
+        "exchange": "NASDAQ",
+        "name": "Apple Inc. Common Stock",
+        "status": "active",
+        "tradable": True,
+        "marginable": True,
+        "shortable": True,
+        "easy_to_borrow": True,
+        "fractionable": True,
+    }
+    apple = Asset(**raw_asset, id=uuid4(), symbol="AAPL")
+    delisted = Asset(**{**raw_asset, "status": "inactive"}, id=uuid4(), symbol="AAPL")
+    tesla = Asset(**raw_asset, id=uuid4(), symbol="TSLA")
+    assert mock_database.get_assets_refreshed_at() is None
+    first_refresh = datetime(2022, 8, 16, 20, tzinfo=timezone.utc)
+    mock_database.save_assets([delisted, apple, tesla], first_refresh)
+    assert mock_database.get_assets_refreshed_at() == first_refresh
+    assert sorted(a.id for a in mock_database.get_assets()) == sorted(
+        a.id for a in (apple, delisted, tesla)
+    )
+
+    second_refresh = datetime(2022, 8, 16, 21, tzinfo=timezone.utc)
+    mock_database.save_assets([delisted, tesla], second_refresh)
+    assert mock_database.get_assets_refreshed_at() == second_refresh
+    assert [a.symbol for a in mock_database.get_assets()] == ["AAPL", "TSLA"]
+    # the lookup fields are indexed within each refresh
+    assert {
+        f"refreshed_at_1_{field}_1" for field in ("symbol", "name", "exchange", "class", "status")
+    } <= set(mock_database.assets_collection.index_information())
+
+
+def test_assets_concurrent_refreshes(mock_database: MongoDatabase) -> None:
+    """Test that the refreshes of two workers keep the assets of the last one, in any order."""
+    raw_asset: dict[str, Any] = {
+        "class": "us_equity",
+        "exchange": "NASDAQ",
+        "status": "active",
+        "tradable": True,
+        "marginable": True,
+        "shortable": True,
+        "easy_to_borrow": True,
+        "fractionable": True,
+    }
+    apple = Asset(**raw_asset, id=uuid4(), symbol="AAPL", name="Apple Inc. Common Stock")
+    tesla = Asset(**raw_asset, id=uuid4(), symbol="TSLA", name="Tesla, Inc. Common Stock")
+    first_refresh = datetime(2022, 8, 16, 20, tzinfo=timezone.utc)
+    second_refresh = datetime(2022, 8, 16, 20, 0, 1, tzinfo=timezone.utc)
+    # the later refresh is stored first, the earlier one does not replace it
+    mock_database.save_assets([apple, tesla], second_refresh)
+    mock_database.save_assets([apple], first_refresh)
+    assert mock_database.get_assets_refreshed_at() == second_refresh
+    assert [a.symbol for a in mock_database.get_assets()] == ["AAPL", "TSLA"]
+    assert mock_database.get_assets(first_refresh) == []
+
+    third_refresh = datetime(2022, 8, 16, 20, 0, 2, tzinfo=timezone.utc)
+    mock_database.save_assets([tesla], third_refresh)
+    assert [a.symbol for a in mock_database.get_assets()] == ["TSLA"]
+    assert mock_database.get_assets(second_refresh) == []
@@ -0,0 +1,35 @@
+"""Test the backfill command."""
+from alpaca.broker import Account
+from alpaca.common.enums import BaseURL
+from requests_mock import Mocker
+
+from alpaca_partner_backend.api.common import get_broker_client
+from alpaca_partner_backend.backfill import backfill_alpaca_accounts
+from alpaca_partner_backend.database import MongoDatabase
+from tests.conftest import TEST_EMAIL
+
+
+def test_backfill_alpaca_accounts(
+    reqmock: Mocker,
+    mock_get_alpaca_account_by_email: str,
+    alpaca_account: Account,
+    mock_database_with_user: MongoDatabase,
+) -> None:
+    """Test that the users without account ID are linked to their Alpaca account."""
+    reqmock.get(
+        url=f"{BaseURL.BROKER_SANDBOX}/v1/accounts?query={str(TEST_EMAIL)}",
+        text=mock_get_alpaca_account_by_email,
+    )
+    linked = backfill_alpaca_accounts(
+        database=mock_database_with_user,
+        broker_client=get_broker_client(),
+    )
+    assert linked == 1
+    user = mock_database_with_user.get_user_by_email(email=TEST_EMAIL)
+    assert user.alpaca_account_id == str(alpaca_account.id)
+    assert user.alpaca_account_number == alpaca_account.account_number
+    # running it again is a no-op
+    assert not backfill_alpaca_accounts(
+        database=mock_database_with_user,
+        broker_client=get_broker_client(),
+    )
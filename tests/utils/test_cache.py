@@ -0,0 +1,71 @@
+"""Test cache utils."""
+from concurrent.futures import ThreadPoolExecutor
+
+from alpaca_partner_backend.utils.cache import CacheInfo, TTLCache
+
+
+class FakeTimer:
+    """Clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Get the current time."""
+        return self.now
+
+
+def test_ttl_cache_hits_and_misses() -> None:
+    """Test the hit and miss counters."""
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.cache_info() == CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+
+
+def test_ttl_cache_expiration() -> None:
+    """Test that the entries expire after their time to live."""
+    timer = FakeTimer()
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10, timer=timer)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    timer.now = 5
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    timer.now = 10
+    assert cache.get("a") is None
+    assert not len(cache)
+
+
+def test_ttl_cache_lru_eviction() -> None:
+    """Test that the least recently used entry is evicted first."""
+    cache: TTLCache[str, str] = TTLCache(maxsize=2, ttl=10)
+    for key in ("a", "b"):
+        cache.set(key, key)
+    assert cache.get("a") == "a"
+    cache.set("c", "c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert cache.get("c") == "c"
+
+
+def test_ttl_cache_invalidate() -> None:
+    """Test the explicit invalidation."""
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_threads() -> None:
+    """Test the counters are consistent when the cache is shared by threads."""
+    keys, calls = 64, 1000
+    cache: TTLCache[int, int] = TTLCache(maxsize=keys, ttl=10)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: cache.get(i % keys) or cache.set(i % keys, i), range(calls)))
+    info = cache.cache_info()
+    assert info.hits + info.misses == calls
+    assert info.currsize == keys
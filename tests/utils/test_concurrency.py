@@ -0,0 +1,153 @@
+"""Test concurrency utils."""
+import time
+
+import anyio
+import pytest
+
+from alpaca_partner_backend.utils.concurrency import SingleFlight, gather, gather_settled
+
+DELAY = 0.2
+
+
+async def _sleep_and_return(value: str, delay: float = DELAY) -> str:
+    """Sleep like an upstream call and return the value."""
+    await anyio.sleep(delay)
+    return value
+
+
+def test_gather_overlaps_calls() -> None:
+    """Test that the calls run concurrently and the results are returned by name."""
+
+    async def main() -> dict[str, str]:
+        return await gather({"a": _sleep_and_return("a"), "b": _sleep_and_return("b")})
+
+    start = time.perf_counter()
+    results = anyio.run(main)
+    assert time.perf_counter() - start < 2 * DELAY
+    assert results == {"a": "a", "b": "b"}
+
+
+def test_gather_timeout() -> None:
+    """Test that a slow call raises a timeout naming the call."""
+
+    async def main() -> dict[str, str]:
+        return await gather(
+            {"fast": _sleep_and_return("fast", 0), "slow": _sleep_and_return("slow")},
+            timeout=DELAY / 4,
+        )
+
+    with pytest.raises(TimeoutError, match="slow"):
+        anyio.run(main)
+
+
+def test_gather_per_call_timeouts() -> None:
+    """Test that the per-call timeouts override the default one."""
+
+    async def main() -> dict[str, str]:
+        return await gather(
+            {"a": _sleep_and_return("a"), "b": _sleep_and_return("b")},
+            timeout=DELAY / 4,
+            timeouts={"a": DELAY * 5, "b": DELAY * 5},
+        )
+
+    assert anyio.run(main) == {"a": "a", "b": "b"}
+
+
+def test_gather_error_cancels_others() -> None:
+    """Test that the error of a call is raised and the other calls are cancelled."""
+    completed: list[str] = []
+
+    async def fail() -> None:
+        raise ValueError("upstream error")
+
+    async def slow() -> None:
+        await anyio.sleep(DELAY)
+        completed.append("slow")
+
+    async def main() -> dict[str, None]:
+        return await gather({"fail": fail(), "slow": slow()})
+
+    with pytest.raises(ValueError, match="upstream error"):
+        anyio.run(main)
+    assert not completed
+
+
+def test_gather_settled() -> None:
+    """Test that the calls are bounded, the errors returned in place and the others completed."""
+    running: list[int] = []
+    max_concurrency = 2
+
+    async def call(value: int) -> int:
+        running.append(value)
+        assert len(running) <= max_concurrency
+        await anyio.sleep(DELAY / 4)
+        running.remove(value)
+        if value == 1:
+            raise ValueError("upstream error")
+        return value
+
+    async def main() -> list[int | Exception]:
+        return await gather_settled([call(i) for i in range(5)], max_concurrency)
+
+    results = anyio.run(main)
+    assert isinstance(results[1], ValueError)
+    assert [r for i, r in enumerate(results) if i != 1] == [0, 2, 3, 4]
+
+
+def test_single_flight() -> None:
+    """Test that the concurrent calls with the same key await the one in flight."""
+    calls: list[str] = []
+    single_flight: SingleFlight[str] = SingleFlight()
+
+    async def call(value: str) -> str:
+        calls.append(value)
+        await anyio.sleep(DELAY / 4)
+        return value
+
+    async def main() -> list[tuple[str, bool]]:
+        results: list[tuple[str, bool]] = []
+
+        async def run(key: str, value: str) -> None:
+            results.append(await single_flight.run(key, lambda: call(value)))
+
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(run, "a", "first")
+            task_group.start_soon(run, "a", "retry")
+            task_group.start_soon(run, "b", "other")
+        # the calls after the one in flight are not deduplicated
+        results.append(await single_flight.run("a", lambda: call("later")))
+        return results
+
+    results = anyio.run(main)
+    assert calls == ["first", "other", "later"]
+    assert sorted(results) == [
+        ("first", False),
+        ("first", True),
+        ("later", False),
+        ("other", False),
+    ]
+
+
+def test_single_flight_error() -> None:
+    """Test that the error of the call in flight is raised to the duplicates too."""
+    single_flight: SingleFlight[None] = SingleFlight()
+    errors: list[Exception] = []
+
+    async def fail() -> None:
+        await anyio.sleep(DELAY / 4)
+        raise ValueError("upstream error")
+
+    async def run() -> None:
+        try:
+            await single_flight.run("a", fail)
+        except ValueError as exc:
+            errors.append(exc)
+
+    async def main() -> None:
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(run)
+            task_group.start_soon(run)
+
+    anyio.run(main)
+    assert len(errors) == 2  # noqa: PLR2004
+    assert errors[0] is errors[1]
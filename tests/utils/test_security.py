@@ -3,7 +3,9 @@
 
 from alpaca_partner_backend.utils.security import (
     create_access_token,
+    decode_access_token,
     get_password_hash,
+    tokens_cache,
     verify_password,
 )
 
@@ -27,3 +29,24 @@ def test_create_access_token() -> None:
     """Test the JWT access token creation."""
     token = create_access_token(data={"sub": TEST_EMAIL})
     assert isinstance(token, str)
+
+
+def test_access_token_account_claims() -> None:
+    """Test that the user and account IDs are signed in the JWT access token."""
+    token = create_access_token(
+        data={"sub": TEST_EMAIL},
+        user_id="64a1b2c3d4e5f60718293a4b",
+        account_id="7ccfd029-9b91-40d0-9b4c-f928385af666",
+    )
+    claims = decode_access_token(token)
+    assert claims["sub"] == TEST_EMAIL
+    assert claims["uid"] == "64a1b2c3d4e5f60718293a4b"
+    assert claims["account_id"] == "7ccfd029-9b91-40d0-9b4c-f928385af666"
+
+
+def test_decode_access_token_cache() -> None:
+    """Test that the claims of a token are decoded once and then cached."""
+    token = create_access_token(data={"sub": TEST_EMAIL, "test": "cache"})
+    hits = tokens_cache.cache_info().hits
+    assert decode_access_token(token) == decode_access_token(token)
+    assert tokens_cache.cache_info().hits == hits + 1